@@ -0,0 +1 @@
+"""Data layer for the movie dashboard (catalog loading, parsing and indexes)."""
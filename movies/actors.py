@@ -0,0 +1,94 @@
+"""Case-insensitive actor index over the parsed `Cast_list`.
+
+Built once per catalog version from the cast `ListColumn`:
+
+* an inverted index from lower-cased actor name to the movie rows (positions
+  in `movies_df`) the actor appears in, stored as offsets + rows,
+* the lower-cased names in sorted order, so a prefix is a pair of binary
+  searches, and
+* title counts per actor for the "Most / Least Titles" chart.
+"""
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+class ActorIndex:
+    def __init__(self, cast):
+        lower = np.array([actor.lower() for actor in cast.vocab], dtype=object)
+        self.keys, key_of_code = np.unique(lower, return_inverse=True)
+        key_of_code = np.asarray(key_of_code, dtype=np.int64).reshape(-1)
+
+        # Display each key with its first spelling in the vocabulary
+        first_code = np.full(len(self.keys), -1, dtype=np.int64)
+        first_code[key_of_code[::-1]] = np.arange(len(key_of_code))[::-1]
+        self.names = cast.vocab[first_code] if len(first_code) else np.array([], dtype=object)
+
+        # Posting lists: one (key, row) pair per cast entry, sorted and de-duplicated
+        keys = key_of_code[cast.codes] if len(key_of_code) else np.zeros(0, dtype=np.int64)
+        rows = cast.row_ids
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        unique = np.ones(len(keys), dtype=bool)
+        unique[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        self.rows = rows[unique]
+        self.offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys[unique], minlength=len(self.keys)), out=self.offsets[1:])
+
+        # Appearances per actor, as the chart used to get from explode().value_counts()
+        self.title_counts = np.bincount(keys, minlength=len(self.keys))
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.list_column('Cast_list'))
+
+    def _key(self, name):
+        name = name.strip().lower()
+        i = np.searchsorted(self.keys, name)
+        return i if i < len(self.keys) and self.keys[i] == name else -1
+
+    def movies(self, name):
+        """Positions in `movies_df` of the movies featuring `name` (any case)."""
+        key = self._key(name)
+        if key < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.rows[self.offsets[key]:self.offsets[key + 1]]
+
+    def suggest(self, prefix, limit=10):
+        """Up to `limit` actor names starting with `prefix`, most titles first."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        start = np.searchsorted(self.keys, prefix, side='left')
+        end = np.searchsorted(self.keys, prefix + '\U0010ffff', side='left')
+        matches = np.arange(start, end)
+        matches = matches[self.title_counts[matches] > 0]
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-self.title_counts[matches], limit)[:limit]]
+        matches = matches[np.argsort(-self.title_counts[matches], kind='stable')]
+        return self.names[matches].tolist()
+
+    @cached_property
+    def _ranking(self):
+        # Actors that still appear somewhere, most titles first
+        order = np.argsort(-self.title_counts, kind='stable')
+        return order[self.title_counts[order] > 0]
+
+    def ranked(self, n, most=True, exclude=()):
+        """`Actor` / `Title Count` frame of the `n` actors with the most (or least) titles.
+
+        Rows are always ordered from most to least titles.
+        """
+        excluded = {self._key(name) for name in exclude}
+        order = self._ranking if most else self._ranking[::-1]
+        picked = []
+        for key in order:
+            if len(picked) == n:
+                break
+            if key not in excluded:
+                picked.append(key)
+        if not most:
+            picked.reverse()
+        return pd.DataFrame({'Actor': self.names[picked], 'Title Count': self.title_counts[picked]})
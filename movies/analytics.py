@@ -0,0 +1,240 @@
+"""Embedded SQL mirror of the catalog for the page aggregations.
+
+With ``MOVIES_ANALYTICS=duckdb`` (or ``sqlite``) every catalog version is
+also loaded into an in-memory database, and the dashboard runs its top-N,
+country, genre revenue and actor queries as SQL against it instead of the
+NumPy indexes.  DuckDB executes them vectorized on all cores; SQLite needs
+nothing beyond the standard library.  ``off`` (the default) keeps the
+indexes.
+
+The tables are normalized from the parsed catalog:
+
+* ``movies``: one row per movie in `all_movies_df`; `row` is its position
+  there, so for movies with a country (`in_catalog`) it is also the position
+  in `movies_df`,
+* ``movie_genres``: distinct (row, genre) pairs,
+* ``movie_countries``: one (row, ISO-3 code, country name) per resolved
+  production country,
+* ``movie_cast`` and ``actors``: cast entries keyed by lower-cased name, and
+  per-actor title counts.  They are loaded on the first actor query (`actors`),
+  since `Cast_list` is fetched lazily.
+
+The mirror is rebuilt for each catalog version (it is a registered index),
+so a sync costs a reload of a few in-memory tables.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from movies.countries import country_name
+
+log = logging.getLogger(__name__)
+
+BACKEND = os.environ.get("MOVIES_ANALYTICS", "off")
+BACKENDS = ("off", "duckdb", "sqlite")
+
+SCHEMA = {
+    'movies': "row INTEGER PRIMARY KEY, id TEXT, title TEXT, release_year INTEGER, popularity DOUBLE, "
+              "revenue DOUBLE, in_catalog BOOLEAN",
+    'movie_genres': "row INTEGER, genre TEXT",
+    'movie_countries': "row INTEGER, iso3 TEXT, country TEXT",
+    'movie_cast': "row INTEGER, actor TEXT, actor_key TEXT",
+    'actors': "actor_key TEXT PRIMARY KEY, name TEXT, title_count INTEGER",
+}
+INDEXES = [
+    "CREATE INDEX movies_year ON movies (release_year, popularity)",
+    "CREATE INDEX movie_genres_genre ON movie_genres (genre, row)",
+    "CREATE INDEX movie_countries_country ON movie_countries (country, row)",
+]
+CAST_INDEXES = [
+    "CREATE INDEX movie_cast_key ON movie_cast (actor_key, row)",
+    "CREATE INDEX actors_count ON actors (title_count)",
+]
+
+
+def _connect(backend):
+    if backend == "duckdb":
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("MOVIES_ANALYTICS=duckdb needs the duckdb package (pip install duckdb)") from None
+        return duckdb.connect(":memory:")
+    if backend == "sqlite":
+        # Shared by every session thread; queries are serialized by AnalyticsDB
+        return sqlite3.connect(":memory:", check_same_thread=False)
+    raise ValueError(f"Unknown analytics backend {backend!r}, expected one of {BACKENDS}")
+
+
+def _placeholders(values):
+    return ", ".join("?" * len(values))
+
+
+class AnalyticsDB:
+    def __init__(self, data, backend="duckdb"):
+        self.backend = backend
+        self._data = data
+        self._conn = _connect(backend)
+        self._lock = threading.Lock()
+        self._cast_loaded = False
+
+        all_movies_df, movies_df = data.all_movies_df, data.movies_df
+        in_catalog = np.zeros(len(all_movies_df), dtype=bool)
+        in_catalog[:len(movies_df)] = True
+        self._load('movies', pd.DataFrame({
+            'row': np.arange(len(all_movies_df)),
+            'id': all_movies_df.index.to_numpy(dtype=object),
+            'title': all_movies_df['title'].to_numpy(dtype=object),
+            'release_year': all_movies_df['release_year'].astype('Int32'),
+            'popularity': all_movies_df['popularity'].astype('Float64').to_numpy(),
+            'revenue': all_movies_df['revenue'].astype('Float64').to_numpy(),
+            'in_catalog': in_catalog,
+        }))
+        genres = data.lists['genres_list']
+        self._load('movie_genres', pd.DataFrame({
+            'row': genres.row_ids, 'genre': genres.vocab[genres.codes]}).drop_duplicates())
+        codes = data.lists['country_codes']
+        names = np.array([country_name(code) for code in codes.vocab], dtype=object)
+        self._load('movie_countries', pd.DataFrame({
+            'row': codes.row_ids, 'iso3': codes.vocab[codes.codes], 'country': names[codes.codes]}))
+        for statement in INDEXES:
+            self._conn.execute(statement)
+
+    @classmethod
+    def build(cls, data):
+        return cls(data, BACKEND)
+
+    def _load(self, table, frame):
+        self._conn.execute(f"CREATE TABLE {table} ({SCHEMA[table]})")
+        if self.backend == "duckdb":
+            self._conn.register("_frame", frame)
+            self._conn.execute(f"INSERT INTO {table} SELECT * FROM _frame")
+            self._conn.unregister("_frame")
+        else:
+            rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+            self._conn.executemany(f"INSERT INTO {table} VALUES ({_placeholders(frame.columns)})", rows)
+
+    def _query(self, sql, params=()):
+        if self.backend == "duckdb":
+            # A cursor is a separate connection to the same database, safe to use from this thread
+            return self._conn.cursor().execute(sql, list(params)).fetchall()
+        with self._lock:
+            return self._conn.execute(sql, list(params)).fetchall()
+
+    def _ensure_cast(self):
+        if self._cast_loaded:
+            return
+        cast = self._data.list_column('Cast_list')
+        with self._lock:
+            if self._cast_loaded:
+                return
+            keys = np.array([actor.lower() for actor in cast.vocab], dtype=object)
+            self._load('movie_cast', pd.DataFrame({
+                'row': cast.row_ids, 'actor': cast.vocab[cast.codes], 'actor_key': keys[cast.codes]}))
+            # Each key shows with its first spelling in the vocabulary, as in `ActorIndex`
+            first = pd.Series(cast.vocab, dtype=object).groupby(keys, sort=False).first()
+            counts = pd.Series(keys[cast.codes], dtype=object).value_counts()
+            self._load('actors', pd.DataFrame({
+                'actor_key': first.index.to_numpy(dtype=object), 'name': first.to_numpy(dtype=object),
+                'title_count': counts.reindex(first.index, fill_value=0).to_numpy(dtype=np.int64)}))
+            for statement in CAST_INDEXES:
+                self._conn.execute(statement)
+            self._cast_loaded = True
+
+    # Page 1
+
+    def top(self, year, genre=None, n=5):
+        """Document ids of the `n` most popular movies of `year` in `genre` (None for all)."""
+        order = "ORDER BY m.popularity IS NULL, m.popularity DESC, m.row LIMIT ?"
+        if genre is None:
+            rows = self._query(f"SELECT m.id FROM movies m WHERE m.in_catalog AND m.release_year = ? {order}",
+                               (int(year), int(n)))
+        else:
+            rows = self._query("SELECT m.id FROM movie_genres g JOIN movies m ON m.row = g.row "
+                               f"WHERE g.genre = ? AND m.release_year = ? {order}", (genre, int(year), int(n)))
+        return np.array([row[0] for row in rows], dtype=object)
+
+    # Page 2
+
+    def country_counts(self):
+        """`Country` / `ISO3` / `Count` / `Percentage` frame, most entries first."""
+        rows = self._query("SELECT country, iso3, COUNT(*) AS n FROM movie_countries "
+                           "GROUP BY iso3, country ORDER BY n DESC, iso3")
+        frame = pd.DataFrame(rows, columns=['Country', 'ISO3', 'Count'])
+        frame['Percentage'] = (frame['Count'] / frame['Count'].sum()) * 100
+        return frame
+
+    def movies_from(self, country):
+        """`Country` / `ISO3` / `Movie Title` / `Release Year` / `Popularity` rows for one country name."""
+        rows = self._query("SELECT c.country, c.iso3, m.title, m.release_year, m.popularity "
+                           "FROM movie_countries c JOIN movies m ON m.row = c.row "
+                           "WHERE c.country = ? ORDER BY c.row", (country,))
+        return pd.DataFrame(rows, columns=['Country', 'ISO3', 'Movie Title', 'Release Year', 'Popularity'])
+
+    def movie_positions(self, country):
+        """Positions in `movies_df` of the movies from one country name, in catalog order."""
+        rows = self._query("SELECT DISTINCT row FROM movie_countries WHERE country = ? ORDER BY row", (country,))
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def range_totals(self, genres, start, end):
+        """`(counts, revenue)` per entry of `genres` over release years `start`..`end` inclusive."""
+        totals = {}
+        if genres:
+            rows = self._query("SELECT g.genre, COUNT(*), SUM(COALESCE(m.revenue, 0)) "
+                               "FROM movie_genres g JOIN movies m ON m.row = g.row "
+                               f"WHERE g.genre IN ({_placeholders(genres)}) AND m.release_year BETWEEN ? AND ? "
+                               "GROUP BY g.genre", (*genres, int(start), int(end)))
+            totals = {genre: (count, revenue) for genre, count, revenue in rows}
+        counts = np.array([totals.get(genre, (0, 0.0))[0] for genre in genres], dtype=np.int64)
+        revenue = np.array([totals.get(genre, (0, 0.0))[1] for genre in genres], dtype=float)
+        return counts, revenue
+
+    def releases_per_year(self):
+        """`release_year` / `Count` frame over the whole catalog."""
+        rows = self._query("SELECT release_year, COUNT(*) FROM movies WHERE release_year IS NOT NULL "
+                           "GROUP BY release_year ORDER BY release_year")
+        return pd.DataFrame(rows, columns=['release_year', 'Count'])
+
+    # Page 3
+
+    @cached_property
+    def actors(self):
+        """Actor queries with the interface of `movies.actors.ActorIndex`."""
+        self._ensure_cast()
+        return ActorQueries(self)
+
+
+class ActorQueries:
+    def __init__(self, db):
+        self._db = db
+
+    def movies(self, name):
+        """Positions in `movies_df` of the movies featuring `name` (any case)."""
+        rows = self._db._query("SELECT DISTINCT row FROM movie_cast WHERE actor_key = ? ORDER BY row",
+                               (name.strip().lower(),))
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def suggest(self, prefix, limit=10):
+        """Up to `limit` actor names starting with `prefix`, most titles first."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        rows = self._db._query("SELECT name FROM actors WHERE actor_key >= ? AND actor_key < ? AND title_count > 0 "
+                               "ORDER BY title_count DESC, actor_key LIMIT ?", (prefix, prefix + '\U0010ffff', limit))
+        return [row[0] for row in rows]
+
+    def ranked(self, n, most=True, exclude=()):
+        """`Actor` / `Title Count` frame of the `n` actors with the most (or least) titles, most first."""
+        excluded = [name.strip().lower() for name in exclude]
+        where = f"AND actor_key NOT IN ({_placeholders(excluded)})" if excluded else ""
+        order = "title_count DESC, actor_key" if most else "title_count, actor_key DESC"
+        rows = self._db._query(f"SELECT name, title_count FROM actors WHERE title_count > 0 {where} "
+                               f"ORDER BY {order} LIMIT ?", (*excluded, int(n)))
+        if not most:
+            rows.reverse()
+        return pd.DataFrame(rows, columns=['Actor', 'Title Count'])
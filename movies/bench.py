@@ -0,0 +1,219 @@
+"""Headless benchmark of the dashboard's data preparation.
+
+    python -m movies.bench                       # 10k and 100k movies
+    python -m movies.bench --sizes 1000000 --json bench.json
+    python -m movies.bench --baseline bench.json # fail on regressions
+
+Synthetic movies (`movies.synthetic`) are written to an in-memory Firestore
+stand-in (`movies.fakestore`), so nothing touches the network.  Every stage a
+page needs before it can render is timed with its peak Python memory
+(`tracemalloc`, which also sees NumPy buffers but not Arrow's pool):
+
+* ``load``: the parallel full load of the core fields (fetch + parse),
+* ``parse``: parsing every field of the raw documents in one batch,
+* ``catalog`` and the indexes: Page 1 top movies and titles, the Page 2
+  genre matrix, revenue cube and country table, the Page 3 cast fetch and
+  actor index,
+* ``filters``: Page 1 top-N queries, title search, Page 2 genre masks, year
+  ranges and country lists,
+* ``actor_search``: exact lookups, prefix suggestions and rankings,
+* ``costar_search``: co-stars and second-degree connections of 50 actors, from
+  the most prolific down,
+* ``recommend``: recommendations for 100 users with a dozen listed movies
+  each, one at a time.
+
+Correctness of the sync modes and of incremental index updates is checked by
+the tests (``python -m pytest``), not here.
+
+With `--baseline` the run is compared to an earlier `--json` report and exits
+non-zero when a stage got more than `--tolerance` slower.  Tracing memory
+slows Python-heavy stages several times over, so only compare runs made with
+the same `--no-memory` setting.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from movies.actors import ActorIndex
+from movies.catalog import CatalogData
+from movies.costars import CoStars
+from movies.country_table import CountryTable
+from movies.fakestore import FakeClient
+from movies.fields import FieldStore
+from movies.genres import GenreIndex
+from movies.loader import CollectionLoader
+from movies.prep import CORE_FIELDS, parse_movies, prepare_parsed
+from movies.recommend import Recommender
+from movies.revenue_cube import RevenueCube
+from movies.synthetic import populate
+from movies.titles import TitleIndex
+from movies.top_movies import TopMovies
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (10000, 100000)
+INDEXES = {
+    "top_movies": TopMovies.build,
+    "titles": TitleIndex.build,
+    "genres": GenreIndex.build,
+    "revenue_cube": RevenueCube.build,
+    "countries": CountryTable.build,
+    "actors": ActorIndex.build,
+    "costars": CoStars.build,
+    "recommendations": Recommender.build,
+}
+
+
+class Stages:
+    """Runs named stages and records `seconds` and `peak_bytes` for each."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.results = {}
+
+    def run(self, name, func, *args):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            if self.memory:
+                tracemalloc.stop()
+            self.results[name] = {'seconds': seconds, 'peak_bytes': peak}
+            log.info("%-16s %8.3fs %s", name, seconds, _megabytes(peak))
+
+
+def _megabytes(value):
+    return f"{value / 2 ** 20:9.1f} MB" if value is not None else ""
+
+
+def _filters(data):
+    movies_df, top, titles = data.movies_df, data.index("top_movies"), data.index("titles")
+    genres, cube, countries = data.index("genres"), data.index("revenue_cube"), data.index("countries")
+    years = movies_df['release_year'].dropna().unique().tolist()[:20]
+    for year in years:
+        for genre in [None] + genres.genres[:5]:
+            movies_df.loc[top.top(year, genre, 10)]
+    for prefix in ["", "the", "night", "golden riv", "zzz"]:
+        titles.search(prefix, 20)
+    for selected in (genres.genres[:1], genres.genres[:3], genres.genres):
+        genres.mask(selected)
+        genres.mask(selected, match="all")
+        cube.range_totals(selected, 1950, 2000)
+    cube.releases_per_year()
+    for country in countries.countries()[:10]:
+        countries.movies_from(country)
+
+
+def _actor_search(data):
+    actors = data.index("actors")
+    for name in actors.ranked(50, most=True)['Actor'].tolist():
+        data.movies_df.iloc[actors.movies(name)]
+    for prefix in ["j", "mar", "lars o'", "nobody"]:
+        actors.suggest(prefix)
+    actors.ranked(10, most=False)
+
+
+def _costar_search(data):
+    costars = data.index("costars")
+    for name in data.index("actors").ranked(50, most=True)['Actor'].tolist():
+        costars.collaborators(name)
+        costars.second_degree(name)
+
+
+def _recommend(data):
+    recommender = data.index("recommendations")
+    rng = np.random.default_rng(0)
+    ids = data.movies_df.index
+    for _ in range(100):
+        recommender.recommend(ids[rng.integers(0, len(ids), 8)], ids[rng.integers(0, len(ids), 4)])
+
+
+def _catalog(db, parsed, cursor, index_specs):
+    return CatalogData(*prepare_parsed(*parsed), cursor=cursor, index_specs=index_specs,
+                       store=FieldStore(db, "movies2"))
+
+
+def benchmark(n, seed=0, memory=True, loader=None):
+    """Run every stage on `n` synthetic movies; returns `{stage: {'seconds', 'peak_bytes'}}`."""
+    db = FakeClient()
+    start = time.perf_counter()
+    populate(db, n, seed=seed)
+    log.info("Generated %d movies in %.1fs", n, time.perf_counter() - start)
+
+    stages = Stages(memory)
+    loader = loader or CollectionLoader()
+    movies, lists, malformed, cursor = stages.run("load", loader.load, db, "movies2", CORE_FIELDS)
+    raw = [doc.to_dict() for doc in db.collection("movies2").get()]
+    stages.run("parse", parse_movies, raw)
+    del raw
+
+    index_specs = {name: (build, None, False) for name, build in INDEXES.items()}
+    data = stages.run("catalog", _catalog, db, (movies, lists, malformed), cursor, index_specs)
+    stages.run("cast_fetch", data.list_column, "Cast_list")
+    for name in INDEXES:
+        stages.run(name, data.index, name)
+    stages.run("filters", _filters, data)
+    stages.run("actor_search", _actor_search, data)
+    stages.run("costar_search", _costar_search, data)
+    stages.run("recommend", _recommend, data)
+
+    costars = data.index("costars")
+    log.info("Co-star matrix: %d pairs, %.1f MB", costars.matrix.nnz, costars.nbytes() / 2 ** 20)
+
+    usage = data.memory_usage()
+    stages.results["catalog"]['bytes_per_movie'] = usage['per_movie']
+    log.info("Catalog holds %.0f bytes per movie", usage['per_movie'])
+    return stages.results
+
+
+def compare(results, baseline, tolerance):
+    """Stages (as `"<size>/<stage>"`) that took more than `1 + tolerance` times their baseline."""
+    slower = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            # Ignore stages too short to time reliably
+            if before and before['seconds'] >= 0.01 and result['seconds'] > before['seconds'] * (1 + tolerance):
+                slower.append(f"{size}/{stage}: {before['seconds']:.3f}s -> {result['seconds']:.3f}s")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movies.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="catalog sizes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, timings only)")
+    parser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare with an earlier --json report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (default: %(default)s)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = {}
+    for n in args.sizes:
+        log.info("== %d movies", n)
+        results[str(n)] = benchmark(n, args.seed, memory=not args.no_memory)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for line in slower:
+            log.error("Slower than baseline: %s", line)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
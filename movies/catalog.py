@@ -0,0 +1,429 @@
+"""Process-wide movie catalog shared by every Streamlit session.
+
+The catalog is loaded from Firestore once per process and handed out as a
+`CatalogData` object.  Sessions must treat its frames as read-only: a refresh
+or sync never modifies them, it builds a new `CatalogData` and swaps it in, so
+a rerun that is already running keeps a consistent view.
+
+Derived structures (indexes, lookup tables) are registered with
+`Catalog.register_index` and built on first use for each catalog version, or
+as soon as the version is loaded when registered with `eager=True`.  An index
+can also provide an `update` function so incremental syncs patch it instead of
+rebuilding it from scratch.
+
+The `sync` mode decides how the catalog stays current:
+
+* ``"full"`` reloads the whole collection once the TTL expires,
+* ``"poll"`` fetches only documents with a newer `updated_at` after the TTL,
+* ``"listen"`` keeps a snapshot listener open and applies changes as they
+  arrive.  If the first snapshot cannot be applied, the catalog is loaded in
+  full instead and kept current by polling.
+
+Only the core fields are fetched up front (`fields`, by default
+`movies.prep.CORE_FIELDS`).  Heavy fields such as `overview` and `Cast_list`
+are read on first use through `CatalogData.values` and
+`CatalogData.list_column`.  A list column, once read, stays loaded: patched
+versions carry it over and full reloads fetch it with the core fields.
+
+Full loads are fetched in parallel key ranges by a `CollectionLoader`.
+
+With a `snapshot_path` the parsed catalog is also written to disk (see
+`movies.snapshot`).  A new process starts from that file and only fetches the
+documents written since it was saved.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from movies import metrics, snapshot, sync
+from movies.fields import FieldStore
+from movies.loader import CollectionLoader
+from movies.prep import CORE_FIELDS, LIST_FIELDS, prepare_movies, prepare_parsed, split_movies
+
+log = logging.getLogger(__name__)
+
+# Seconds before a loaded catalog is considered stale (0 disables expiry)
+DEFAULT_TTL = int(os.environ.get("MOVIES_CATALOG_TTL", "600"))
+DEFAULT_SYNC = os.environ.get("MOVIES_CATALOG_SYNC", "full")
+SYNC_MODES = ("full", "poll", "listen")
+
+# How long the first request waits for the listener's initial snapshot
+LISTEN_TIMEOUT = 120
+
+# Minimum seconds between snapshot writes caused by incremental syncs
+SNAPSHOT_INTERVAL = 300
+
+
+class CatalogData:
+    """One immutable, fully parsed version of the catalog.
+
+    `lists` holds the parsed list fields (`ListColumn`s) row-aligned with
+    `movies_df`; `report` counts malformed values and dropped movies.
+    `movies_df` is the leading slice of `all_movies_df` (see
+    `movies.prep.split_movies`), not a copy.  For a version made by
+    `patched`, `upserts` holds the raw documents it applied, so index updates
+    can read fields the catalog does not load.
+    """
+
+    def __init__(self, all_movies_df, movies_df, lists, report=None, loaded_at=None, version=1, cursor=None,
+                 index_specs=None, store=None):
+        self.all_movies_df = all_movies_df
+        self.movies_df = movies_df
+        self.lists = lists
+        self.report = report if report is not None else {'malformed': {}, 'dropped': 0}
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+        self.version = version
+        self.cursor = cursor
+        self._index_specs = index_specs if index_specs is not None else {}
+        self.store = store
+        self.upserts = {}
+        self._indexes = {}
+        # Re-entrant: an index may be built from other indexes
+        self._index_lock = threading.RLock()
+        # One per lazy list field, so reading a column never holds up index builds
+        self._list_locks = {field: threading.Lock() for field in LIST_FIELDS}
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def index(self, name):
+        """Return the derived structure registered as `name`, building it once."""
+        index = self._indexes.get(name)
+        if index is None:
+            with self._index_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    build = self._index_specs[name][0]
+                    start = time.perf_counter()
+                    with metrics.span(f"derive.{name}"):
+                        index = build(self)
+                    self._indexes[name] = index
+                    log.info("Built index %s for catalog v%d in %.3fs",
+                             name, self.version, time.perf_counter() - start)
+        return index
+
+    def values(self, field, ids):
+        """Values of scalar `field` for document `ids`, fetched on demand if not loaded."""
+        if field in self.all_movies_df.columns:
+            return self.all_movies_df.loc[list(ids), field].tolist()
+        return self.store.get(field, ids)
+
+    def list_column(self, field):
+        """Parsed list `field` row-aligned with `movies_df`, fetched on first use if not loaded."""
+        column = self.lists.get(field)
+        if column is None:
+            with self._list_locks[field]:
+                column = self.lists.get(field)
+                if column is None:
+                    start = time.perf_counter()
+                    with metrics.span(f"fetch.{field}"):
+                        movies, lists, malformed, _ = CollectionLoader().load(
+                            self.store.db, self.store.collection, [field])
+                    if malformed[field]:
+                        log.warning("Malformed %s values treated as empty: %d", field, malformed[field])
+                    # Movies written or deleted since this version was loaded stay empty
+                    positions = movies.index.get_indexer(self.movies_df.index)
+                    found = positions >= 0
+                    column = lists[field].take(positions[found]).scatter(np.flatnonzero(found), len(positions))
+                    self.lists[field] = column
+                    log.info("Loaded %s for catalog v%d in %.3fs", field, self.version, time.perf_counter() - start)
+        return column
+
+    def memory_usage(self):
+        """Approximate bytes held by the frame and the list columns, in total and per movie.
+
+        Derived indexes are not included.
+        """
+        frame = int(self.all_movies_df.memory_usage(deep=True).sum())
+        lists = {field: int(column.nbytes()) for field, column in self.lists.items()}
+        total = frame + sum(lists.values())
+        return {'frame': frame, 'lists': lists, 'total': total,
+                'per_movie': total / len(self.all_movies_df) if len(self.all_movies_df) else 0.0}
+
+    def warm(self):
+        """Build every index registered with `eager=True`."""
+        for name, (_, _, eager) in self._index_specs.items():
+            if eager:
+                self.index(name)
+        return self
+
+    def patched(self, upserts, removed, cursor=None):
+        """Return a new version with `upserts` applied and `removed` dropped.
+
+        Only the changed documents are parsed.  Indexes that were already built
+        and know how to update themselves are carried over; the rest are
+        rebuilt lazily on first use.
+        """
+        touched = set(upserts) | set(removed)
+        keep = np.flatnonzero(~self.movies_df.index.isin(touched))
+        others = self.all_movies_df.iloc[len(self.movies_df):]
+        # Movies with a country stay first, so `movies_df` remains a slice
+        movie_parts, other_parts = [self.movies_df.iloc[keep]], [others[~others.index.isin(touched)]]
+        lists = {field: column.take(keep) for field, column in list(self.lists.items())}
+        malformed = dict(self.report['malformed'])
+        if upserts:
+            # Parse the same fields this version has loaded (lazy lists included once fetched)
+            fields = list(self.all_movies_df.columns) + [field for field in LIST_FIELDS if field in self.lists]
+            new_all, new_movies, new_lists, new_report = prepare_movies(upserts.values(), list(upserts), fields)
+            movie_parts.append(new_movies)
+            other_parts.append(new_all.iloc[len(new_movies):])
+            lists = {field: column.concat(new_lists[field]) for field, column in lists.items()}
+            for field, count in new_report['malformed'].items():
+                malformed[field] = malformed.get(field, 0) + count
+        all_movies_df = pd.concat(movie_parts + other_parts)
+        movies_df = all_movies_df.iloc[:sum(map(len, movie_parts))]
+        report = {'malformed': malformed, 'dropped': len(all_movies_df) - len(movies_df)}
+
+        data = CatalogData(all_movies_df, movies_df, lists, report, version=self.version + 1,
+                           cursor=cursor if cursor is not None else self.cursor,
+                           index_specs=self._index_specs, store=self.store)
+        data.upserts = dict(upserts)
+        changed, removed = set(upserts), set(removed)
+        for name, index in self._indexes.items():
+            update = self._index_specs[name][1]
+            if update is not None:
+                data._indexes[name] = update(index, data, changed, removed)
+        return data
+
+
+class Catalog:
+    """Loads `collection` once and keeps it current according to `sync`."""
+
+    def __init__(self, db, collection="movies2", ttl=DEFAULT_TTL, sync=DEFAULT_SYNC, snapshot_path=None,
+                 fields=CORE_FIELDS, loader=None):
+        if sync not in SYNC_MODES:
+            raise ValueError(f"Unknown catalog sync mode {sync!r}, expected one of {SYNC_MODES}")
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+        self.sync = sync
+        self.snapshot_path = snapshot_path
+        self.fields = fields
+        self.loader = loader if loader is not None else CollectionLoader()
+        self.store = FieldStore(db, collection)
+        self.last_error = None
+        self._data = None
+        self._index_specs = {}
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._refresh_thread = None
+        self._watch = None
+        self._listening = threading.Event()
+        self._listen_error = None
+        self._save_lock = threading.Lock()
+        self._saved_at = 0
+
+    def register_index(self, name, build, update=None, eager=False):
+        """Register a derived structure.
+
+        `build(data)` creates it from a `CatalogData`.  The optional
+        `update(index, data, changed_ids, removed_ids)` returns an updated copy
+        for a patched catalog version (whose `upserts` has the changed
+        documents).  Eager indexes are built while a new
+        version is loaded, before it is handed out.
+        """
+        self._index_specs[name] = (build, update, eager)
+
+    def _build(self, ids, records, version):
+        all_movies_df, movies_df, lists, report = prepare_movies(records, ids, self.fields)
+        return CatalogData(all_movies_df, movies_df, lists, report, version=version,
+                           cursor=sync.latest_update(records), index_specs=self._index_specs,
+                           store=self.store).warm()
+
+    def _load(self):
+        start = time.perf_counter()
+        # Lazy list fields the current version has read are reloaded too, not read again on first use
+        fields = list(self.fields) + [field for field in LIST_FIELDS if field not in self.fields
+                                      and self._data is not None and field in self._data.lists]
+        with metrics.span("catalog.load"):
+            movies, lists, malformed, cursor = self.loader.load(self.db, self.collection, fields)
+        # A full reload may see edits the listener or cursor never reported
+        self.store.clear()
+        with metrics.span("derive.prepare"):
+            all_movies_df, movies_df, lists, report = prepare_parsed(movies, lists, malformed)
+        version = self._data.version + 1 if self._data is not None else 1
+        data = CatalogData(all_movies_df, movies_df, lists, report, version=version, cursor=cursor,
+                           index_specs=self._index_specs, store=self.store).warm()
+        log.info("Loaded %d movies from %s in %.2fs (%.0f bytes per movie)",
+                 len(all_movies_df), self.collection, time.perf_counter() - start, data.memory_usage()['per_movie'])
+        self._schedule_save(data, force=True)
+        return data
+
+    def _load_snapshot(self):
+        if not self.snapshot_path:
+            return None
+        start = time.perf_counter()
+        with metrics.span("catalog.snapshot"):
+            loaded = snapshot.load_snapshot(self.snapshot_path, self.collection)
+        if loaded is None:
+            return None
+        movies, lists, report, cursor = loaded
+        all_movies_df, movies_df, movie_lists = split_movies(movies, lists)
+        report['dropped'] = len(all_movies_df) - len(movies_df)
+        data = CatalogData(all_movies_df, movies_df, movie_lists, report, cursor=cursor,
+                           index_specs=self._index_specs, store=self.store).warm()
+        log.info("Loaded %d movies from snapshot %s in %.3fs (%.0f bytes per movie)",
+                 len(all_movies_df), self.snapshot_path, time.perf_counter() - start, data.memory_usage()['per_movie'])
+        # Treat the file as already saved, so the first delta doesn't rewrite it
+        self._saved_at = time.time()
+        return data
+
+    def _load_initial(self):
+        data = self._load_snapshot()
+        if data is None:
+            return self._load()
+        self._data = data
+        return self.sync_changes()
+
+    def _schedule_save(self, data, force=False):
+        if not self.snapshot_path or data.cursor is None:
+            return
+        if not force and time.time() - self._saved_at < SNAPSHOT_INTERVAL:
+            return
+        self._saved_at = time.time()
+        threading.Thread(target=self._save, args=(data,), name="catalog-snapshot", daemon=True).start()
+
+    def _save(self, data):
+        with self._save_lock:
+            try:
+                start = time.perf_counter()
+                snapshot.save_snapshot(data, self.snapshot_path, self.collection)
+                # Indexes that persist themselves (e.g. `movies.search`) are saved alongside
+                for index in list(data._indexes.values()):
+                    if hasattr(index, "save"):
+                        index.save()
+                log.info("Saved catalog v%d snapshot in %.2fs", data.version, time.perf_counter() - start)
+            except Exception:
+                log.exception("Failed to save catalog snapshot %s", self.snapshot_path)
+
+    def get(self):
+        """Return the current catalog, loading it on first use.
+
+        Only the very first call blocks.  Once the data is older than the TTL
+        the stale copy is still returned while a refresh runs in the background.
+        """
+        data = self._data
+        if data is None:
+            if self.sync == "listen":
+                return self._start_listener()
+            with self._load_lock:
+                if self._data is None:
+                    self._data = self._load_initial()
+                return self._data
+        if self.ttl and self.sync != "listen" and data.age() > self.ttl:
+            self.refresh(full=self.sync == "full")
+        return data
+
+    def refresh(self, wait=False, full=True):
+        """Reload the catalog in a background thread.
+
+        With `full=False` only documents changed since the last sync are
+        fetched.  At most one refresh runs at a time; calling this while one
+        is in progress returns the running thread.
+        """
+        with self._refresh_lock:
+            thread = self._refresh_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._refresh, args=(full,), name="catalog-refresh", daemon=True)
+                self._refresh_thread = thread
+                thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def is_refreshing(self):
+        thread = self._refresh_thread
+        return thread is not None and thread.is_alive()
+
+    def _refresh(self, full):
+        try:
+            if full or self._data is None or self._data.cursor is None:
+                data = self._load()
+                with self._apply_lock:
+                    self._data = data
+            else:
+                self.sync_changes()
+            self.last_error = None
+        except Exception as exc:
+            # Keep serving the previous version; the next TTL expiry retries
+            log.exception("Catalog refresh failed")
+            self.last_error = exc
+            if self._data is not None:
+                self._data.loaded_at = time.time()
+
+    def apply_changes(self, upserts, removed, cursor=None):
+        """Patch the current catalog with changed and removed documents."""
+        with self._apply_lock:
+            if not upserts and not removed:
+                self._data.loaded_at = time.time()
+                return self._data
+            start = time.perf_counter()
+            self.store.discard(set(upserts) | set(removed))
+            with metrics.span("catalog.apply"):
+                self._data = self._data.patched(upserts, removed, cursor).warm()
+            log.info("Applied %d changed and %d removed movies in %.3fs",
+                     len(upserts), len(removed), time.perf_counter() - start)
+            self._schedule_save(self._data)
+            return self._data
+
+    def sync_changes(self):
+        """Fetch documents written since the last sync (`updated_at` cursor)."""
+        data = self._data
+        upserts, removed, cursor = sync.fetch_changes_since(self.db.collection(self.collection), data.cursor)
+        return self.apply_changes(upserts, removed, cursor)
+
+    def _start_listener(self):
+        with self._load_lock:
+            if self._watch is None and self.sync == "listen":
+                self._listening.clear()
+                self._listen_error = None
+                query = self.db.collection(self.collection)
+                self._data = self._load_snapshot()
+                if self._data is not None:
+                    # Only listen for documents written after the snapshot
+                    query = query.where(filter=sync.FieldFilter(sync.UPDATED_AT_FIELD, ">", self._data.cursor))
+                self._watch = query.on_snapshot(self._on_snapshot)
+        if not self._listening.wait(LISTEN_TIMEOUT):
+            raise TimeoutError(f"No initial snapshot of {self.collection} after {LISTEN_TIMEOUT}s")
+        if self._listen_error is not None:
+            self._fall_back_to_polling()
+        return self._data
+
+    def _fall_back_to_polling(self):
+        with self._load_lock:
+            if self.sync != "listen":
+                return
+            log.warning("Initial snapshot of %s failed; loading it in full and polling instead", self.collection)
+            self.stop()
+            self._data = None
+            self._data = self._load_initial()
+            self.sync = "poll"
+
+    def _on_snapshot(self, docs, changes, read_time):
+        try:
+            if self._data is None:
+                # The first snapshot lists every document: build the catalog once, without soft-deleted ones
+                upserts, _ = sync.changes_from_documents(docs)
+                self._data = self._build(list(upserts), list(upserts.values()), 1)
+                self._schedule_save(self._data, force=True)
+            else:
+                self.apply_changes(*sync.changes_from_listener(changes))
+            self._listening.set()
+        except Exception as exc:
+            log.exception("Failed to apply catalog changes")
+            self.last_error = exc
+            if not self._listening.is_set():
+                # Nothing to serve yet: wake `_start_listener` so it can fall back
+                self._listen_error = exc
+                self._listening.set()
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
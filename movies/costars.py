@@ -0,0 +1,77 @@
+"""Co-star graph: which actors appear together, and how often.
+
+Built once per catalog version from the actor index (`movies.actors`), whose
+posting lists already map each case-insensitive actor key to its distinct
+movies.  As an actors x movies incidence matrix `M`, the co-appearance matrix
+is `M @ M.T` with the diagonal dropped: a symmetric CSR matrix where entry
+(a, b) is the number of titles actors a and b share, rows and columns in the
+order of `ActorIndex.keys`.  A query is then a row slice:
+
+* `collaborators`: an actor's co-stars, most shared titles first,
+* `second_degree`: the co-stars of their co-stars (not already direct), by
+  how many of the actor's co-stars link to them.
+
+The matrix has one entry per distinct pair of actors sharing a movie, so its
+size grows with the square of the cast sizes rather than with the catalog;
+`nbytes` reports it (see `movies.bench` for the figures at 1M titles).
+"""
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class CoStars:
+    def __init__(self, actors, n_movies):
+        self.actors = actors
+        keys = np.repeat(np.arange(len(actors.keys)), np.diff(actors.offsets))
+        incidence = sp.csr_matrix((np.ones(len(actors.rows), dtype=np.int32), (keys, actors.rows)),
+                                  shape=(len(actors.keys), n_movies))
+        matrix = (incidence @ incidence.T).tocsr()
+        matrix.setdiag(0)
+        matrix.eliminate_zeros()
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.index("actors"), len(data.movies_df))
+
+    def nbytes(self):
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def _row(self, key):
+        lo, hi = self.matrix.indptr[key], self.matrix.indptr[key + 1]
+        return self.matrix.indices[lo:hi], self.matrix.data[lo:hi]
+
+    @staticmethod
+    def _best(keys, counts, n):
+        """`keys` and `counts` of the `n` highest counts, ties in name order."""
+        if len(keys) > n:
+            best = np.argpartition(-counts, n - 1)[:n]
+            keys, counts = keys[best], counts[best]
+        order = np.lexsort((keys, -counts))
+        return keys[order], counts[order]
+
+    def collaborators(self, name, n=10):
+        """`Co-star` / `Shared Titles` frame of the `n` actors who share the most titles with `name`."""
+        key = self.actors._key(name)
+        keys, counts = self._row(key) if key >= 0 else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32))
+        keys, counts = self._best(keys, counts, n)
+        return pd.DataFrame({'Co-star': self.actors.names[keys], 'Shared Titles': counts})
+
+    def second_degree(self, name, n=10):
+        """`Actor` / `Mutual Co-stars` frame of the `n` best-connected co-stars of `name`'s co-stars.
+
+        Direct co-stars and `name` itself are left out.
+        """
+        key = self.actors._key(name)
+        if key < 0:
+            return pd.DataFrame({'Actor': [], 'Mutual Co-stars': []})
+        direct, _ = self._row(key)
+        reached = self.matrix[direct]
+        mutual = np.bincount(reached.indices, minlength=self.matrix.shape[0])
+        mutual[direct] = 0
+        mutual[key] = 0
+        keys = np.flatnonzero(mutual)
+        keys, counts = self._best(keys, mutual[keys], n)
+        return pd.DataFrame({'Actor': self.actors.names[keys], 'Mutual Co-stars': counts})
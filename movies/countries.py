@@ -0,0 +1,383 @@
+"""Production country resolution.
+
+Raw `production_countries` values are resolved to ISO 3166-1 alpha-3 codes,
+which Plotly matches exactly (`locationmode="ISO-3"`).  Names are compared
+after normalisation (case, accents, punctuation and curly apostrophes, "St." /
+"&" spellings and a trailing ", The"), against the ISO names and a table of aliases.  A value
+that does not resolve as a whole is tried as a comma-separated list.
+
+`resolve_country` is memoised, so each distinct raw value is resolved once
+per process no matter how many movies use it.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# ISO 3166-1 alpha-3 code -> name shown in the dashboard
+ISO_COUNTRIES = {
+    "ABW": "Aruba",
+    "AFG": "Afghanistan",
+    "AGO": "Angola",
+    "AIA": "Anguilla",
+    "ALA": "Åland Islands",
+    "ALB": "Albania",
+    "AND": "Andorra",
+    "ARE": "United Arab Emirates",
+    "ARG": "Argentina",
+    "ARM": "Armenia",
+    "ASM": "American Samoa",
+    "ATA": "Antarctica",
+    "ATF": "French Southern Territories",
+    "ATG": "Antigua and Barbuda",
+    "AUS": "Australia",
+    "AUT": "Austria",
+    "AZE": "Azerbaijan",
+    "BDI": "Burundi",
+    "BEL": "Belgium",
+    "BEN": "Benin",
+    "BES": "Caribbean Netherlands",
+    "BFA": "Burkina Faso",
+    "BGD": "Bangladesh",
+    "BGR": "Bulgaria",
+    "BHR": "Bahrain",
+    "BHS": "Bahamas",
+    "BIH": "Bosnia and Herzegovina",
+    "BLM": "Saint Barthélemy",
+    "BLR": "Belarus",
+    "BLZ": "Belize",
+    "BMU": "Bermuda",
+    "BOL": "Bolivia",
+    "BRA": "Brazil",
+    "BRB": "Barbados",
+    "BRN": "Brunei",
+    "BTN": "Bhutan",
+    "BVT": "Bouvet Island",
+    "BWA": "Botswana",
+    "CAF": "Central African Republic",
+    "CAN": "Canada",
+    "CCK": "Cocos Islands",
+    "CHE": "Switzerland",
+    "CHL": "Chile",
+    "CHN": "China",
+    "CIV": "Côte d'Ivoire",
+    "CMR": "Cameroon",
+    "COD": "Democratic Republic of the Congo",
+    "COG": "Congo",
+    "COK": "Cook Islands",
+    "COL": "Colombia",
+    "COM": "Comoros",
+    "CPV": "Cabo Verde",
+    "CRI": "Costa Rica",
+    "CUB": "Cuba",
+    "CUW": "Curaçao",
+    "CXR": "Christmas Island",
+    "CYM": "Cayman Islands",
+    "CYP": "Cyprus",
+    "CZE": "Czech Republic",
+    "DEU": "Germany",
+    "DJI": "Djibouti",
+    "DMA": "Dominica",
+    "DNK": "Denmark",
+    "DOM": "Dominican Republic",
+    "DZA": "Algeria",
+    "ECU": "Ecuador",
+    "EGY": "Egypt",
+    "ERI": "Eritrea",
+    "ESH": "Western Sahara",
+    "ESP": "Spain",
+    "EST": "Estonia",
+    "ETH": "Ethiopia",
+    "FIN": "Finland",
+    "FJI": "Fiji",
+    "FLK": "Falkland Islands",
+    "FRA": "France",
+    "FRO": "Faroe Islands",
+    "FSM": "Micronesia",
+    "GAB": "Gabon",
+    "GBR": "United Kingdom",
+    "GEO": "Georgia",
+    "GGY": "Guernsey",
+    "GHA": "Ghana",
+    "GIB": "Gibraltar",
+    "GIN": "Guinea",
+    "GLP": "Guadeloupe",
+    "GMB": "Gambia",
+    "GNB": "Guinea-Bissau",
+    "GNQ": "Equatorial Guinea",
+    "GRC": "Greece",
+    "GRD": "Grenada",
+    "GRL": "Greenland",
+    "GTM": "Guatemala",
+    "GUF": "French Guiana",
+    "GUM": "Guam",
+    "GUY": "Guyana",
+    "HKG": "Hong Kong",
+    "HMD": "Heard Island and McDonald Islands",
+    "HND": "Honduras",
+    "HRV": "Croatia",
+    "HTI": "Haiti",
+    "HUN": "Hungary",
+    "IDN": "Indonesia",
+    "IMN": "Isle of Man",
+    "IND": "India",
+    "IOT": "British Indian Ocean Territory",
+    "IRL": "Ireland",
+    "IRN": "Iran",
+    "IRQ": "Iraq",
+    "ISL": "Iceland",
+    "ISR": "Israel",
+    "ITA": "Italy",
+    "JAM": "Jamaica",
+    "JEY": "Jersey",
+    "JOR": "Jordan",
+    "JPN": "Japan",
+    "KAZ": "Kazakhstan",
+    "KEN": "Kenya",
+    "KGZ": "Kyrgyzstan",
+    "KHM": "Cambodia",
+    "KIR": "Kiribati",
+    "KNA": "Saint Kitts and Nevis",
+    "KOR": "South Korea",
+    "KWT": "Kuwait",
+    "LAO": "Laos",
+    "LBN": "Lebanon",
+    "LBR": "Liberia",
+    "LBY": "Libya",
+    "LCA": "Saint Lucia",
+    "LIE": "Liechtenstein",
+    "LKA": "Sri Lanka",
+    "LSO": "Lesotho",
+    "LTU": "Lithuania",
+    "LUX": "Luxembourg",
+    "LVA": "Latvia",
+    "MAC": "Macao",
+    "MAF": "Saint Martin",
+    "MAR": "Morocco",
+    "MCO": "Monaco",
+    "MDA": "Moldova",
+    "MDG": "Madagascar",
+    "MDV": "Maldives",
+    "MEX": "Mexico",
+    "MHL": "Marshall Islands",
+    "MKD": "North Macedonia",
+    "MLI": "Mali",
+    "MLT": "Malta",
+    "MMR": "Myanmar",
+    "MNE": "Montenegro",
+    "MNG": "Mongolia",
+    "MNP": "Northern Mariana Islands",
+    "MOZ": "Mozambique",
+    "MRT": "Mauritania",
+    "MSR": "Montserrat",
+    "MTQ": "Martinique",
+    "MUS": "Mauritius",
+    "MWI": "Malawi",
+    "MYS": "Malaysia",
+    "MYT": "Mayotte",
+    "NAM": "Namibia",
+    "NCL": "New Caledonia",
+    "NER": "Niger",
+    "NFK": "Norfolk Island",
+    "NGA": "Nigeria",
+    "NIC": "Nicaragua",
+    "NIU": "Niue",
+    "NLD": "Netherlands",
+    "NOR": "Norway",
+    "NPL": "Nepal",
+    "NRU": "Nauru",
+    "NZL": "New Zealand",
+    "OMN": "Oman",
+    "PAK": "Pakistan",
+    "PAN": "Panama",
+    "PCN": "Pitcairn",
+    "PER": "Peru",
+    "PHL": "Philippines",
+    "PLW": "Palau",
+    "PNG": "Papua New Guinea",
+    "POL": "Poland",
+    "PRI": "Puerto Rico",
+    "PRK": "North Korea",
+    "PRT": "Portugal",
+    "PRY": "Paraguay",
+    "PSE": "Palestine",
+    "PYF": "French Polynesia",
+    "QAT": "Qatar",
+    "REU": "Réunion",
+    "ROU": "Romania",
+    "RUS": "Russia",
+    "RWA": "Rwanda",
+    "SAU": "Saudi Arabia",
+    "SDN": "Sudan",
+    "SEN": "Senegal",
+    "SGP": "Singapore",
+    "SGS": "South Georgia and the South Sandwich Islands",
+    "SHN": "Saint Helena",
+    "SJM": "Svalbard and Jan Mayen",
+    "SLB": "Solomon Islands",
+    "SLE": "Sierra Leone",
+    "SLV": "El Salvador",
+    "SMR": "San Marino",
+    "SOM": "Somalia",
+    "SPM": "Saint Pierre and Miquelon",
+    "SRB": "Serbia",
+    "SSD": "South Sudan",
+    "STP": "Sao Tome and Principe",
+    "SUR": "Suriname",
+    "SVK": "Slovakia",
+    "SVN": "Slovenia",
+    "SWE": "Sweden",
+    "SWZ": "Eswatini",
+    "SXM": "Sint Maarten",
+    "SYC": "Seychelles",
+    "SYR": "Syria",
+    "TCA": "Turks and Caicos Islands",
+    "TCD": "Chad",
+    "TGO": "Togo",
+    "THA": "Thailand",
+    "TJK": "Tajikistan",
+    "TKL": "Tokelau",
+    "TKM": "Turkmenistan",
+    "TLS": "Timor-Leste",
+    "TON": "Tonga",
+    "TTO": "Trinidad and Tobago",
+    "TUN": "Tunisia",
+    "TUR": "Turkey",
+    "TUV": "Tuvalu",
+    "TWN": "Taiwan",
+    "TZA": "Tanzania",
+    "UGA": "Uganda",
+    "UKR": "Ukraine",
+    "UMI": "United States Minor Outlying Islands",
+    "URY": "Uruguay",
+    "USA": "United States",
+    "UZB": "Uzbekistan",
+    "VAT": "Vatican City",
+    "VCT": "Saint Vincent and the Grenadines",
+    "VEN": "Venezuela",
+    "VGB": "British Virgin Islands",
+    "VIR": "US Virgin Islands",
+    "VNM": "Vietnam",
+    "VUT": "Vanuatu",
+    "WLF": "Wallis and Futuna",
+    "WSM": "Samoa",
+    "YEM": "Yemen",
+    "ZAF": "South Africa",
+    "ZMB": "Zambia",
+    "ZWE": "Zimbabwe",
+    "XKX": "Kosovo",  # not assigned by ISO; the code Plotly and the World Bank use
+}
+
+# Other spellings seen in movie data, including former states (mapped to their successor)
+COUNTRY_ALIASES = {
+    "Bolivia, Plurinational State of": "BOL",
+    "Bonaire, Sint Eustatius and Saba": "BES",
+    "Brunei Darussalam": "BRN",
+    "Cocos (Keeling) Islands": "CCK",
+    "Congo, The Democratic Republic of the": "COD",
+    "Czechia": "CZE",
+    "Falkland Islands (Malvinas)": "FLK",
+    "Holy See (Vatican City State)": "VAT",
+    "Iran, Islamic Republic of": "IRN",
+    "Korea, Democratic People's Republic of": "PRK",
+    "Korea, Republic of": "KOR",
+    "Lao People's Democratic Republic": "LAO",
+    "Micronesia, Federated States of": "FSM",
+    "Moldova, Republic of": "MDA",
+    "Palestine, State of": "PSE",
+    "Russian Federation": "RUS",
+    "Saint Helena, Ascension and Tristan da Cunha": "SHN",
+    "Saint Martin (French part)": "MAF",
+    "Sint Maarten (Dutch part)": "SXM",
+    "Syrian Arab Republic": "SYR",
+    "Taiwan, Province of China": "TWN",
+    "Tanzania, United Republic of": "TZA",
+    "Türkiye": "TUR",
+    "Venezuela, Bolivarian Republic of": "VEN",
+    "Viet Nam": "VNM",
+    "Virgin Islands, British": "VGB",
+    "Virgin Islands, U.S.": "VIR",
+    "United States of America": "USA",
+    "USA": "USA",
+    "US": "USA",
+    "U.S.": "USA",
+    "U.S.A.": "USA",
+    "Republic of Korea": "KOR",
+    "People's Republic of China": "CHN",
+    "UK": "GBR",
+    "Great Britain": "GBR",
+    "England": "GBR",
+    "Scotland": "GBR",
+    "Wales": "GBR",
+    "Northern Ireland": "GBR",
+    "Macedonia": "MKD",
+    "Macau": "MAC",
+    "Cape Verde": "CPV",
+    "Swaziland": "SWZ",
+    "Burma": "MMR",
+    "Ivory Coast": "CIV",
+    "Palestinian Territory": "PSE",
+    "Svalbard & Jan Mayen Islands": "SJM",
+    "Republic of the Congo": "COG",
+    "Soviet Union": "RUS",
+    "Yugoslavia": "SRB",
+    "Serbia and Montenegro": "SRB",
+    "Czechoslovakia": "CZE",
+    "West Germany": "DEU",
+    "East Germany": "DEU",
+    "Netherlands Antilles": "CUW",
+}
+
+
+# Typographic apostrophes, which ASCII folding would drop instead of splitting the word
+_APOSTROPHES = str.maketrans({"\u2019": "'", "\u2018": "'", "`": "'"})
+
+
+def _key(name):
+    name = name.translate(_APOSTROPHES)
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    name = name.replace("&", " and ")
+    name = re.sub(r"[^a-z0-9,]+", " ", name)
+    name = re.sub(r"\s*,\s*the$", "", name.strip())
+    name = re.sub(r"^the ", "", name)
+    name = re.sub(r"^st ", "saint ", name)
+    return re.sub(r"\s+", " ", name).strip()
+
+
+_LOOKUP = {}
+for _code, _name in ISO_COUNTRIES.items():
+    _LOOKUP[_key(_name)] = _code
+for _name, _code in COUNTRY_ALIASES.items():
+    _LOOKUP[_key(_name)] = _code
+
+
+@lru_cache(maxsize=None)
+def resolve_country(value):
+    """ISO-3 codes for one raw country value; empty when it can't be resolved."""
+    if not isinstance(value, str):
+        return ()
+    code = _LOOKUP.get(_key(value))
+    if code is not None:
+        return (code,)
+    # e.g. "France, Germany"
+    parts = [part for part in value.split(",") if part.strip()]
+    if len(parts) > 1:
+        codes = [_LOOKUP.get(_key(part)) for part in parts]
+        if all(codes):
+            return tuple(dict.fromkeys(codes))
+    return ()
+
+
+def country_name(code):
+    return ISO_COUNTRIES.get(code, code)
+
+
+def map_country_name(country):
+    """Display name for a raw value (the stripped value itself if unresolved)."""
+    codes = resolve_country(country)
+    return country_name(codes[0]) if len(codes) == 1 else country.strip()
+
+def map_country_names(countries):
+    if not countries:
+        return []
+    return [map_country_name(country) for country in countries if isinstance(country, str)]
@@ -0,0 +1,85 @@
+"""Movie x production-country fact table behind the Page 2 charts.
+
+Built once per catalog version from the resolved ISO-3 `country_codes`
+list column, so the charts can hand Plotly codes instead of names.  Raw
+country values that could not be resolved are counted in `unresolved`.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from movies.countries import country_name, resolve_country
+
+log = logging.getLogger(__name__)
+
+
+class CountryTable:
+    def __init__(self, movies_df, country_codes, raw_countries):
+        rows = country_codes.row_ids
+        codes = country_codes.codes
+        iso3 = country_codes.vocab
+        names = np.array([country_name(code) for code in iso3], dtype=object)
+
+        # One entry per (movie, country), in movie order; country columns stay categorical
+        self.country_df = pd.DataFrame({
+            'Country': pd.Categorical(names).take(codes),
+            'ISO3': pd.Categorical(iso3).take(codes),
+            'Movie Title': movies_df['title'].to_numpy()[rows],
+            'Release Year': movies_df['release_year'].array[rows],
+            'Popularity': movies_df['popularity'].to_numpy()[rows],
+        })
+
+        # Count occurrences of each country and its share of all entries
+        counts = np.bincount(codes, minlength=len(iso3))
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0]
+        self.country_counts = pd.DataFrame({'Country': names[order], 'ISO3': iso3[order], 'Count': counts[order]})
+        self.country_counts['Percentage'] = (self.country_counts['Count'] / self.country_counts['Count'].sum()) * 100
+
+        # Entries grouped by country, for the "Movies by Country" picker
+        self._rows = rows
+        self._codes_by_name = {name: code for code, name in enumerate(names)}
+        self._by_country = np.argsort(codes, kind='stable')
+        self._group_offsets = np.zeros(len(iso3) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._group_offsets[1:])
+        seen, first_seen = np.unique(codes, return_index=True)
+        self._countries = names[seen[np.argsort(first_seen)]].tolist()
+
+        # Raw values with no ISO code, most frequent first
+        raw_counts = raw_countries.counts()
+        unresolved = [(value, count) for value, count in zip(raw_countries.vocab, raw_counts)
+                      if count and not resolve_country(value)]
+        self.unresolved = pd.DataFrame(unresolved, columns=['Country', 'Count']) \
+            .sort_values('Count', ascending=False, kind='stable').reset_index(drop=True)
+        if len(self.unresolved):
+            log.info("%d production country values have no ISO code: %s", len(self.unresolved),
+                     ", ".join(self.unresolved['Country'].head(20)))
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.movies_df, data.lists['country_codes'], data.lists['production_countries'])
+
+    def __len__(self):
+        return len(self.country_df)
+
+    def countries(self):
+        """Country names in order of first appearance."""
+        return self._countries
+
+    def movies_from(self, country):
+        """Rows of `country_df` for one country name."""
+        code = self._codes_by_name.get(country)
+        if code is None:
+            return self.country_df.iloc[:0]
+        entries = self._by_country[self._group_offsets[code]:self._group_offsets[code + 1]]
+        return self.country_df.iloc[entries]
+
+    def movie_positions(self, country):
+        """Positions in `movies_df` of the movies from one country name, in catalog order."""
+        code = self._codes_by_name.get(country)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        entries = self._by_country[self._group_offsets[code]:self._group_offsets[code + 1]]
+        return np.unique(self._rows[entries])
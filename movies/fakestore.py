@@ -0,0 +1,476 @@
+"""In-memory stand-in for the parts of the Firestore client the app uses.
+
+Useful for exercising the catalog, sync and loaders without network access:
+
+    db = FakeClient()
+    db.collection("movies2").document("1").set({"title": "Heat"})
+    catalog = Catalog(db)
+
+Listeners registered with `on_snapshot` are called synchronously on every
+write, with the same `(docs, changes, read_time)` arguments as the real client.
+Transactions work with the real `firestore.transactional` decorator: a commit
+fails with `Aborted` (and the decorator retries) when a document read in the
+transaction was written in the meantime.
+For end-to-end checks against real Firestore semantics, point the regular
+client at the emulator instead (`FIRESTORE_EMULATOR_HOST=localhost:8080`).
+"""
+
+import bisect
+import copy
+import datetime
+import enum
+import threading
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+ChangeType = enum.Enum("ChangeType", "ADDED MODIFIED REMOVED")
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+_MISSING = object()
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        # Like the real client: None for a missing document, KeyError for a missing field
+        if self._data is None:
+            return None
+        if field not in self._data:
+            raise KeyError(f"{field!r} is not contained in the data")
+        return copy.deepcopy(self._data[field])
+
+
+class FakeDocumentChange:
+    def __init__(self, type, document):
+        self.type = type
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, query, callback):
+        self.query = query
+        self.callback = callback
+        self._ids = set()
+
+    def unsubscribe(self):
+        self.query._collection._watches.remove(self)
+
+    def _notify(self, initial=False):
+        docs = self.query.get()
+        ids = {doc.id for doc in docs}
+        changes = []
+        if initial:
+            changes = [FakeDocumentChange(ChangeType.ADDED, doc) for doc in docs]
+        self.callback(docs, changes, _now())
+        self._ids = ids
+
+    def _on_write(self, doc_id, before, after):
+        matched_before = doc_id in self._ids
+        matched_after = after.exists and self.query._matches(after)
+        if matched_after:
+            kind = ChangeType.MODIFIED if matched_before else ChangeType.ADDED
+            change = FakeDocumentChange(kind, after)
+            self._ids.add(doc_id)
+        elif matched_before:
+            change = FakeDocumentChange(ChangeType.REMOVED, before)
+            self._ids.discard(doc_id)
+        else:
+            return
+        self.callback(self.query._run(), [change], _now())
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), fields=None, order=(), limit=None, cursor=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._fields = fields
+        self._order = tuple(order)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, fields=self._fields, order=self._order,
+                     limit=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((_field_name(field_path), op_string, value),))
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(order=self._order + ((_field_name(field_path), direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields):
+        return self._copy(cursor=("after", document_fields))
+
+    def start_at(self, document_fields):
+        return self._copy(cursor=("at", document_fields))
+
+    def _value(self, snapshot, field):
+        if field == "__name__":
+            return snapshot.id
+        return (snapshot._data or {}).get(field, _MISSING)
+
+    def _matches(self, snapshot):
+        for field, op, value in self._filters:
+            actual = self._value(snapshot, field)
+            if field == "__name__" and hasattr(value, "id"):
+                value = value.id
+            if actual is _MISSING:
+                return False
+            try:
+                if not _OPS[op](actual, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _sort_key(self, snapshot):
+        key = tuple(self._value(snapshot, field) for field, _ in self._order)
+        if "__name__" not in dict(self._order):
+            key += (snapshot.id,)
+        return key
+
+    def get(self):
+        docs = self._run()
+        self._collection._client.read_count += len(docs)
+        return docs
+
+    def _run(self):
+        if self._order in ((), (("__name__", "ASCENDING"),)):
+            return self._run_by_id()
+        docs = [doc for doc in self._collection._snapshots(copy_data=False)
+                if self._matches(doc) and all(self._value(doc, field) is not _MISSING for field, _ in self._order)]
+        descending = any(direction == "DESCENDING" for _, direction in self._order)
+        docs.sort(key=self._sort_key, reverse=descending)
+        if self._cursor is not None:
+            kind, anchor = self._cursor
+            if isinstance(anchor, FakeSnapshot):
+                key = self._sort_key(anchor)
+            else:
+                key = tuple(anchor.get(field) for field, _ in self._order)
+            after = kind == "after"
+
+            def past_cursor(doc):
+                doc_key = self._sort_key(doc)[:len(key)]
+                if descending:
+                    return doc_key < key if after else doc_key <= key
+                return doc_key > key if after else doc_key >= key
+
+            docs = [doc for doc in docs if past_cursor(doc)]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return [self._result(doc) for doc in docs]
+
+    def _run_by_id(self):
+        """Document id order: bisect the sorted ids instead of scanning and sorting every document."""
+        collection = self._collection
+        with collection._client._lock:
+            ids = collection._sorted_ids()
+            lo, hi = 0, len(ids)
+            for field, op, value in self._filters:
+                if field != "__name__":
+                    continue
+                value = getattr(value, "id", value)
+                if op in (">", ">="):
+                    lo = max(lo, (bisect.bisect_right if op == ">" else bisect.bisect_left)(ids, value))
+                elif op in ("<", "<="):
+                    hi = min(hi, (bisect.bisect_left if op == "<" else bisect.bisect_right)(ids, value))
+            if self._cursor is not None:
+                kind, anchor = self._cursor
+                anchor = anchor.id if isinstance(anchor, FakeSnapshot) else anchor.get("__name__")
+                lo = max(lo, (bisect.bisect_right if kind == "after" else bisect.bisect_left)(ids, anchor))
+            docs = []
+            for i in range(lo, hi):
+                if self._limit is not None and len(docs) >= self._limit:
+                    break
+                doc_id = ids[i]
+                doc = FakeSnapshot(FakeDocumentReference(collection, doc_id), collection._docs[doc_id],
+                                   collection._times.get(doc_id))
+                if self._matches(doc):
+                    docs.append(doc)
+        return [self._result(doc) for doc in docs]
+
+    def _result(self, doc):
+        # Matching ran on the stored data; copy only what is returned
+        data = doc._data
+        if self._fields is not None:
+            data = {k: v for k, v in data.items() if k in self._fields}
+        return FakeSnapshot(doc.reference, copy.deepcopy(data), doc.update_time)
+
+    def stream(self):
+        return iter(self.get())
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self, callback)
+        self._collection._watches.append(watch)
+        watch._notify(initial=True)
+        return watch
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection.id}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None):
+        data = self._collection._docs.get(self.id)
+        self._collection._client.read_count += 1
+        if transaction is not None:
+            transaction._read(self, data)
+        if data is not None and field_paths is not None:
+            data = {k: v for k, v in data.items() if k in field_paths}
+        return FakeSnapshot(self, copy.deepcopy(data), self._collection._times.get(self.id))
+
+    def set(self, document_data, merge=False):
+        current = self._collection._docs.get(self.id)
+        data = dict(current or {}) if merge else {}
+        for field, value in document_data.items():
+            if value is DELETE_FIELD:
+                data.pop(field, None)
+            else:
+                data[field] = copy.deepcopy(value)
+        self._collection._write(self.id, data)
+
+    def update(self, field_updates):
+        current = self._collection._docs.get(self.id)
+        if current is None:
+            raise KeyError(f"No document to update: {self.path}")
+        data = dict(current)
+        for field, value in field_updates.items():
+            if value is DELETE_FIELD:
+                data.pop(field, None)
+            else:
+                data[field] = _apply_transform(data.get(field), value)
+        self._collection._write(self.id, data)
+
+    def delete(self):
+        self._collection._write(self.id, None)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, collection_id):
+        super().__init__(self)
+        self._client = client
+        self.id = collection_id
+        self._docs = {}
+        self._times = {}
+        self._watches = []
+        self._auto_id = 0
+        self._ids = None
+
+    def document(self, document_id=None):
+        if document_id is None:
+            self._auto_id += 1
+            document_id = f"auto{self._auto_id:012d}"
+        return FakeDocumentReference(self, document_id)
+
+    def add(self, document_data):
+        ref = self.document()
+        ref.set(document_data)
+        return _now(), ref
+
+    def _snapshots(self, copy_data=True):
+        with self._client._lock:
+            items = list(self._docs.items())
+        return [FakeSnapshot(FakeDocumentReference(self, doc_id), copy.deepcopy(data) if copy_data else data,
+                             self._times.get(doc_id))
+                for doc_id, data in items]
+
+    def _sorted_ids(self):
+        if self._ids is None:
+            self._ids = sorted(self._docs)
+        return self._ids
+
+    def _write(self, doc_id, data):
+        ref = FakeDocumentReference(self, doc_id)
+        with self._client._lock:
+            before = FakeSnapshot(ref, self._docs.get(doc_id), self._times.get(doc_id))
+            if (data is None) != (before._data is None):
+                self._ids = None
+            if data is None:
+                self._docs.pop(doc_id, None)
+                self._times.pop(doc_id, None)
+            else:
+                self._docs[doc_id] = _resolve_sentinels(data)
+                self._times[doc_id] = _now()
+            self._client.write_count += 1
+            if not self._watches:
+                return
+            after = FakeSnapshot(ref, copy.deepcopy(self._docs.get(doc_id)), self._times.get(doc_id))
+        for watch in list(self._watches):
+            watch._on_write(doc_id, before, after)
+
+
+class FakeClient:
+    """Minimal `firestore.Client` replacement backed by dicts."""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.RLock()
+        self.read_count = 0
+        self.write_count = 0
+
+    def collection(self, collection_id):
+        if collection_id not in self._collections:
+            self._collections[collection_id] = FakeCollection(self, collection_id)
+        return self._collections[collection_id]
+
+    def get_all(self, references, field_paths=None):
+        for ref in references:
+            yield ref.get(field_paths=field_paths)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return FakeTransaction(self, max_attempts, read_only)
+
+    def bulk_writer(self, options=None):
+        return FakeBulkWriter(self)
+
+
+class FakeWriteBatch:
+    """Collects writes and applies them together on `commit()`."""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(lambda: reference.set(document_data, merge=merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(lambda: reference.update(field_updates))
+
+    def delete(self, reference):
+        self._writes.append(reference.delete)
+
+    def commit(self):
+        with self._client._lock:
+            for write in self._writes:
+                write()
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """The transaction protocol `firestore.transactional` drives (`_begin`, `_commit`, `_rollback`)."""
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._reads = {}
+
+    def _read(self, reference, data):
+        self._reads.setdefault(reference.path, (reference, copy.deepcopy(data)))
+
+    def _clean_up(self):
+        self._writes = []
+        self._reads = {}
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = b"fake-transaction"
+
+    def _commit(self):
+        with self._client._lock:
+            for reference, data in self._reads.values():
+                if reference._collection._docs.get(reference.id) != data:
+                    self._clean_up()
+                    raise api_exceptions.Aborted(f"{reference.path} changed during the transaction")
+            self.commit()
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class FakeBulkWriter(FakeWriteBatch):
+    """Applies writes on `flush()`; writes never fail, so error callbacks are not called."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.write_count = 0
+
+    def create(self, reference, document_data):
+        self.set(reference, document_data)
+
+    def on_write_error(self, callback):
+        pass
+
+    def on_write_result(self, callback):
+        pass
+
+    def flush(self):
+        self.write_count += len(self._writes)
+        self.commit()
+
+    def close(self):
+        self.flush()
+
+
+def _field_name(field_path):
+    # FieldPath.document_id() is the string "__name__" on the real client too
+    return str(field_path)
+
+
+def _resolve_sentinels(data):
+    resolved = {}
+    for field, value in data.items():
+        if type(value).__name__ == "Sentinel":  # firestore.SERVER_TIMESTAMP
+            value = _now()
+        resolved[field] = value
+    return resolved
+
+
+def _apply_transform(current, value):
+    kind = type(value).__name__
+    if kind == "ArrayUnion":
+        items = list(current or [])
+        return items + [v for v in value.values if v not in items]
+    if kind == "ArrayRemove":
+        return [v for v in (current or []) if v not in value.values]
+    if kind == "Sentinel":
+        return _now()
+    return copy.deepcopy(value)
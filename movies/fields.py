@@ -0,0 +1,62 @@
+"""Heavy movie fields fetched on demand.
+
+The catalog only loads the core fields every page needs (see
+`movies.prep.CORE_FIELDS`).  Long text such as `overview` is fetched the first
+time a view asks for it, a batch of documents per round trip, and cached by
+document id for the life of the process.
+"""
+
+import threading
+
+from movies import metrics
+
+# Documents per `get_all` round trip
+BATCH_SIZE = 300
+
+
+class FieldStore:
+    def __init__(self, db, collection, batch_size=BATCH_SIZE):
+        self.db = db
+        self.collection = collection
+        self.batch_size = batch_size
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, field, ids):
+        """Return `{doc_id: value}` for `ids`, reading `field` only (missing -> None)."""
+        collection = self.db.collection(self.collection)
+        ids = list(ids)
+        values = {}
+        for start in range(0, len(ids), self.batch_size):
+            refs = [collection.document(doc_id) for doc_id in ids[start:start + self.batch_size]]
+            with metrics.span("fetch.fields"):
+                docs = list(self.db.get_all(refs, field_paths=[field]))
+            for doc in docs:
+                data = doc.to_dict() if doc.exists else None
+                values[doc.id] = (data or {}).get(field)
+                metrics.count("firestore_bytes_read", metrics.document_size(data))
+            metrics.count("firestore_documents_read", len(docs))
+        return values
+
+    def get(self, field, ids):
+        """Values of `field` for `ids`, in order, fetching the ones not cached yet."""
+        ids = list(ids)
+        with self._lock:
+            cache = self._cache.setdefault(field, {})
+            missing = [doc_id for doc_id in ids if doc_id not in cache]
+            if missing:
+                fetched = self.fetch(field, missing)
+                for doc_id in missing:
+                    cache[doc_id] = fetched.get(doc_id)
+            return [cache[doc_id] for doc_id in ids]
+
+    def discard(self, ids):
+        """Forget cached values of documents that changed."""
+        with self._lock:
+            for cache in self._cache.values():
+                for doc_id in ids:
+                    cache.pop(doc_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,22 @@
+"""Firestore client for the command-line jobs.
+
+The dashboard reads its service account from Streamlit secrets; the jobs take
+a service account JSON file instead, or fall back to Application Default
+Credentials (which also covers ``FIRESTORE_EMULATOR_HOST``).
+"""
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+
+def client(credentials_path=None):
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(credentials_path) if credentials_path else None
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def add_arguments(parser):
+    parser.add_argument("--credentials", metavar="PATH",
+                        help="service account JSON (default: Application Default Credentials)")
+    parser.add_argument("--collection", default="movies2", help="movie collection (default: %(default)s)")
@@ -0,0 +1,72 @@
+"""Movie x genre multi-hot index behind every genre filter.
+
+Built once per catalog version from the parsed `genres_list` column: a dense
+boolean matrix with one row per movie in `movies_df` and one column per
+genre, plus the genre vocabulary in first-seen order.  Filters are column
+lookups and row-wise reductions instead of per-row list checks, so any page
+can do
+
+    mask = catalog_data.index("genres").mask(["Action", "Drama"], match="all")
+    movies_df[mask]
+"""
+
+import numpy as np
+
+
+class GenreIndex:
+    def __init__(self, genres):
+        used = np.flatnonzero(genres.counts() > 0)
+        self.genres = genres.vocab[used].tolist()
+        self._columns = {genre: column for column, genre in enumerate(self.genres)}
+
+        # Column-major so each genre's rows are contiguous
+        column_of_code = np.full(len(genres.vocab), -1, dtype=np.int64)
+        column_of_code[used] = np.arange(len(used))
+        self.matrix = np.zeros((len(genres), len(used)), dtype=bool, order='F')
+        self.matrix[genres.row_ids, column_of_code[genres.codes]] = True
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.lists['genres_list'])
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def columns(self, genres):
+        """Matrix columns of the known `genres`; unknown names are skipped."""
+        return [self._columns[genre] for genre in genres if genre in self._columns]
+
+    def mask(self, genres, match="any"):
+        """Boolean mask over `movies_df` rows.
+
+        `genres` is one genre name or a list of them.  With ``match="any"`` a
+        row matches if it has at least one of the genres, with ``"all"`` only
+        if it has every one (an unknown genre then matches nothing).  An empty
+        list matches nothing for "any" and everything for "all".
+        """
+        if isinstance(genres, str):
+            genres = [genres]
+        columns = self.columns(genres)
+        if match == "any":
+            return self.matrix[:, columns].any(axis=1)
+        if match == "all":
+            if len(columns) < len(set(genres)):
+                return np.zeros(len(self), dtype=bool)
+            return self.matrix[:, columns].all(axis=1)
+        raise ValueError(f"match must be 'any' or 'all', not {match!r}")
+
+    def totals(self, genres, rows, weights=None):
+        """Per-genre count (or sum of `weights`) over the rows selected by `rows`.
+
+        `rows` is a boolean mask over `movies_df`; a movie contributes to every
+        one of its genres.  Returns one value per entry of `genres`.
+        """
+        columns = np.array([self._columns.get(genre, -1) for genre in genres], dtype=np.int64)
+        known = columns >= 0
+        selected = self.matrix[rows][:, columns[known]]
+        totals = np.zeros(len(columns))
+        if weights is None:
+            totals[known] = selected.sum(axis=0)
+        else:
+            totals[known] = np.nan_to_num(np.asarray(weights, dtype=float)[rows]) @ selected
+        return totals
@@ -0,0 +1,189 @@
+"""Bulk ingest of a movie dump into `movies2`.
+
+    python -m movies.ingest movies.csv
+    python -m movies.ingest movies.jsonl --id-field tmdb_id --dry-run
+
+The dump (CSV, JSON lines or a JSON array) is read in chunks and normalized
+once, here, so readers no longer have to:
+
+* `genres_list`, `production_countries` and `Cast_list` become native arrays
+  (stringified lists are parsed with `movies.normalize`),
+* production countries are rewritten to their canonical names with the app's
+  country resolver (values it does not know are kept as they are),
+* `release_year` becomes an integer (taken from `release_date` when missing),
+  `popularity` and `revenue` numbers.
+
+Documents are keyed by the dump's movie id and written with `BulkWriter`
+(batched, throttled, retried) as merge upserts, so re-running an ingest is
+idempotent.  Every write sets `updated_at` and clears `deleted`, so running
+dashboards pick the changes up on their next sync.
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from firebase_admin import firestore
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions
+
+from movies import firebase, sync
+from movies.countries import country_name, resolve_country
+from movies.normalize import parse_list_column
+from movies.prep import LIST_FIELDS, MOVIE_FIELDS
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+TEXT_FIELDS = ['title', 'release_date', 'overview']
+NUMBER_FIELDS = ['popularity', 'revenue']
+
+
+def read_dump(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the dump at `path` as DataFrame chunks."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=object, keep_default_na=False, na_values=[""])
+    elif extension in (".jsonl", ".ndjson"):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    elif extension == ".json":
+        frame = pd.read_json(path, dtype=False)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Unsupported dump format {extension!r}, expected .csv, .jsonl or .json")
+
+
+def canonical_countries(value):
+    codes = resolve_country(value)
+    return [country_name(code) for code in codes] if codes else [value]
+
+
+def _document_id(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _nullable(values):
+    """Object array with NaN replaced by None."""
+    series = pd.Series(values, dtype=object)
+    return series.where(series.notna(), None).to_numpy()
+
+
+def normalize_chunk(frame, id_field="id"):
+    """Return `(ids, documents, malformed)` for one chunk of the dump.
+
+    Rows without an id are skipped.  Only fields the dump has a column for
+    are written, so a partial dump (e.g. just ratings) leaves the others as
+    they are.  `malformed` counts list values that could not be parsed
+    (written as empty arrays).
+    """
+    if id_field not in frame:
+        raise ValueError(f"The dump has no {id_field!r} column to key documents by "
+                         f"(columns: {', '.join(map(str, frame.columns))}); choose one with --id-field")
+    frame = frame[frame[id_field].notna()]
+    ids = [_document_id(value) for value in frame[id_field]]
+    columns, malformed = {}, {}
+    for field in MOVIE_FIELDS:
+        if field not in frame:
+            continue
+        values = frame[field].to_numpy(dtype=object)
+        if field in LIST_FIELDS:
+            column, malformed[field] = parse_list_column(values)
+            if field == 'production_countries':
+                column = column.expand_values(canonical_countries)
+            columns[field] = [list(dict.fromkeys(row)) for row in column.to_lists()]
+        elif field in NUMBER_FIELDS:
+            columns[field] = _nullable(pd.to_numeric(values, errors='coerce').astype(float))
+        elif field in TEXT_FIELDS:
+            columns[field] = [value if isinstance(value, str) else None for value in _nullable(values)]
+
+    if 'release_year' in frame or 'release_date' in frame:
+        years = pd.to_numeric(frame['release_year'], errors='coerce') if 'release_year' in frame \
+            else pd.Series(np.nan, index=frame.index)
+        if 'release_date' in columns:
+            dates = pd.to_datetime(pd.Series(columns['release_date'], index=frame.index), errors='coerce')
+            years = years.fillna(dates.dt.year)
+        columns['release_year'] = [int(year) if pd.notna(year) else None for year in years]
+
+    fields = list(columns)
+    documents = [dict(zip(fields, row)) for row in zip(*(columns[field] for field in fields))]
+    for document in documents:
+        document[sync.UPDATED_AT_FIELD] = firestore.SERVER_TIMESTAMP
+        document[sync.DELETED_FIELD] = firestore.DELETE_FIELD
+    return ids, documents, malformed
+
+
+class Ingest:
+    """Writes normalized documents through one `BulkWriter`."""
+
+    def __init__(self, db, collection="movies2", initial_rate=500, max_rate=10000, retries=5):
+        self.collection = db.collection(collection)
+        self.retries = retries
+        self.failed = []
+        self.writer = db.bulk_writer(options=BulkWriterOptions(
+            initial_ops_per_second=initial_rate, max_ops_per_second=max_rate, retry=BulkRetry.exponential))
+        self.writer.on_write_error(self._on_error)
+
+    def _on_error(self, failure, writer):
+        if failure.attempts < self.retries:
+            return True
+        log.error("Giving up on %s after %d attempts: %s",
+                  failure.operation.reference.id, failure.attempts, failure.message)
+        self.failed.append(failure.operation.reference.id)
+        return False
+
+    def write(self, ids, documents):
+        for doc_id, document in zip(ids, documents):
+            self.writer.set(self.collection.document(doc_id), document, merge=True)
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movies.ingest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="CSV, JSON lines (.jsonl) or JSON array dump")
+    firebase.add_arguments(parser)
+    parser.add_argument("--id-field", default="id", help="column holding the movie id (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--initial-rate", type=int, default=500, help="initial writes per second")
+    parser.add_argument("--max-rate", type=int, default=10000, help="maximum writes per second")
+    parser.add_argument("--retries", type=int, default=5, help="attempts per document before giving up")
+    parser.add_argument("--dry-run", action="store_true", help="normalize and report without writing")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    ingest = None
+    if not args.dry_run:
+        ingest = Ingest(firebase.client(args.credentials), args.collection, args.initial_rate, args.max_rate,
+                        args.retries)
+    start = time.perf_counter()
+    total, malformed = 0, {}
+    for chunk in read_dump(args.path, args.chunk_size):
+        try:
+            ids, documents, chunk_malformed = normalize_chunk(chunk, args.id_field)
+        except ValueError as exc:
+            parser.error(str(exc))
+        if ingest is not None:
+            ingest.write(ids, documents)
+        total += len(ids)
+        for field, count in chunk_malformed.items():
+            malformed[field] = malformed.get(field, 0) + count
+        log.info("%d movies %s (%.0f/s)", total, "normalized" if args.dry_run else "written",
+                 total / (time.perf_counter() - start))
+    if ingest is not None:
+        ingest.close()
+    if any(malformed.values()):
+        log.warning("Malformed list values written as empty arrays: %s", malformed)
+    if ingest is not None and ingest.failed:
+        log.error("%d documents failed to write", len(ingest.failed))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Parallel full load of a movie collection.
+
+A full load is split into key ranges that are fetched concurrently by a small
+thread pool.  The ranges come from Firestore partition queries
+(`collection_group(...).get_partitions`) when the client supports them, and
+otherwise from fixed document-id ranges, which only balance well for
+auto-generated ids but are always correct.
+
+Each range is read in pages ordered by document id, so a failed round trip
+is retried on its own page with exponential backoff.  Every page is parsed
+straight into a columnar block (`movies.prep.parse_movies`) and the blocks are
+concatenated at the end; no list of all raw documents is ever built.
+
+All knobs can be passed to `CollectionLoader` or set through the environment:
+``MOVIES_LOAD_WORKERS``, ``MOVIES_LOAD_PAGE_SIZE``, ``MOVIES_LOAD_RETRIES`` and
+``MOVIES_LOAD_BACKOFF`` (seconds before the first retry).
+"""
+
+import logging
+import os
+import random
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from google.api_core import exceptions as api_exceptions
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from movies import metrics, sync
+from movies.normalize import ListColumn
+from movies.prep import MOVIE_FIELDS, parse_movies
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("MOVIES_LOAD_WORKERS", "8"))
+DEFAULT_PAGE_SIZE = int(os.environ.get("MOVIES_LOAD_PAGE_SIZE", "1000"))
+DEFAULT_RETRIES = int(os.environ.get("MOVIES_LOAD_RETRIES", "3"))
+DEFAULT_BACKOFF = float(os.environ.get("MOVIES_LOAD_BACKOFF", "0.5"))
+
+# Errors worth another attempt; anything else fails the load
+RETRYABLE = (
+    api_exceptions.Aborted,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+)
+
+# Document ids in Firestore's (byte-wise) order, used to cut id ranges
+_ID_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+
+def id_ranges(count):
+    """Split the document id space into `count` `(start, end)` ranges (None = open)."""
+    cuts = sorted({_ID_ALPHABET[i * len(_ID_ALPHABET) // count] for i in range(1, count)})
+    return list(zip([None] + cuts, cuts + [None]))
+
+
+class CollectionLoader:
+    def __init__(self, workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, partitions=None):
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.retries = retries
+        self.backoff = backoff
+        # More ranges than workers, so one slow range does not hold up the rest
+        self.partitions = partitions or self.workers * 4
+
+    def _ranges(self, db, collection):
+        """Queries ordered by document id that together cover `collection`."""
+        if self.partitions > 1 and hasattr(db, "collection_group"):
+            try:
+                # Collection group partitions also cover subcollections named `collection`
+                partitions = list(db.collection_group(collection).get_partitions(self.partitions))
+                return [partition.query() for partition in partitions]
+            except (api_exceptions.GoogleAPICallError, NotImplementedError, AttributeError):
+                log.info("Partition queries unavailable for %s, using id ranges", collection, exc_info=True)
+        ref = db.collection(collection)
+        queries = []
+        for start, end in id_ranges(self.partitions):
+            query = ref
+            if start is not None:
+                query = query.where(filter=FieldFilter(FieldPath.document_id(), ">=", ref.document(start)))
+            if end is not None:
+                query = query.where(filter=FieldFilter(FieldPath.document_id(), "<", ref.document(end)))
+            queries.append(query.order_by(FieldPath.document_id()))
+        return queries
+
+    def _page(self, query):
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.span("fetch.page"):
+                    return list(query.stream())
+            except RETRYABLE as exc:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                log.warning("Retrying page in %.1fs after %s (attempt %d of %d)",
+                            delay, exc, attempt + 1, self.retries)
+                time.sleep(delay)
+
+    def _load_range(self, query, fields):
+        """Parse one range page by page; returns a list of `(movies, lists, malformed, cursor)` blocks."""
+        if fields is not None:
+            query = query.select(list(fields) + [sync.UPDATED_AT_FIELD, sync.DELETED_FIELD])
+        blocks, last = [], None
+        while True:
+            page = query.limit(self.page_size)
+            docs = self._page(page.start_after(last) if last is not None else page)
+            if not docs:
+                return blocks
+            records = [doc.to_dict() for doc in docs]
+            metrics.count("firestore_documents_read", len(records))
+            metrics.count("firestore_bytes_read", sum(map(metrics.document_size, records)))
+            # Soft-deleted documents still move the cursor but are not movies
+            live = [i for i, record in enumerate(records) if not record.get(sync.DELETED_FIELD)]
+            with metrics.span("parse.page"):
+                blocks.append(parse_movies([records[i] for i in live], [docs[i].id for i in live],
+                                           fields or MOVIE_FIELDS) + (sync.latest_update(records),))
+            if len(docs) < self.page_size:
+                return blocks
+            last = docs[-1]
+
+    def load(self, db, collection, fields=None):
+        """Fetch and parse every document of `collection`, projected to `fields` (None = all).
+
+        Returns `(movies, lists, malformed, cursor)` like `parse_movies`, plus
+        the newest `updated_at` seen.
+        """
+        queries = self._ranges(db, collection)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="catalog-load") as pool:
+            blocks = [block for blocks in pool.map(lambda query: self._load_range(query, fields), queries)
+                      for block in blocks]
+        if not blocks:
+            return parse_movies([], [], fields or MOVIE_FIELDS) + (None,)
+
+        movies = pd.concat([block[0] for block in blocks])
+        lists = {field: ListColumn.concat_all([block[1][field] for block in blocks]) for field in blocks[0][1]}
+        malformed = {field: sum(block[2][field] for block in blocks) for field in blocks[0][2]}
+        cursors = [block[3] for block in blocks if block[3] is not None]
+        log.info("Fetched %d movies from %s in %d pages over %d ranges",
+                 len(movies), collection, len(blocks), len(queries))
+        return movies, lists, malformed, max(cursors) if cursors else None
@@ -0,0 +1,305 @@
+"""Concurrent-session load test of the dashboard, without a browser.
+
+    python -m movies.loadtest                            # 50 users per scenario
+    python -m movies.loadtest --users 50 100 200 --movies 100000 --json load.json
+    python -m movies.loadtest --emulator --credentials sa.json
+
+Every simulated user drives its own session of the dashboard script through
+Streamlit's `AppTest` (one thread per user, all started together), so the
+sessions share the process-wide catalog, caches and Firestore client the way
+real sessions on one server do.  A scenario is a scripted click path:
+
+* ``page1``: log in, move the year slider, change the genre, search a title
+  and add it to the to-watch list,
+* ``page2``: log in, pick a country, change the genres and the year range,
+* ``page3``: log in, search an actor (exact name and a prefix), flip the
+  most/least titles toggle.
+
+Each rerun a step triggers is timed.  Per scenario and user count the report
+has the p50/p95/p99/max rerun latency, the Firestore documents read and
+written (from `movies.metrics` counters), failed reruns and the process
+memory (resident set size after the run and the peak so far).
+
+By default the dashboard runs against `--movies` synthetic movies in an
+in-memory Firestore (``MOVIES_FAKE_FIRESTORE``).  With `--emulator` it uses
+its normal Firestore setup, so point ``FIRESTORE_EMULATOR_HOST`` at a
+populated emulator; the load test users are created there first.
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+
+from movies import metrics, synthetic
+
+log = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCRIPT = os.path.join(ROOT, "streamlit.py")
+DEFAULT_USERS = (50,)
+PASSWORD = "loadtest"
+YEARS = (1950, 2024)
+TITLE_QUERIES = ["night", "the", "golden", "lost river", "star", "dark city"]
+ACTOR_QUERIES = ["James Smith", "Mary Johnson", "Hiroshi", "Lars O'", "jean", "Ama Mensah"]
+
+
+def _app_test():
+    # The dashboard script is named streamlit.py; keep the repository root
+    # off the path while importing, or it would shadow the package
+    path = sys.path[:]
+    sys.path[:] = [entry for entry in path if os.path.abspath(entry or ".") != ROOT]
+    try:
+        from streamlit.testing.v1 import AppTest
+    finally:
+        sys.path[:] = path
+    return AppTest
+
+
+@contextlib.contextmanager
+def _shared_runtime():
+    """Share a Streamlit runtime and the compiled script between parallel sessions.
+
+    `AppTest` installs a stand-in runtime for each run and removes it when the
+    run ends, which would pull it from under the runs of other sessions; with
+    this, a lookup in between gets the most recently installed one.  It also
+    compiles the script on every run, which a server does once (and which is
+    not thread-safe on Python 3.11).
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    installed = []
+    compiled = {}
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def bytecode(cache, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(cache, script_path)
+            return compiled[script_path]
+
+    def instance(cls):
+        if cls._instance is not None:
+            installed[:] = [cls._instance]
+        if installed:
+            return installed[0]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    with mock.patch.object(Runtime, "instance", classmethod(instance)), \
+            mock.patch.object(Runtime, "exists", classmethod(lambda cls: cls._instance is not None or bool(installed))), \
+            mock.patch.object(ScriptCache, "get_bytecode", bytecode):
+        yield
+
+
+def _widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r} on the page")
+
+
+class Session:
+    """One simulated user: an `AppTest` session and the latency of every rerun."""
+
+    def __init__(self, app_test, username, rng, timeout):
+        self.at = app_test
+        self.username = username
+        self.rng = rng
+        self.timeout = timeout
+        self.latencies = []
+        self.failed = 0
+
+    def run(self, step, widget=None):
+        start = time.perf_counter()
+        (widget or self.at).run(timeout=self.timeout)
+        self.latencies.append((step, time.perf_counter() - start))
+        if self.at.exception:
+            self.failed += 1
+            log.warning("%s: %s raised %s", self.username, step, self.at.exception[0].message)
+
+    def login(self, page):
+        self.run("open")
+        sidebar = self.at.sidebar
+        _widget(sidebar.text_input, "Username (Login)").input(self.username)
+        _widget(sidebar.text_input, "Password (Login)").input(PASSWORD)
+        self.run("login", _widget(sidebar.button, "Login").click())
+        if page != "Page 1":
+            self.run("navigate", _widget(self.at.sidebar.radio, "Go to").set_value(page))
+
+
+def page1(session):
+    at, rng = session.at, session.rng
+    session.login("Page 1")
+    for _ in range(2):
+        session.run("year_slider", _widget(at.slider, "Filter by Year").set_value(rng.randint(*YEARS)))
+    genre = _widget(at.selectbox, "Filter by Genre")
+    session.run("genre", genre.set_value(rng.choice(genre.options)))
+    session.run("title_search", at.text_input(key="movie_to_add_query").input(rng.choice(TITLE_QUERIES)))
+    if at.selectbox(key="movie_to_add").value is not None:
+        session.run("add_to_list", _widget(at.button, "Add to To-Watch List").click())
+
+
+def page2(session):
+    at, rng = session.at, session.rng
+    session.login("Page 2")
+    country = _widget(at.selectbox, "Select a country to view movies:")
+    if country.options:
+        session.run("country", country.set_value(rng.choice(country.options)))
+    genres = _widget(at.multiselect, "Select Genre(s):")
+    session.run("genres", genres.set_value(rng.sample(genres.options, min(3, len(genres.options)))))
+    years = _widget(at.slider, "Select Year Range:")
+    first, last = int(years.min), int(years.max)
+    low, high = sorted(rng.sample(range(first, last + 1), 2)) if last > first else (first, last)
+    session.run("year_range", years.set_value((low, high)))
+
+
+def page3(session):
+    at, rng = session.at, session.rng
+    session.login("Page 3")
+    for query in rng.sample(ACTOR_QUERIES, 2):
+        session.run("actor_search", _widget(at.text_input, "Enter the name of an actor:").input(query))
+    session.run("toggle", _widget(at.radio, "Toggle to view actors featured in:").set_value("Least Titles"))
+
+
+SCENARIOS = {"page1": page1, "page2": page2, "page3": page3}
+
+
+def _memory():
+    """`(rss, peak_rss)` of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # kilobytes on Linux
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        rss = None
+    return rss, peak
+
+
+def _percentiles(seconds):
+    if not seconds:
+        return {}
+    values = np.array(seconds) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)), 'max_ms': float(values.max())}
+
+
+def create_users(db, count):
+    """Load test accounts `loadtest-0` ... with empty lists; returns their names."""
+    names = [f"loadtest-{i}" for i in range(count)]
+    for name in names:
+        db.collection('users').document(name).set({"password": PASSWORD, "to_watch": [], "favorites": []})
+    return names
+
+
+def run_scenario(script, scenario, usernames, seed=0, timeout=120):
+    """Run `scenario` for every user at once; returns its report."""
+    AppTest = _app_test()
+    start_together = threading.Barrier(len(usernames))
+
+    def user(i, username):
+        session = Session(AppTest.from_file(script, default_timeout=timeout), username,
+                          random.Random(f"{seed}/{scenario}/{i}"), timeout)
+        start_together.wait()
+        try:
+            SCENARIOS[scenario](session)
+            return session, None
+        except Exception as exc:  # a timeout or a missing widget ends this user's run
+            log.warning("%s: %s stopped: %r", username, scenario, exc)
+            return session, exc
+
+    before = metrics.registry.snapshot()['counters']
+    start = time.perf_counter()
+    with _shared_runtime(), concurrent.futures.ThreadPoolExecutor(len(usernames)) as pool:
+        results = list(pool.map(user, range(len(usernames)), usernames))
+    seconds = time.perf_counter() - start
+    after = metrics.registry.snapshot()['counters']
+
+    latencies = [latency for session, _ in results for _, latency in session.latencies]
+    steps = {}
+    for session, _ in results:
+        for step, latency in session.latencies:
+            steps.setdefault(step, []).append(latency)
+    rss, peak = _memory()
+    return {
+        'scenario': scenario,
+        'users': len(usernames),
+        'seconds': seconds,
+        'reruns': len(latencies),
+        **_percentiles(latencies),
+        'failed_reruns': sum(session.failed for session, _ in results),
+        'stopped_users': sum(exc is not None for _, exc in results),
+        **{name: after.get(name, 0) - before.get(name, 0)
+           for name in ('firestore_documents_read', 'firestore_bytes_read', 'firestore_documents_written')},
+        'rss_bytes': rss,
+        'peak_rss_bytes': peak,
+        'steps': {step: _percentiles(values) for step, values in steps.items()},
+    }
+
+
+def _log_report(report):
+    rss = f"{report['rss_bytes'] / 2 ** 20:.0f}" if report['rss_bytes'] is not None else "?"
+    log.info("%-6s %4d users  p50 %7.0f ms  p95 %7.0f ms  p99 %7.0f ms  max %7.0f ms  "
+             "%8d reads  %5d writes  %3d failed  RSS %s MB (peak %.0f MB)",
+             report['scenario'], report['users'], report.get('p50_ms', 0), report.get('p95_ms', 0),
+             report.get('p99_ms', 0), report.get('max_ms', 0), report['firestore_documents_read'],
+             report['firestore_documents_written'], report['failed_reruns'] + report['stopped_users'],
+             rss, report['peak_rss_bytes'] / 2 ** 20)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movies.loadtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, nargs="+", default=list(DEFAULT_USERS),
+                        help="simultaneous users, one run per count (default: %(default)s)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--movies", type=int, default=10000, help="synthetic catalog size (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the users' choices")
+    parser.add_argument("--emulator", action="store_true",
+                        help="use the dashboard's Firestore setup (FIRESTORE_EMULATOR_HOST) instead of a fake")
+    parser.add_argument("--credentials", metavar="PATH", help="service account JSON for --emulator")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="dashboard script (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--json", metavar="PATH", help="write the reports to a JSON file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Headless sessions warn about missing browser context on every rerun
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    if args.emulator:
+        from movies import firebase
+        db = firebase.client(args.credentials)
+    else:
+        os.environ["MOVIES_FAKE_FIRESTORE"] = str(args.movies)
+        start = time.perf_counter()
+        db = synthetic.fake_client(args.movies)  # the instance the dashboard gets
+        log.info("Generated %d movies in %.1fs", args.movies, time.perf_counter() - start)
+    usernames = create_users(db, max(args.users))
+
+    # Load the catalog once, so the first scenario does not time the cold start
+    start = time.perf_counter()
+    _app_test().from_file(args.script, default_timeout=args.timeout).run()
+    log.info("Dashboard warmed up in %.1fs", time.perf_counter() - start)
+
+    reports = []
+    for users in args.users:
+        for scenario in args.scenarios:
+            reports.append(run_scenario(args.script, scenario, usernames[:users], args.seed, args.timeout))
+            _log_report(reports[-1])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Timing spans and counters for the catalog pipeline and the pages.
+
+    with metrics.span("parse.page"):
+        ...
+    metrics.count("firestore_documents_read", len(docs))
+
+Span names start with their stage: ``fetch.*`` (Firestore round trips),
+``parse.*``, ``derive.*`` (catalog preparation and indexes), ``filter.*``,
+``chart.*`` (figure construction) and ``user_doc.*`` (user document reads and
+writes); ``catalog.*`` spans cover whole loads and syncs.
+
+Every span is added to process-wide totals (count, total and slowest seconds
+per name).  Spans and counts made by a thread that has begun a `Trace` are
+also recorded on it, so a dashboard rerun can show where its own time went;
+background refreshes only show up in the totals.
+
+Exports:
+
+* `MOVIES_METRICS_LOG`: a JSON lines file, one line per finished trace,
+* `MOVIES_METRICS_TEXTFILE`: the totals in Prometheus text format, rewritten
+  after every trace (for the node exporter's textfile collector),
+* `Metrics.prometheus_text()` for anything else that wants to serve them.
+"""
+
+import contextlib
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from movies.persist import atomic_write
+
+log = logging.getLogger(__name__)
+
+METRICS_LOG = os.environ.get("MOVIES_METRICS_LOG")
+METRICS_TEXTFILE = os.environ.get("MOVIES_METRICS_TEXTFILE")
+
+_NOT_METRIC = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def document_size(data):
+    """Approximate stored size of a Firestore document's fields, in bytes.
+
+    Follows Firestore's storage size rules: strings count their UTF-8 length
+    plus one, numbers, timestamps and references eight bytes, maps their keys
+    and values.
+    """
+    size = 0
+    for key, value in (data or {}).items():
+        size += len(key) + 1 + _value_size(value)
+    return size
+
+
+def _value_size(value):
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item) for item in value)
+    if isinstance(value, dict):
+        return document_size(value)
+    if value is None or isinstance(value, bool):
+        return 1
+    return 8
+
+
+class Trace:
+    """Spans and counts recorded by one thread between `begin_trace` and `end_trace`."""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.seconds = None
+        self.spans = []
+        self.counters = {}
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def to_dict(self):
+        return {
+            'trace': self.name,
+            'started_at': self.started_at.isoformat(),
+            'seconds': self.seconds,
+            'spans': [{'name': name, 'start': start, 'seconds': seconds, 'depth': depth}
+                      for name, start, seconds, depth in self.spans],
+            'counters': self.counters,
+        }
+
+
+class Metrics:
+    def __init__(self, log_path=METRICS_LOG, textfile_path=METRICS_TEXTFILE):
+        self.log_path = log_path
+        self.textfile_path = textfile_path
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def current_trace(self):
+        return getattr(self._local, "trace", None)
+
+    def begin_trace(self, name=None):
+        """Start recording this thread's spans on a new `Trace` (replacing an unfinished one)."""
+        trace = Trace(name)
+        self._local.trace = trace
+        return trace
+
+    def end_trace(self):
+        """Finish this thread's trace and export it; returns it (None without one)."""
+        trace = self.current_trace()
+        if trace is None:
+            return None
+        self._local.trace = None
+        trace.seconds = time.perf_counter() - trace._start
+        self.export(trace)
+        return trace
+
+    @contextlib.contextmanager
+    def span(self, name):
+        trace = self.current_trace()
+        start = time.perf_counter()
+        if trace is not None:
+            trace._depth += 1
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if trace is not None:
+                trace._depth -= 1
+                trace.spans.append((name, start - trace._start, seconds, trace._depth))
+            with self._lock:
+                stats = self._spans.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        trace = self.current_trace()
+        if trace is not None:
+            trace.counters[name] = trace.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Process totals: `{'spans': {name: {count, seconds, max_seconds}}, 'counters': {name: value}}`."""
+        with self._lock:
+            return {
+                'spans': {name: {'count': count, 'seconds': total, 'max_seconds': slowest}
+                          for name, (count, total, slowest) in self._spans.items()},
+                'counters': dict(self._counters),
+            }
+
+    def prometheus_text(self):
+        totals = self.snapshot()
+        lines = ["# HELP movies_span_seconds Time spent in each pipeline stage.",
+                 "# TYPE movies_span_seconds summary"]
+        for name, stats in sorted(totals['spans'].items()):
+            lines.append(f'movies_span_seconds_sum{{span="{name}"}} {stats["seconds"]:.6f}')
+            lines.append(f'movies_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        lines += ["# HELP movies_span_max_seconds Slowest single run of each stage.",
+                  "# TYPE movies_span_max_seconds gauge"]
+        for name, stats in sorted(totals['spans'].items()):
+            lines.append(f'movies_span_max_seconds{{span="{name}"}} {stats["max_seconds"]:.6f}')
+        for name, value in sorted(totals['counters'].items()):
+            metric = f"movies_{_NOT_METRIC.sub('_', name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, trace):
+        try:
+            if self.log_path:
+                line = json.dumps(trace.to_dict())
+                with self._lock, open(self.log_path, "a") as f:
+                    f.write(line + "\n")
+            if self.textfile_path:
+                self._write_textfile()
+        except OSError:
+            log.warning("Failed to export metrics", exc_info=True)
+
+    def _write_textfile(self):
+        with atomic_write(self.textfile_path) as f:
+            f.write(self.prometheus_text())
+
+
+# The process-wide registry used by the data layer and the dashboard
+registry = Metrics()
+span = registry.span
+count = registry.count
@@ -0,0 +1,250 @@
+"""Batch parsing of list-valued movie fields into a compact CSR layout.
+
+`genres_list`, `production_countries` and `Cast_list` arrive as native
+arrays once ingested with `movies.ingest`, and otherwise as stringified Python
+lists (``"['Action', 'Drama']"``) or plain strings.  `parse_list_column` parses a whole column at once
+and returns a `ListColumn`: one `offsets` array and one `codes` array into a
+shared vocabulary, with no Python list kept per row.
+
+The common shape (single-quoted items without escapes) is validated and split
+with Arrow's regex kernels in one pass over the column.  Anything else that
+looks like a list falls back to `ast.literal_eval`, so the result matches what
+the old per-row parsers produced.  Values that cannot be parsed count as
+malformed and become empty lists.
+"""
+
+import ast
+from functools import cached_property
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# "['a', 'b']" with no quotes or backslashes inside the items
+_SIMPLE_LIST = r"^\[\s*(?:'[^'\"\\]*'(?:\s*,\s*'[^'\"\\]*')*\s*,?)?\s*\]$"
+_LIST_ENDS = r"^\[\s*'?|'?\s*,?\s*\]$"
+_ITEM_SEPARATOR = r"'\s*,\s*'"
+
+
+def _int_dtype(limit, smallest=np.int8):
+    """Smallest signed integer dtype, at least `smallest`, that holds `limit`."""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.dtype(dtype).itemsize >= np.dtype(smallest).itemsize and limit <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class ListColumn:
+    """Variable-length string lists for `n` rows, stored CSR-style.
+
+    Row `i` holds `vocab[codes[offsets[i]:offsets[i + 1]]]`.  Codes use the
+    narrowest integer type the vocabulary allows (a byte per genre entry) and
+    offsets are 32-bit unless the column has more than 2**31 entries.
+    """
+
+    def __init__(self, offsets, codes, vocab):
+        self.vocab = np.asarray(vocab, dtype=object)
+        offsets = np.asarray(offsets)
+        self.offsets = offsets.astype(_int_dtype(offsets[-1] if len(offsets) else 0, np.int32), copy=False)
+        self.codes = np.asarray(codes).astype(_int_dtype(len(self.vocab)), copy=False)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def empty(cls, n=0):
+        return cls(np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), [])
+
+    @classmethod
+    def from_rows(cls, rows, values, n):
+        """Build from row numbers (sorted) and the matching string `values`."""
+        encoded = pc.dictionary_encode(values)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+        return cls(offsets, encoded.indices.to_numpy(zero_copy_only=False),
+                   encoded.dictionary.to_numpy(zero_copy_only=False))
+
+    @cached_property
+    def vocab_index(self):
+        return {value: code for code, value in enumerate(self.vocab)}
+
+    @cached_property
+    def row_ids(self):
+        """Row number of every entry in `codes`."""
+        return np.repeat(np.arange(len(self), dtype=_int_dtype(len(self), np.int32)), self.lengths())
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def row(self, i):
+        return self.vocab[self.codes[self.offsets[i]:self.offsets[i + 1]]].tolist()
+
+    def to_lists(self):
+        return [self.row(i) for i in range(len(self))]
+
+    def counts(self):
+        """Number of entries per vocabulary code."""
+        return np.bincount(self.codes, minlength=len(self.vocab))
+
+    def values(self):
+        """Distinct values that occur in at least one row."""
+        return self.vocab[self.counts() > 0].tolist()
+
+    def code(self, value):
+        return self.vocab_index.get(value, -1)
+
+    def contains(self, value):
+        """Boolean mask of rows whose list includes `value`."""
+        return self.contains_any([value])
+
+    def contains_any(self, values):
+        codes = [self.code(value) for value in values]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.row_ids[np.isin(self.codes, codes)]] = True
+        return mask
+
+    def take(self, positions):
+        """Rows at `positions`, in that order."""
+        positions = np.asarray(positions, dtype=np.int64)
+        lengths = self.lengths()[positions]
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        starts = self.offsets[:-1][positions] - offsets[:-1]
+        gather = np.repeat(starts, lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return ListColumn(offsets, self.codes[gather], self.vocab)
+
+    def scatter(self, positions, n):
+        """Place row `i` at `positions[i]` (increasing) of `n` rows; others are empty."""
+        lengths = np.zeros(n, dtype=np.int64)
+        lengths[np.asarray(positions, dtype=np.int64)] = self.lengths()
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return ListColumn(offsets, self.codes, self.vocab)
+
+    def concat(self, other):
+        """Rows of `self` followed by rows of `other`, sharing one vocabulary."""
+        return ListColumn.concat_all([self, other])
+
+    @classmethod
+    def concat_all(cls, columns):
+        """Rows of every column in turn, with the vocabularies merged once."""
+        lookup = {}
+        offsets, codes, base = [np.zeros(1, dtype=np.int64)], [], 0
+        for column in columns:
+            remap = np.array([lookup.setdefault(value, len(lookup)) for value in column.vocab], dtype=np.int32)
+            codes.append(remap[column.codes] if len(remap) else column.codes)
+            offsets.append(column.offsets[1:].astype(np.int64) - column.offsets[0] + base)
+            base += int(column.offsets[-1] - column.offsets[0])
+        return cls(np.concatenate(offsets), np.concatenate(codes) if codes else np.zeros(0, dtype=np.int32),
+                   np.array(list(lookup), dtype=object))
+
+    def expand_values(self, func):
+        """Replace every entry by the values in `func(value)` (zero or more).
+
+        `func` runs once per distinct value; row order is kept.
+        """
+        mapped = [tuple(func(value)) for value in self.vocab]
+        vocab, out_codes = np.unique(np.array([v for vs in mapped for v in vs], dtype=object), return_inverse=True)
+        out_codes = np.asarray(out_codes, dtype=np.int32).reshape(-1)
+        per_value = np.array([len(vs) for vs in mapped], dtype=np.int64)
+        value_offsets = np.zeros(len(mapped) + 1, dtype=np.int64)
+        np.cumsum(per_value, out=value_offsets[1:])
+
+        repeats = per_value[self.codes]
+        starts = np.repeat(value_offsets[:-1][self.codes], repeats)
+        within = np.arange(repeats.sum(), dtype=np.int64) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        row_lengths = np.bincount(self.row_ids, weights=repeats, minlength=len(self)).astype(np.int64)
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(row_lengths, out=offsets[1:])
+        return ListColumn(offsets, out_codes[starts + within], vocab)
+
+    def to_arrow(self):
+        values = pa.DictionaryArray.from_arrays(pa.array(self.codes, pa.int32()), pa.array(self.vocab, pa.string()))
+        return pa.ListArray.from_arrays(pa.array(self.offsets.astype(np.int32), pa.int32()), values)
+
+    @classmethod
+    def from_arrow(cls, array):
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        offsets = array.offsets.to_numpy()
+        values = array.values
+        start, end = offsets[0], offsets[-1]
+        return cls(offsets - start, values.indices.to_numpy()[start:end],
+                   values.dictionary.to_numpy(zero_copy_only=False))
+
+    @cached_property
+    def _vocab_nbytes(self):
+        return sum(len(value) for value in self.vocab)
+
+    def nbytes(self):
+        return self.offsets.nbytes + self.codes.nbytes + self._vocab_nbytes
+
+
+def _string_items(values):
+    return [value for value in values if isinstance(value, str)]
+
+
+def parse_list_column(values):
+    """Parse a column of list-like values.
+
+    Returns `(column, malformed)` where `malformed` is the number of values
+    that looked like a list but could not be parsed.
+    """
+    values = np.asarray(values, dtype=object)
+    n = len(values)
+    is_str = np.fromiter((type(value) is str for value in values), dtype=bool, count=n)
+    strings = pa.array(np.where(is_str, values, None), pa.string())
+
+    bracketed = pc.fill_null(pc.and_(pc.starts_with(strings, "["), pc.ends_with(strings, "]")), False)
+    simple = pc.fill_null(pc.and_(bracketed, pc.match_substring_regex(strings, _SIMPLE_LIST)), False)
+    plain = pc.fill_null(pc.and_(pc.invert(bracketed), pc.greater(pc.utf8_length(strings), 0)), False)
+
+    # Fast path: strip the brackets and split on the quotes around the commas
+    inner = pc.replace_substring_regex(pc.if_else(simple, strings, None), _LIST_ENDS, "")
+    split = pc.split_pattern_regex(inner, _ITEM_SEPARATOR)
+    lengths = pc.fill_null(pc.list_value_length(split), 0).to_numpy()
+    row_parts = [np.repeat(np.arange(n, dtype=np.int64), lengths)]
+    value_parts = [split.flatten()]
+
+    plain_rows = np.flatnonzero(plain.to_numpy(zero_copy_only=False))
+    row_parts.append(plain_rows)
+    value_parts.append(pa.array(values[plain_rows], pa.string()))
+
+    # Native arrays (as written by `movies.ingest`) convert to an Arrow list array in one call
+    is_list = np.fromiter((type(value) is list for value in values), dtype=bool, count=n)
+    list_rows = np.flatnonzero(is_list)
+    try:
+        native = pa.array(values[list_rows].tolist(), pa.list_(pa.string()))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        is_list[:] = False
+    else:
+        lengths = pc.fill_null(pc.list_value_length(native), 0).to_numpy()
+        row_parts.append(np.repeat(list_rows, lengths))
+        value_parts.append(native.flatten())
+
+    # Everything else is rare enough to handle one value at a time
+    malformed = 0
+    slow_rows, slow_values = [], []
+    slow = np.flatnonzero((~is_str & ~is_list)
+                          | (bracketed.to_numpy(zero_copy_only=False) & ~simple.to_numpy(zero_copy_only=False)))
+    for row in slow:
+        value = values[row]
+        if isinstance(value, str):
+            try:
+                value = ast.literal_eval(value)
+            except Exception:
+                malformed += 1
+                continue
+        if isinstance(value, (list, tuple, np.ndarray)):
+            items = _string_items(value)
+            slow_rows.extend([row] * len(items))
+            slow_values.extend(items)
+    row_parts.append(np.asarray(slow_rows, dtype=np.int64))
+    value_parts.append(pa.array(slow_values, pa.string()))
+
+    rows = np.concatenate(row_parts)
+    all_values = pa.concat_arrays(value_parts)
+    keep = pc.fill_null(pc.greater(pc.utf8_length(all_values), 0), False).to_numpy(zero_copy_only=False)
+    rows, all_values = rows[keep], all_values.filter(pa.array(keep))
+    order = np.argsort(rows, kind="stable")
+    return ListColumn.from_rows(rows[order], all_values.take(pa.array(order)), n), malformed
@@ -0,0 +1,79 @@
+"""Server-side sorting and paging of long movie result lists.
+
+Views pass the whole result as positions in `movies_df` (the movies of an
+actor or a country, a user's list) and get back one page of it.  Each movie's
+rank in `title`, `release_year` and `popularity` order is computed once per
+catalog version (`SortKeys` is a registered index), so ordering a result is
+an integer sort of its ranks, and only the entries up to the requested page
+are sorted at all.  A page costs O(len(result)) plus the sort of one page,
+however long the result is.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 25
+
+
+def page_count(total, page_size=PAGE_SIZE):
+    """Pages needed for `total` entries (at least one)."""
+    return max(1, -(-total // page_size))
+
+
+class SortKeys:
+    def __init__(self, movies_df):
+        self._movies_df = movies_df
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.movies_df)
+
+    def ranks(self, column):
+        """`(ranks, present)`: each movie's place in `column` order and how many movies have a value.
+
+        Missing values rank last; ties keep catalog order.  Text is compared
+        without case.
+        """
+        ranks = self._ranks.get(column)
+        if ranks is None:
+            with self._lock:
+                ranks = self._ranks.get(column)
+                if ranks is None:
+                    values = self._movies_df[column].reset_index(drop=True)
+                    if pd.api.types.is_string_dtype(values):
+                        values = values.str.lower()
+                    order = values.sort_values(kind='stable', na_position='last').index.to_numpy()
+                    ranks = np.empty(len(order), dtype=np.int64)
+                    ranks[order] = np.arange(len(order))
+                    ranks = self._ranks[column] = (ranks, int(values.notna().sum()))
+        return ranks
+
+    def page(self, positions, page=0, page_size=PAGE_SIZE, column=None, descending=False):
+        """`(order, total)`: indices into `positions` of page `page`, sorted by `column`.
+
+        With no `column` the given order is kept (reversed when `descending`).
+        Positions below zero (entries outside the catalog) sort last.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        total = len(positions)
+        start, end = page * page_size, min((page + 1) * page_size, total)
+        if start >= end:
+            return np.zeros(0, dtype=np.int64), total
+        if column is None:
+            keys = np.arange(total)[::-1] if descending else np.arange(total)
+        else:
+            ranks, present = self.ranks(column)
+            known = positions >= 0
+            keys = len(ranks) + np.arange(total)
+            known_ranks = ranks[positions[known]]
+            if descending:
+                # Present values in reverse; missing ones stay after them
+                known_ranks = np.where(known_ranks < present, present - 1 - known_ranks, known_ranks)
+            keys[known] = known_ranks
+        # Every key is distinct, so partitioning off the first `end` is exact
+        first = np.argpartition(keys, end - 1)[:end] if end < total else np.arange(total)
+        return first[np.argsort(keys[first])][start:end], total
@@ -0,0 +1,34 @@
+"""Helpers shared by the modules that keep state on disk.
+
+`atomic_write` writes a file next to its target and renames it into place, so
+a reader (or a memory map) never sees a partial file.  Timestamps are stored
+as ISO 8601 text, with "" for a missing one.
+"""
+
+import contextlib
+import datetime
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """Open a temporary file for writing that replaces `path` once the block succeeds."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def format_timestamp(value):
+    return value.isoformat() if value is not None else ""
+
+
+def parse_timestamp(text):
+    return datetime.datetime.fromisoformat(text) if text else None
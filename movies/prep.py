@@ -0,0 +1,110 @@
+"""Turn raw `movies2` documents into the frames the dashboard pages use.
+
+Scalar fields live in pandas frames indexed by Firestore document id.  The
+list-valued fields are parsed in one batch per column (see `movies.normalize`)
+and kept next to the frame as `ListColumn`s, keyed by their field name:
+
+* ``genres_list``
+* ``production_countries`` (raw values)
+* ``country_codes`` (ISO-3 codes resolved from them, see `movies.countries`)
+* ``Cast_list``
+
+Only the requested `fields` are kept.  The catalog loads `CORE_FIELDS` up
+front; the heavy `LAZY_FIELDS` are fetched when a view first needs them.
+
+Columns use compact dtypes (`COLUMN_DTYPES`): text is Arrow-backed `str`,
+years fit a nullable 16-bit integer and popularity a float32.  Revenue stays
+float64 so per-genre sums stay exact.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from movies.countries import resolve_country
+from movies.normalize import parse_list_column
+
+log = logging.getLogger(__name__)
+
+MOVIE_FIELDS = ['title', 'genres_list', 'production_countries', 'release_year', 'popularity',
+                'release_date', 'overview', 'revenue', 'Cast_list']
+LIST_FIELDS = ['genres_list', 'production_countries', 'Cast_list']
+SCALAR_FIELDS = [field for field in MOVIE_FIELDS if field not in LIST_FIELDS]
+
+# Long text and the cast are only needed by the detail view and Page 3
+LAZY_FIELDS = ['overview', 'Cast_list']
+CORE_FIELDS = [field for field in MOVIE_FIELDS if field not in LAZY_FIELDS]
+
+COLUMN_DTYPES = {'title': 'str', 'release_date': 'str', 'overview': 'str',
+                 'release_year': 'Int16', 'popularity': 'float32', 'revenue': 'float64'}
+
+
+def compact_columns(movies):
+    """Convert the scalar columns of `movies` to `COLUMN_DTYPES` (in place)."""
+    for field, dtype in COLUMN_DTYPES.items():
+        if field not in movies:
+            continue
+        if dtype == 'str':
+            movies[field] = movies[field].astype(dtype)
+            continue
+        values = pd.to_numeric(movies[field], errors='coerce')
+        if dtype == 'Int16':
+            # Fractional or out-of-range years are treated as unknown
+            values = values.where((values == values.round()) & (values.abs() < 2 ** 15))
+        movies[field] = values.astype(dtype)
+    return movies
+
+
+def parse_movies(movie_data, ids=None, fields=MOVIE_FIELDS):
+    """Parse raw movie dicts, keeping only `fields`.
+
+    Returns `(movies, lists, malformed)`: a frame of the scalar fields for
+    every document, the parsed list columns aligned with it, and the number
+    of malformed values per list field.
+    """
+    movies = pd.DataFrame(list(movie_data), index=pd.Index(ids, name='doc_id') if ids is not None else None)
+    for field in fields:
+        if field not in movies:
+            movies[field] = None
+
+    lists, malformed = {}, {}
+    for field in LIST_FIELDS:
+        if field in fields:
+            lists[field], malformed[field] = parse_list_column(movies[field].to_numpy(dtype=object))
+    if 'production_countries' in lists:
+        lists['country_codes'] = lists['production_countries'].expand_values(resolve_country)
+    scalars = [field for field in SCALAR_FIELDS if field in fields]
+    movies = movies.drop(columns=[column for column in movies.columns if column not in scalars])[scalars]
+
+    return compact_columns(movies), lists, malformed
+
+
+def split_movies(movies, lists):
+    """Return `(all_movies_df, movies_df, movie_lists)`.
+
+    `movies_df` only keeps movies with a known production country, and
+    `movie_lists` holds the list columns for exactly those rows.  Those
+    movies come first in `all_movies_df`, so `movies_df` is a slice of it
+    rather than a second copy of the frame.
+    """
+    has_country = lists['production_countries'].lengths() > 0
+    positions = np.flatnonzero(has_country)
+    movie_lists = {field: column.take(positions) for field, column in lists.items()}
+    if not has_country[:len(positions)].all():
+        movies = movies.iloc[np.concatenate([positions, np.flatnonzero(~has_country)])]
+    return movies, movies.iloc[:len(positions)], movie_lists
+
+
+def prepare_movies(movie_data, ids=None, fields=MOVIE_FIELDS):
+    """Build `(all_movies_df, movies_df, movie_lists, report)` from movie dicts."""
+    return prepare_parsed(*parse_movies(movie_data, ids, fields))
+
+
+def prepare_parsed(movies, lists, malformed):
+    """Build `(all_movies_df, movies_df, movie_lists, report)` from `parse_movies` output."""
+    all_movies_df, movies_df, movie_lists = split_movies(movies, lists)
+    report = {'malformed': malformed, 'dropped': len(all_movies_df) - len(movies_df)}
+    if any(malformed.values()):
+        log.warning("Malformed list values treated as empty: %s", malformed)
+    return all_movies_df, movies_df, movie_lists, report
@@ -0,0 +1,163 @@
+"""Favorites-based recommendations over a sparse movie feature matrix.
+
+Built once per catalog version: one CSR row per movie in `movies_df`, made
+of four blocks, each L2-normalized per movie and scaled by its weight in
+`WEIGHTS`:
+
+* ``genres``: multi-hot genres,
+* ``cast``: TF-IDF weighted cast (an actor shared by few movies says more
+  than a prolific one),
+* ``countries``: multi-hot ISO-3 production countries,
+* ``popularity``: one column, log popularity scaled to 0..1.
+
+A user's profile is the weighted sum of the rows of their favorites and
+to-watch movies, and every movie's score is its dot product with the
+profile.  The matrix is also kept column-major, so a score vector is one
+sparse matrix-vector product over just the profile's columns (a few genres,
+countries and actors); there is no Python loop over movies.
+`recommend_many` scores a batch of users with one sparse matrix product.
+
+`Cast_list` is fetched lazily, so Page 1 never waits for it: when the
+catalog version has not loaded it yet, the matrix starts without the cast
+block while a background thread reads the column (`CatalogData.list_column`)
+and swaps the full matrices in when done.  Once read, the column stays
+loaded across syncs and reloads, so later versions build with it directly.
+"""
+
+import logging
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+log = logging.getLogger(__name__)
+
+WEIGHTS = {'genres': 1.0, 'cast': 1.0, 'countries': 0.5, 'popularity': 0.3}
+
+# To-watch entries count for less than favorites
+TO_WATCH_WEIGHT = 0.5
+
+
+def _multi_hot(column):
+    """`len(column) x len(vocab)` CSR with a 1 for every (row, value), duplicates collapsed."""
+    matrix = sp.csr_matrix((np.ones(len(column.codes), dtype=np.float32), (column.row_ids, column.codes)),
+                           shape=(len(column), len(column.vocab)))
+    matrix.data[:] = 1
+    return matrix
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(matrix.dtype)
+    return matrix
+
+
+def _tf_idf(column):
+    matrix = _multi_hot(column)
+    document_counts = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + matrix.shape[0]) / (1 + document_counts)) + 1
+    matrix.data *= idf[matrix.indices].astype(matrix.dtype)
+    return matrix
+
+
+def _popularity(movies_df):
+    values = np.log1p(np.nan_to_num(movies_df['popularity'].to_numpy(dtype=float)).clip(min=0))
+    if len(values) and values.max() > 0:
+        values /= values.max()
+    return sp.csr_matrix(values.astype(np.float32).reshape(-1, 1))
+
+
+class Recommender:
+    def __init__(self, movies_df, genres, cast, countries, weights=WEIGHTS):
+        """`cast` may be None: the matrix is then built without the cast block (see `use_cast`)."""
+        self.ids = movies_df.index
+        self.weights = weights
+        self._blocks = {
+            'genres': _normalize_rows(_multi_hot(genres)),
+            'countries': _normalize_rows(_multi_hot(countries)),
+            'popularity': _popularity(movies_df),
+        }
+        self._cast_thread = None
+        self.use_cast(cast)
+
+    @classmethod
+    def build(cls, data):
+        cast = data.lists.get('Cast_list')
+        recommender = cls(data.movies_df, data.lists['genres_list'], cast, data.lists['country_codes'])
+        if cast is None:
+            recommender._cast_thread = threading.Thread(target=recommender._add_cast, args=(data,),
+                                                        name="recommender-cast", daemon=True)
+            recommender._cast_thread.start()
+        return recommender
+
+    def use_cast(self, cast):
+        """(Re)build the matrices, with the cast block when `cast` is given."""
+        blocks = dict(self._blocks)
+        if cast is not None:
+            blocks['cast'] = _normalize_rows(_tf_idf(cast))
+        matrix = sp.hstack([blocks[name] * weight for name, weight in self.weights.items() if name in blocks],
+                           format='csr', dtype=np.float32)
+        # One assignment, so a concurrent query sees either the old pair or the new one
+        self._matrices = (matrix, matrix.tocsc())
+        self.has_cast = cast is not None
+
+    def _add_cast(self, data):
+        try:
+            self.use_cast(data.list_column('Cast_list'))
+        except Exception:
+            log.exception("Failed to add the cast to recommendations; scoring without it")
+
+    @property
+    def matrix(self):
+        return self._matrices[0]
+
+    def nbytes(self):
+        return sum(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+                   for matrix in self._matrices)
+
+    def _profile(self, favorites, to_watch=()):
+        """`(positions, weights)` of the listed movies in the catalog (other entries are skipped)."""
+        entries = list(dict.fromkeys([*favorites, *to_watch]))
+        favorites = set(favorites)
+        positions = self.ids.get_indexer(entries)
+        weights = np.array([1.0 if entry in favorites else TO_WATCH_WEIGHT for entry in entries], dtype=np.float32)
+        known = positions >= 0
+        return positions[known], weights[known]
+
+    def _top(self, scores, listed, n):
+        scores[listed] = -np.inf
+        n = min(n, len(scores) - len(listed))
+        if n <= 0:
+            return self.ids[:0]
+        best = np.argpartition(-scores, n - 1)[:n]
+        return self.ids[best[np.lexsort((best, -scores[best]))]]
+
+    def recommend(self, favorites, to_watch=(), n=10):
+        """Document ids of the `n` movies closest to a user's lists, best first, excluding listed ones."""
+        matrix, by_column = self._matrices
+        positions, weights = self._profile(favorites, to_watch)
+        if not len(positions):
+            return self.ids[:0]
+        profile = sp.csr_matrix(weights) @ matrix[positions]
+        scores = by_column[:, profile.indices] @ profile.data
+        return self._top(scores, positions, n)
+
+    def recommend_many(self, users, n=10, batch_size=64):
+        """`recommend` for a list of `(favorites, to_watch)` pairs, `batch_size` users per matrix product."""
+        matrix, by_column = self._matrices
+        results = []
+        for start in range(0, len(users), batch_size):
+            profiles = [self._profile(*user) for user in users[start:start + batch_size]]
+            rows = np.repeat(np.arange(len(profiles)), [len(positions) for positions, _ in profiles])
+            columns = np.concatenate([positions for positions, _ in profiles] + [np.zeros(0, dtype=np.intp)])
+            weights = np.concatenate([weights for _, weights in profiles] + [np.zeros(0, dtype=np.float32)])
+            selection = sp.csr_matrix((weights, (rows, columns)), shape=(len(profiles), len(self.ids)))
+            profile_rows = (selection @ matrix).tocsc()
+            # Only the columns some profile uses: a sparse x dense product over those
+            used = np.flatnonzero(np.diff(profile_rows.indptr))
+            scores = (by_column[:, used] @ profile_rows[:, used].T.toarray()).T
+            for user_scores, (positions, _) in zip(scores, profiles):
+                results.append(self._top(user_scores, positions, n) if len(positions)
+                               else self.ids[:0])
+        return results
@@ -0,0 +1,83 @@
+"""Genre x year revenue and movie counts with prefix sums over the years.
+
+Built once per catalog version.  `revenue` and `counts` have one row per
+genre (in `GenreIndex` order) and one column per release year from
+`first_year` to `last_year`; the `cum_*` arrays hold running totals with a
+leading zero column, so the total over any year range is one subtraction
+per genre and never touches the movie rows.
+
+`releases` counts every movie in the catalog per year (including those
+without a production country), for the "Movies Released Per Year" chart.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _prefix(values):
+    out = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,), dtype=values.dtype)
+    np.cumsum(values, axis=-1, out=out[..., 1:])
+    return out
+
+
+class RevenueCube:
+    def __init__(self, genres, first_year, revenue, counts, releases):
+        self.genres = list(genres)
+        self._rows = {genre: row for row, genre in enumerate(self.genres)}
+        self.first_year = first_year
+        self.last_year = first_year + len(releases) - 1
+        self.revenue = revenue
+        self.counts = counts
+        self.releases = releases
+        self.cum_revenue = _prefix(self.revenue)
+        self.cum_counts = _prefix(self.counts)
+
+    @classmethod
+    def from_catalog(cls, movies_df, genre_index, all_movies_df):
+        years = movies_df['release_year'].to_numpy(dtype=float)
+        all_years = all_movies_df['release_year'].to_numpy(dtype=float)
+        known = np.concatenate([years[~np.isnan(years)], all_years[~np.isnan(all_years)]])
+        first_year = int(known.min()) if len(known) else 0
+        n_years = int(known.max()) - first_year + 1 if len(known) else 0
+
+        # One (movie, genre) pair per true cell of the genre matrix
+        rows, genre_rows = np.nonzero(genre_index.matrix)
+        dated = ~np.isnan(years[rows])
+        rows, genre_rows = rows[dated], genre_rows[dated]
+        cells = genre_rows * n_years + (years[rows].astype(np.int64) - first_year)
+        revenue = np.nan_to_num(movies_df['revenue'].to_numpy(dtype=float))
+        shape = (len(genre_index.genres), n_years)
+        revenue = np.bincount(cells, weights=revenue[rows], minlength=shape[0] * shape[1]).reshape(shape)
+        counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+
+        dated_all = all_years[~np.isnan(all_years)].astype(np.int64) - first_year
+        releases = np.bincount(dated_all, minlength=n_years)
+        return cls(genre_index.genres, first_year, revenue, counts, releases)
+
+    @classmethod
+    def build(cls, data):
+        return cls.from_catalog(data.movies_df, data.index("genres"), data.all_movies_df)
+
+    def _span(self, start, end):
+        lo = min(max(int(start) - self.first_year, 0), len(self.releases))
+        hi = min(max(int(end) - self.first_year + 1, lo), len(self.releases))
+        return lo, hi
+
+    def range_totals(self, genres, start, end):
+        """`(counts, revenue)` per entry of `genres` over release years `start`..`end` inclusive.
+
+        A movie counts towards each of its genres; unknown genres get zeros.
+        """
+        lo, hi = self._span(start, end)
+        rows = np.array([self._rows.get(genre, -1) for genre in genres], dtype=np.int64)
+        known = rows >= 0
+        counts = np.zeros(len(rows), dtype=np.int64)
+        revenue = np.zeros(len(rows))
+        counts[known] = self.cum_counts[rows[known], hi] - self.cum_counts[rows[known], lo]
+        revenue[known] = self.cum_revenue[rows[known], hi] - self.cum_revenue[rows[known], lo]
+        return counts, revenue
+
+    def releases_per_year(self):
+        """`release_year` / `Count` frame for the years that have movies."""
+        years = np.flatnonzero(self.releases)
+        return pd.DataFrame({'release_year': years + self.first_year, 'Count': self.releases[years]})
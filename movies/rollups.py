@@ -0,0 +1,310 @@
+"""Precomputed Page 2 aggregates, maintained by an offline job.
+
+`Rollups` holds everything Page 2 charts need, as small additive counters:
+
+* ``countries``: (movie, production country) entries per ISO-3 code,
+* ``releases``: movies released per year (whole catalog),
+* ``genre_years``: movie count and total revenue per genre and year,
+* ``unresolved``: (movie, raw country value) entries with no ISO-3 code,
+* ``country_movies``: the `COUNTRY_MOVIES` most popular movie ids per
+  country, for the "Movies by Country" list (recomputed on every run).
+
+The job writes them to a handful of documents in ``movies2_rollups`` (or to a
+local JSON file), a few kilobytes in total:
+
+    python -m movies.rollups                      # Firestore summary documents
+    python -m movies.rollups --output rollups.json
+    python -m movies.rollups --full               # recompute from scratch
+
+The app reads them only when ``MOVIES_ROLLUPS`` names the store ("firestore"
+or the JSON path), and only while their `updated_at` cursor is at least the
+catalog's; otherwise Page 2 computes everything from the catalog.
+
+Runs are incremental: the job keeps its own catalog snapshot (see
+`movies.snapshot`), fetches only the documents written since the rollups'
+`updated_at` cursor, subtracts what those movies contributed before and adds
+what they contribute now.  Without a matching snapshot and cursor it falls
+back to a full (parallel) load.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from movies import firebase, snapshot, sync
+from movies.catalog import CatalogData
+from movies.countries import country_name, resolve_country
+from movies.genres import GenreIndex
+from movies.loader import CollectionLoader
+from movies.persist import atomic_write, format_timestamp, parse_timestamp
+from movies.prep import CORE_FIELDS, prepare_parsed, split_movies
+from movies.revenue_cube import RevenueCube
+
+log = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "movies2_rollups"
+ROLLUP_VERSION = 2
+
+# Most popular movies kept per country
+COUNTRY_MOVIES = 20
+DEFAULT_SNAPSHOT_PATH = os.path.join(".cache", "movies2.rollups.arrow")
+
+
+def _merge(target, source, sign):
+    for key, value in source.items():
+        total = target.get(key, 0) + sign * value
+        if total:
+            target[key] = total
+        else:
+            target.pop(key, None)
+
+
+def _country_movies(movies_df, codes, k=COUNTRY_MOVIES):
+    """`{iso3: [doc_id, ...]}`: the `k` most popular movies of each country, most popular first."""
+    ids = movies_df.index.to_numpy(dtype=object)
+    popularity = np.nan_to_num(movies_df['popularity'].to_numpy(dtype=float), nan=-np.inf)
+    rows, entry_codes = codes.row_ids, codes.codes
+    order = np.lexsort((rows, -popularity[rows], entry_codes))
+    rows, entry_codes = rows[order], entry_codes[order]
+    # A movie listing one country twice (e.g. "USA" and "United States") counts once
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (entry_codes[1:] != entry_codes[:-1])
+    rows, entry_codes = rows[keep], entry_codes[keep]
+    starts = np.flatnonzero(np.diff(entry_codes, prepend=-1))
+    ends = np.append(starts[1:], len(rows))
+    return {codes.vocab[entry_codes[start]]: ids[rows[start:min(end, start + k)]].tolist()
+            for start, end in zip(starts, ends)}
+
+
+class Rollups:
+    def __init__(self, countries=None, releases=None, genre_years=None, unresolved=None, country_movies=None,
+                 cursor=None, computed_at=None):
+        self.countries = countries or {}
+        self.releases = releases or {}
+        self.genre_years = genre_years or {}
+        self.unresolved = unresolved or {}
+        self.country_movies = country_movies or {}
+        self.cursor = cursor
+        self.computed_at = computed_at
+
+    @classmethod
+    def from_catalog(cls, all_movies_df, movies_df, lists):
+        cube = RevenueCube.from_catalog(movies_df, GenreIndex(lists['genres_list']), all_movies_df)
+        codes = lists['country_codes']
+        countries = {code: int(count) for code, count in zip(codes.vocab, codes.counts()) if count}
+        raw = lists['production_countries']
+        unresolved = {value: int(count) for value, count in zip(raw.vocab, raw.counts())
+                      if count and not resolve_country(value)}
+        releases = {cube.first_year + int(i): int(cube.releases[i]) for i in np.flatnonzero(cube.releases)}
+        genre_years = {}
+        for row, genre in enumerate(cube.genres):
+            for i in np.flatnonzero(cube.counts[row]):
+                genre_years.setdefault(genre, {})[cube.first_year + int(i)] = \
+                    [int(cube.counts[row, i]), float(cube.revenue[row, i])]
+        return cls(countries, releases, genre_years, unresolved, _country_movies(movies_df, codes))
+
+    @classmethod
+    def from_data(cls, data, ids=None):
+        """Rollups of a `CatalogData`, or of just the movies in `ids`."""
+        if ids is None:
+            return cls.from_catalog(data.all_movies_df, data.movies_df, data.lists)
+        all_movies_df = data.all_movies_df[data.all_movies_df.index.isin(list(ids))]
+        positions = np.flatnonzero(data.movies_df.index.isin(list(ids)))
+        lists = {field: column.take(positions) for field, column in data.lists.items()}
+        return cls.from_catalog(all_movies_df, data.movies_df.iloc[positions], lists)
+
+    def combined(self, add, subtract):
+        """A copy with the counters of `add` added and those of `subtract` taken away.
+
+        `country_movies` is not a counter and is kept as it is.
+        """
+        result = Rollups(dict(self.countries), dict(self.releases),
+                         {genre: {year: list(cell) for year, cell in years.items()}
+                          for genre, years in self.genre_years.items()},
+                         dict(self.unresolved), self.country_movies)
+        for other, sign in ((subtract, -1), (add, 1)):
+            _merge(result.countries, other.countries, sign)
+            _merge(result.releases, other.releases, sign)
+            _merge(result.unresolved, other.unresolved, sign)
+            for genre, years in other.genre_years.items():
+                cells = result.genre_years.setdefault(genre, {})
+                for year, (count, revenue) in years.items():
+                    cell = cells.setdefault(year, [0, 0.0])
+                    cell[0] += sign * count
+                    cell[1] += sign * revenue
+                    if not cell[0]:
+                        del cells[year]
+                if not cells:
+                    del result.genre_years[genre]
+        return result
+
+    def country_counts(self):
+        """`Country` / `ISO3` / `Count` / `Percentage` frame, most entries first."""
+        frame = pd.DataFrame({'Country': [country_name(code) for code in self.countries],
+                              'ISO3': list(self.countries), 'Count': list(self.countries.values())})
+        frame = frame.sort_values('Count', ascending=False, kind='stable').reset_index(drop=True)
+        frame['Percentage'] = (frame['Count'] / frame['Count'].sum()) * 100
+        return frame
+
+    def unresolved_countries(self):
+        """`Country` / `Count` frame of the raw values with no ISO code, most frequent first."""
+        frame = pd.DataFrame({'Country': list(self.unresolved), 'Count': list(self.unresolved.values())})
+        return frame.sort_values('Count', ascending=False, kind='stable').reset_index(drop=True)
+
+    def revenue_cube(self):
+        genres = sorted(self.genre_years)
+        years = set(self.releases).union(*(cells.keys() for cells in self.genre_years.values()))
+        first_year = min(years) if years else 0
+        n_years = max(years) - first_year + 1 if years else 0
+        revenue = np.zeros((len(genres), n_years))
+        counts = np.zeros((len(genres), n_years), dtype=np.int64)
+        for row, genre in enumerate(genres):
+            for year, (count, total) in self.genre_years[genre].items():
+                counts[row, year - first_year] = count
+                revenue[row, year - first_year] = total
+        releases = np.zeros(n_years, dtype=np.int64)
+        for year, count in self.releases.items():
+            releases[year - first_year] = count
+        return RevenueCube(genres, first_year, revenue, counts, releases)
+
+    def to_documents(self):
+        return {
+            'countries': {'counts': self.countries, 'unresolved': self.unresolved},
+            'country_movies': {'ids': self.country_movies},
+            'releases': {'counts': {str(year): count for year, count in self.releases.items()}},
+            'genre_years': {
+                'counts': {genre: {str(year): cell[0] for year, cell in cells.items()}
+                           for genre, cells in self.genre_years.items()},
+                'revenue': {genre: {str(year): cell[1] for year, cell in cells.items()}
+                            for genre, cells in self.genre_years.items()},
+            },
+            'meta': {'version': ROLLUP_VERSION, 'cursor': format_timestamp(self.cursor),
+                     'computed_at': format_timestamp(self.computed_at)},
+        }
+
+    @classmethod
+    def from_documents(cls, docs):
+        if docs.get('meta', {}).get('version') != ROLLUP_VERSION:
+            return None
+        genre_counts = docs['genre_years']['counts']
+        genre_revenue = docs['genre_years']['revenue']
+        return cls(
+            countries=dict(docs['countries']['counts']),
+            unresolved=dict(docs['countries']['unresolved']),
+            country_movies=dict(docs['country_movies']['ids']),
+            releases={int(year): count for year, count in docs['releases']['counts'].items()},
+            genre_years={genre: {int(year): [count, genre_revenue[genre][year]] for year, count in cells.items()}
+                         for genre, cells in genre_counts.items()},
+            cursor=parse_timestamp(docs['meta']['cursor']),
+            computed_at=parse_timestamp(docs['meta']['computed_at']),
+        )
+
+
+class FirestoreRollups:
+    """Rollups stored as a few documents in one collection, written in one batch."""
+
+    def __init__(self, db, collection=ROLLUP_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def read(self):
+        refs = [self.db.collection(self.collection).document(name)
+                for name in ('countries', 'country_movies', 'releases', 'genre_years', 'meta')]
+        docs = {doc.id: doc.to_dict() for doc in self.db.get_all(refs) if doc.exists}
+        return Rollups.from_documents(docs) if len(docs) == len(refs) else None
+
+    def write(self, rollups):
+        batch = self.db.batch()
+        for name, doc in rollups.to_documents().items():
+            batch.set(self.db.collection(self.collection).document(name), doc)
+        batch.commit()
+
+
+class FileRollups:
+    """Rollups stored as one JSON file, replaced atomically."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return Rollups.from_documents(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError):
+            log.warning("Ignoring unreadable rollup file %s", self.path, exc_info=True)
+            return None
+
+    def write(self, rollups):
+        with atomic_write(self.path) as f:
+            json.dump(rollups.to_documents(), f)
+
+
+def open_store(target, db=None):
+    """`"firestore"` (or `"firestore:<collection>"`) or a path to a JSON file."""
+    if target == "firestore" or target.startswith("firestore:"):
+        return FirestoreRollups(db, target.partition(":")[2] or ROLLUP_COLLECTION)
+    return FileRollups(target)
+
+
+def update_rollups(db, store, collection="movies2", snapshot_path=DEFAULT_SNAPSHOT_PATH, loader=None, full=False):
+    """Bring the rollups in `store` up to date; returns `(rollups, changed)`.
+
+    `changed` is the number of movies applied incrementally, or None after a
+    full recomputation.
+    """
+    previous = None if full else store.read()
+    loaded = snapshot.load_snapshot(snapshot_path, collection) if previous is not None else None
+    if loaded is not None and loaded[3] == previous.cursor:
+        movies, lists, report, cursor = loaded
+        before = CatalogData(*split_movies(movies, lists), report, cursor=cursor)
+        upserts, removed, cursor = sync.fetch_changes_since(db.collection(collection), cursor)
+        touched = set(upserts) | set(removed)
+        data = before.patched(upserts, removed, cursor)
+        rollups = previous.combined(add=Rollups.from_data(data, touched),
+                                    subtract=Rollups.from_data(before, touched))
+        rollups.country_movies = _country_movies(data.movies_df, data.lists['country_codes'])
+        changed = len(touched)
+    else:
+        movies, lists, malformed, cursor = (loader or CollectionLoader()).load(db, collection, CORE_FIELDS)
+        data = CatalogData(*prepare_parsed(movies, lists, malformed), cursor=cursor)
+        rollups = Rollups.from_data(data)
+        changed = None
+
+    rollups.cursor = data.cursor
+    rollups.computed_at = datetime.datetime.now(datetime.timezone.utc)
+    store.write(rollups)
+    # Without an `updated_at` cursor there is nothing to resume from; every run is full
+    snapshot.save_snapshot(data, snapshot_path, collection)
+    return rollups, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movies.rollups", description=__doc__.split("\n\n")[0])
+    firebase.add_arguments(parser)
+    parser.add_argument("--output", default="firestore",
+                        help="'firestore', 'firestore:<collection>' or a JSON file path (default: %(default)s)")
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH,
+                        help="catalog snapshot kept between runs (default: %(default)s)")
+    parser.add_argument("--full", action="store_true", help="recompute everything instead of applying changes")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    db = firebase.client(args.credentials)
+    start = time.perf_counter()
+    rollups, changed = update_rollups(db, open_store(args.output, db), args.collection, args.snapshot,
+                                      full=args.full)
+    how = "recomputed" if changed is None else f"updated with {changed} changed movies"
+    log.info("Rollups %s in %.2fs (%d countries, %d genres, %d years)", how, time.perf_counter() - start,
+             len(rollups.countries), len(rollups.genre_years), len(rollups.releases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Ranked full-text search over titles and overviews (BM25).
+
+The index covers the movies in `movies_df`.  Text is normalized like titles
+(case, accents and punctuation ignored), split into words and stripped of
+common stop words; a title word counts `TITLE_WEIGHT` times as much as an
+overview word.  Tokenizing runs in Arrow compute kernels over whole batches,
+not word by word in Python.
+
+Postings are kept as a list of segments, each a documents x terms CSC matrix
+of weighted term frequencies, so a term's postings are a column slice.  An
+incremental sync does not rebuild anything: the old entries of changed and
+removed movies are marked dead and the changed movies are appended as a new
+segment.  Segments are merged (and dead entries dropped) once they make up a
+large part of the index.  Versions never share mutable state, so a rerun
+still searching the previous catalog version is not affected.
+
+Overviews are not part of the core catalog.  A sync's overviews come with
+its documents (`CatalogData.upserts`); a first build reads every overview
+with the parallel `CollectionLoader` rather than in sequential batches.
+With a `path` the index is saved next to the catalog snapshot whenever the
+catalog saves one.  A new process loads it and only indexes the movies
+written since its `updated_at` cursor, so the full read happens only the
+first time.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+
+from movies import snapshot, sync
+from movies.loader import CollectionLoader
+from movies.persist import atomic_write, format_timestamp, parse_timestamp
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the saved layout or the tokenizer changes
+SEARCH_VERSION = 2
+
+DEFAULT_PATH = os.path.splitext(snapshot.DEFAULT_PATH)[0] + ".search.npz"
+
+TITLE_WEIGHT = 3
+K1 = 1.2
+B = 0.75
+
+# Documents tokenized (and overviews fetched) per batch when building
+BATCH_SIZE = 10000
+
+# Merge the segments once dead or appended entries reach this share of the index
+MERGE_FRACTION = 0.2
+
+STOP_WORDS = ["a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "he", "her", "his",
+              "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "they", "this", "to",
+              "was", "were", "who", "will", "with"]
+
+
+def _overviews(documents):
+    """`{doc_id: overview}` of raw documents."""
+    return {doc_id: (document or {}).get('overview') for doc_id, document in documents.items()}
+
+
+def _fetch_all_overviews(data):
+    """`{doc_id: overview}` for the whole collection, read over parallel key ranges."""
+    movies, _, _, _ = CollectionLoader().load(data.store.db, data.store.collection, ['overview'])
+    return dict(zip(movies.index, movies['overview'].to_numpy(dtype=object)))
+
+
+def tokenize(texts):
+    """`(documents, words)`: one entry per kept word of `texts` (None counts as empty)."""
+    text = pa.array(texts, pa.string())
+    text = pc.utf8_normalize(pc.fill_null(text, ""), "NFKD")
+    # Drop the accents NFKD split off before anything else, or each one would end a word
+    text = pc.replace_substring_regex(text, r"\p{Mn}+", "")
+    text = pc.replace_substring_regex(pc.utf8_lower(text), r"[^\p{L}\p{N}]+", " ")
+    words = pc.split_pattern(pc.utf8_trim_whitespace(text), " ")
+    documents = pc.list_parent_indices(words)
+    words = pc.list_flatten(words)
+    keep = pc.and_(pc.not_equal(words, ""), pc.invert(pc.is_in(words, pa.array(STOP_WORDS))))
+    return pc.filter(documents, keep).to_numpy(), pc.filter(words, keep)
+
+
+class SearchIndex:
+    def __init__(self, doc_ids, alive, lengths, terms, segments, cursor=None, path=None):
+        self.doc_ids = doc_ids
+        self.alive = alive
+        self.lengths = lengths
+        self.terms = terms
+        self.segments = segments
+        self.cursor = cursor
+        self.path = path
+        self._numbers = None
+        self._term_ids = None
+        self.live = int(alive.sum())
+        self.average_length = float(lengths[alive].mean()) if self.live else 0.0
+
+    @classmethod
+    def empty(cls, path=None):
+        return cls(np.zeros(0, dtype=object), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=object), [], path=path)
+
+    @classmethod
+    def build(cls, data, path=None):
+        """The index for `data`: loaded from `path` and caught up, or built from scratch."""
+        start = time.perf_counter()
+        index = cls.load(path) if path else None
+        if index is not None:
+            index = index._caught_up(data)
+        if index is None:
+            index = cls.empty(path)._appended(data, list(data.movies_df.index))._at(data.cursor)
+            log.info("Indexed %d movies for search in %.2fs", index.live, time.perf_counter() - start)
+        index.path = path
+        return index
+
+    @classmethod
+    def update(cls, index, data, changed, removed):
+        """Patch `index` for `data`, where `changed` and `removed` are document ids."""
+        in_catalog = set(data.movies_df.index)
+        return index._without(changed | removed)._appended(data, [i for i in changed if i in in_catalog],
+                                                            _overviews(data.upserts))._at(data.cursor)
+
+    # Building
+
+    def _texts(self, data, ids, known=None):
+        """Titles and overviews of `ids`; overviews come from `known` (doc id -> overview) or are fetched."""
+        titles = data.movies_df['title'].reindex(ids).to_numpy(dtype=object)
+        if 'overview' in data.all_movies_df.columns:
+            overviews = data.all_movies_df['overview'].reindex(ids).to_numpy(dtype=object)
+        else:
+            known = known or {}
+            missing = [doc_id for doc_id in ids if doc_id not in known]
+            fetched = data.store.fetch('overview', missing) if missing else {}
+            overviews = [known[doc_id] if doc_id in known else fetched.get(doc_id) for doc_id in ids]
+        return [title if isinstance(title, str) else None for title in titles], \
+            [overview if isinstance(overview, str) else None for overview in overviews]
+
+    def _appended(self, data, ids, overviews=None):
+        """A new version with `ids` indexed as one more segment; `overviews` maps doc ids to known overviews."""
+        if not ids:
+            return self
+        overviews = overviews or {}
+        if 'overview' not in data.all_movies_df.columns and data.store is not None \
+                and sum(doc_id not in overviews for doc_id in ids) > BATCH_SIZE:
+            # Too many for batched point reads; the documents' own overviews are newer
+            overviews = {**_fetch_all_overviews(data), **overviews}
+        terms = self.terms
+        term_ids = dict(self._term_lookup())
+        rows, columns, weights = [], [], []
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            for texts, weight in zip(self._texts(data, batch, overviews), (TITLE_WEIGHT, 1)):
+                positions, words = tokenize(texts)
+                encoded = pc.dictionary_encode(words)
+                vocabulary = encoded.dictionary.to_pylist()
+                codes = np.array([term_ids.setdefault(word, len(term_ids)) for word in vocabulary], dtype=np.int64)
+                rows.append(positions + start)
+                columns.append(codes[encoded.indices.to_numpy(zero_copy_only=False)] if len(codes)
+                               else np.zeros(0, dtype=np.int64))
+                weights.append(np.full(len(positions), weight, dtype=np.float32))
+        if len(term_ids) > len(terms):
+            terms = np.concatenate([terms, np.array(list(term_ids)[len(terms):], dtype=object)])
+        rows, columns, weights = np.concatenate(rows), np.concatenate(columns), np.concatenate(weights)
+        segment = sp.csc_matrix((weights, (rows, columns)), shape=(len(ids), len(terms)), dtype=np.float32)
+        lengths = np.bincount(rows, weights=weights, minlength=len(ids)).astype(np.float32)
+
+        appended = SearchIndex(
+            np.concatenate([self.doc_ids, np.array(ids, dtype=object)]),
+            np.concatenate([self.alive, np.ones(len(ids), dtype=bool)]),
+            np.concatenate([self.lengths, lengths]),
+            terms, self.segments + [(len(self.doc_ids), segment)], self.cursor, self.path)
+        appended._term_ids = term_ids
+        if self._numbers is not None:
+            appended._numbers = dict(self._numbers)
+            appended._numbers.update(zip(ids, range(len(self.doc_ids), len(appended.doc_ids))))
+        return appended._merged_if_fragmented()
+
+    def _without(self, ids):
+        """A new version with the entries of `ids` marked dead."""
+        numbers = self._doc_numbers()
+        dead = [numbers[doc_id] for doc_id in ids if doc_id in numbers]
+        if not dead:
+            return self
+        alive = self.alive.copy()
+        alive[dead] = False
+        index = SearchIndex(self.doc_ids, alive, self.lengths, self.terms, list(self.segments), self.cursor, self.path)
+        index._term_ids = self._term_ids
+        index._numbers = {doc_id: number for doc_id, number in numbers.items() if alive[number]}
+        return index
+
+    def _at(self, cursor):
+        """A version of this index (sharing its arrays) for the catalog at `cursor`."""
+        index = SearchIndex(self.doc_ids, self.alive, self.lengths, self.terms, self.segments, cursor, self.path)
+        index._term_ids, index._numbers = self._term_ids, self._numbers
+        return index
+
+    def _merged_if_fragmented(self):
+        appended = sum(segment.shape[0] for _, segment in self.segments[1:])
+        dead = len(self.alive) - self.live
+        if len(self.segments) > 1 and max(appended, dead) > MERGE_FRACTION * max(self.live, 1):
+            return self.merged()
+        return self
+
+    def merged(self):
+        """A copy with one segment and no dead entries."""
+        matrix = sp.vstack([self._padded(segment) for _, segment in self.segments], format='csr') \
+            if self.segments else sp.csr_matrix((0, len(self.terms)), dtype=np.float32)
+        live = np.flatnonzero(self.alive)
+        matrix = matrix[live].tocsc()
+        return SearchIndex(self.doc_ids[live], np.ones(len(live), dtype=bool), self.lengths[live], self.terms,
+                           [(0, matrix)] if len(live) else [], self.cursor, self.path)
+
+    def _padded(self, segment):
+        """`segment` widened to every current term (older segments know fewer)."""
+        if segment.shape[1] == len(self.terms):
+            return segment
+        return sp.csc_matrix((segment.data, segment.indices,
+                              np.concatenate([segment.indptr,
+                                              np.full(len(self.terms) - segment.shape[1], segment.indptr[-1])])),
+                             shape=(segment.shape[0], len(self.terms)))
+
+    def _caught_up(self, data):
+        """This (loaded) index brought up to `data`, or None when that takes a rebuild."""
+        if self.cursor is None or data.cursor is None or data.store is None:
+            return None
+        upserts, removed, _ = sync.fetch_changes_since(data.store.db.collection(data.store.collection), self.cursor)
+        in_catalog = set(data.movies_df.index)
+        indexed = set(self.doc_ids[self.alive])
+        # Anything the catalog and the index disagree on is re-indexed too
+        changed = (set(upserts) & in_catalog) | (in_catalog - indexed)
+        removed = set(removed) | (indexed - in_catalog)
+        start = time.perf_counter()
+        index = self._without(changed | removed)._appended(data, list(changed), _overviews(upserts))._at(data.cursor)
+        log.info("Loaded search index %s and applied %d changed and %d removed movies in %.2fs",
+                 self.path, len(changed), len(removed), time.perf_counter() - start)
+        return index
+
+    # Queries
+
+    def _doc_numbers(self):
+        if self._numbers is None:
+            self._numbers = {doc_id: number for number, doc_id in enumerate(self.doc_ids) if self.alive[number]}
+        return self._numbers
+
+    def _term_lookup(self):
+        if self._term_ids is None:
+            self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        return self._term_ids
+
+    def _postings(self, term):
+        """`(documents, weighted term frequencies)` of the live entries for one term id."""
+        documents, frequencies = [], []
+        for first, segment in self.segments:
+            if term < segment.shape[1]:
+                lo, hi = segment.indptr[term], segment.indptr[term + 1]
+                documents.append(segment.indices[lo:hi] + first)
+                frequencies.append(segment.data[lo:hi])
+        if not documents:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        documents, frequencies = np.concatenate(documents), np.concatenate(frequencies)
+        live = self.alive[documents]
+        return documents[live], frequencies[live]
+
+    def scores(self, query):
+        """`(documents, scores)` of every live document matching a word of `query`."""
+        lookup = self._term_lookup()
+        _, words = tokenize([query])
+        terms = {lookup[word] for word in words.to_pylist() if word in lookup}
+        matched, contributions = [], []
+        for term in terms:
+            documents, frequencies = self._postings(term)
+            if not len(documents):
+                continue
+            idf = np.log(1 + (self.live - len(documents) + 0.5) / (len(documents) + 0.5))
+            norm = K1 * (1 - B + B * self.lengths[documents] / (self.average_length or 1))
+            matched.append(documents)
+            contributions.append(idf * frequencies * (K1 + 1) / (frequencies + norm))
+        if not matched:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        documents, inverse = np.unique(np.concatenate(matched), return_inverse=True)
+        return documents, np.bincount(inverse.reshape(-1), weights=np.concatenate(contributions))
+
+    def search(self, query, page=0, page_size=20):
+        """`(doc_ids, total)`: page `page` of the movies matching `query`, best first, and the match count."""
+        documents, scores = self.scores(query)
+        end = min((page + 1) * page_size, len(documents))
+        if end <= page * page_size:
+            return [], len(documents)
+        best = np.argpartition(-scores, end - 1)[:end] if end < len(documents) else np.arange(len(documents))
+        best = best[np.lexsort((documents[best], -scores[best]))][page * page_size:end]
+        return self.doc_ids[documents[best]].tolist(), len(documents)
+
+    # Persistence
+
+    def save(self, path=None):
+        """Write the merged index to `path` (default: its own) atomically; False without a path."""
+        path = path or self.path
+        if not path:
+            return False
+        index = self.merged()
+        segment = index.segments[0][1] if index.segments else sp.csc_matrix((0, len(index.terms)))
+        with atomic_write(path, "wb") as f:
+            np.savez(f, version=SEARCH_VERSION, cursor=format_timestamp(self.cursor),
+                     doc_ids=index.doc_ids.astype(str), lengths=index.lengths, terms=index.terms.astype(str),
+                     data=segment.data, indices=segment.indices, indptr=segment.indptr)
+        return True
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at `path`, or None when missing, unreadable or from another version."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as saved:
+                if int(saved['version']) != SEARCH_VERSION:
+                    log.info("Ignoring search index %s written by another version", path)
+                    return None
+                doc_ids, terms = saved['doc_ids'].astype(object), saved['terms'].astype(object)
+                segment = sp.csc_matrix((saved['data'], saved['indices'], saved['indptr']),
+                                        shape=(len(doc_ids), len(terms)))
+                return cls(doc_ids, np.ones(len(doc_ids), dtype=bool), saved['lengths'], terms,
+                           [(0, segment)] if len(doc_ids) else [], parse_timestamp(str(saved['cursor'])), path)
+        except (OSError, ValueError, KeyError):
+            log.warning("Ignoring unreadable search index %s", path, exc_info=True)
+            return None
@@ -0,0 +1,99 @@
+"""Versioned on-disk snapshot of the parsed catalog.
+
+The snapshot is an Arrow IPC file with one row per document.  Scalar fields
+are plain columns; list fields are stored as native Arrow list arrays whose
+offsets and dictionary codes are exactly a `ListColumn`'s, so loading the
+memory-mapped file needs no parsing.  A new process only has to fetch the
+documents written since the snapshot's `updated_at` cursor.
+
+Only the fields the catalog had loaded are stored; heavy fields that were not
+loaded (see `movies.prep.LAZY_FIELDS`) are fetched on demand as usual.
+
+A snapshot is ignored when its format version or collection does not match,
+or when it has no cursor (the collection has no `updated_at` field, so the
+delta since the snapshot cannot be queried).
+"""
+
+import datetime
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from movies.normalize import ListColumn
+from movies.persist import atomic_write, format_timestamp, parse_timestamp
+from movies.prep import SCALAR_FIELDS, compact_columns
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the parsed representation changes
+SNAPSHOT_VERSION = 4
+
+DEFAULT_PATH = os.environ.get("MOVIES_SNAPSHOT_PATH", os.path.join(".cache", "movies2.arrow"))
+
+LIST_COLUMNS = ['genres_list', 'production_countries', 'country_codes', 'Cast_list']
+NUMBER_COLUMNS = ['release_year', 'popularity', 'revenue']
+
+
+def _text(value):
+    return value if isinstance(value, str) else None
+
+
+def save_snapshot(data, path=DEFAULT_PATH, collection="movies2"):
+    """Write a `CatalogData` (every document) to `path` atomically."""
+    if data.cursor is None:
+        return False
+    movies = data.all_movies_df
+    columns = {'doc_id': pa.array(movies.index.astype(str), pa.string())}
+    for field in [field for field in SCALAR_FIELDS if field in movies.columns]:
+        if field in NUMBER_COLUMNS:
+            columns[field] = pa.array(pd.to_numeric(movies[field], errors='coerce'), pa.float64(), from_pandas=True)
+        else:
+            columns[field] = pa.array([_text(v) for v in movies[field]], pa.string())
+    # Movies without a country come last and have no parsed lists; store them as empty
+    positions = np.arange(len(data.movies_df))
+    for field in [field for field in LIST_COLUMNS if field in data.lists]:
+        columns[field] = data.lists[field].scatter(positions, len(movies)).to_arrow()
+
+    metadata = {
+        'movies.snapshot_version': str(SNAPSHOT_VERSION),
+        'movies.collection': collection,
+        'movies.cursor': format_timestamp(data.cursor),
+        'movies.written_at': format_timestamp(datetime.datetime.now(datetime.timezone.utc)),
+        'movies.malformed': json.dumps(data.report['malformed']),
+    }
+    table = pa.table(columns).replace_schema_metadata(metadata)
+
+    # Readers memory-map the file, so it must never be seen half written
+    with atomic_write(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return True
+
+
+def load_snapshot(path=DEFAULT_PATH, collection="movies2"):
+    """Return `(movies, lists, report, cursor)` from a memory-mapped snapshot, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        log.warning("Ignoring unreadable catalog snapshot %s", path, exc_info=True)
+        return None
+
+    metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    if (metadata.get('movies.snapshot_version') != str(SNAPSHOT_VERSION)
+            or metadata.get('movies.collection') != collection
+            or not metadata.get('movies.cursor')):
+        log.info("Ignoring catalog snapshot %s written by another version", path)
+        return None
+
+    lists = {field: ListColumn.from_arrow(table.column(field)) for field in LIST_COLUMNS if field in table.column_names}
+    scalars = [field for field in SCALAR_FIELDS if field in table.column_names]
+    movies = compact_columns(table.select(['doc_id'] + scalars).to_pandas().set_index('doc_id'))
+    report = {'malformed': json.loads(metadata.get('movies.malformed', '{}')), 'dropped': 0}
+    cursor = parse_timestamp(metadata['movies.cursor'])
+    return movies, lists, report, cursor
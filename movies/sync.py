@@ -0,0 +1,68 @@
+"""Incremental catalog updates from Firestore.
+
+Two sources of changes are supported:
+
+* a snapshot listener (`on_snapshot`), which pushes added, modified and
+  removed documents as they happen, and
+* an `updated_at` cursor query, which pulls every document written since the
+  last sync.  Writers must set `updated_at` (e.g. to `SERVER_TIMESTAMP`) and
+  mark deletions with `deleted: true` instead of deleting the document, as a
+  cursor query cannot see documents that no longer exist.
+
+Both return changes as `(upserts, removed)`: a dict of document id to document
+data, and a set of removed document ids.
+"""
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from movies import metrics
+
+UPDATED_AT_FIELD = "updated_at"
+DELETED_FIELD = "deleted"
+
+
+def changes_from_listener(changes):
+    upserts, removed = {}, set()
+    for change in changes:
+        doc = change.document
+        # `DocumentSnapshot.get` raises KeyError for a missing field, so read the dict
+        if change.type.name == "REMOVED" or (doc.to_dict() or {}).get(DELETED_FIELD):
+            upserts.pop(doc.id, None)
+            removed.add(doc.id)
+        else:
+            upserts[doc.id] = doc.to_dict()
+            removed.discard(doc.id)
+    return upserts, removed
+
+
+def changes_from_documents(docs):
+    upserts, removed = {}, set()
+    for doc in docs:
+        data = doc.to_dict()
+        if data.get(DELETED_FIELD):
+            removed.add(doc.id)
+        else:
+            upserts[doc.id] = data
+    return upserts, removed
+
+
+def latest_update(records, field=UPDATED_AT_FIELD):
+    """Return the newest `updated_at` value in `records`, or None."""
+    values = [record[field] for record in records if record.get(field) is not None]
+    return max(values) if values else None
+
+
+def fetch_changes_since(collection_ref, cursor, field=UPDATED_AT_FIELD):
+    """Fetch documents written after `cursor`.
+
+    Returns `(upserts, removed, cursor)` where the new cursor is the newest
+    `updated_at` seen (or the old one if nothing changed).
+    """
+    with metrics.span("fetch.changes"):
+        docs = list(collection_ref.where(filter=FieldFilter(field, ">", cursor)).stream())
+    records = [doc.to_dict() for doc in docs]
+    metrics.count("firestore_documents_read", len(records))
+    metrics.count("firestore_bytes_read", sum(map(metrics.document_size, records)))
+    upserts, removed = changes_from_documents(docs)
+    newest = latest_update(records, field)
+    return upserts, removed, newest if newest is not None else cursor
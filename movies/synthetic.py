@@ -0,0 +1,175 @@
+"""Synthetic `movies2` documents for benchmarks and local runs.
+
+    python -m movies.synthetic 100000 --output movies.jsonl
+
+The documents have the shapes the real collection has, including its mess:
+
+* list fields are mostly stringified Python lists (``"['Drama', 'Crime']"``),
+  with some native arrays, empty lists, plain strings and malformed values,
+* production countries use the many spellings found in the data
+  (``"United States of America"``, ``"USA"``, ``"Korea, Republic of"``,
+  historical and unknown names),
+* cast names are drawn from a long-tailed pool (about one actor per three
+  movies), some with apostrophes, so their lists are double-quoted,
+* `release_year` is sometimes missing or a string, and most movies have no
+  `revenue`.
+
+Output is deterministic for a given `seed`.  `populate` writes the documents
+to a client (usually `movies.fakestore.FakeClient`); the JSON lines dump can be
+fed to `movies.ingest`.
+"""
+
+import argparse
+import functools
+import json
+import string
+
+import numpy as np
+
+GENRES = ['Drama', 'Comedy', 'Thriller', 'Action', 'Romance', 'Horror', 'Crime', 'Documentary', 'Adventure',
+          'Science Fiction', 'Family', 'Mystery', 'Fantasy', 'Animation', 'Music', 'Foreign', 'History',
+          'War', 'Western', 'TV Movie']
+
+# (spelling, weight): the common countries appear under several names
+COUNTRIES = [
+    ('United States of America', 30), ('USA', 4), ('United States', 3), ('U.S.', 1), ('us', 1),
+    ('United Kingdom', 8), ('UK', 2), ('Great Britain', 1), ('England', 1),
+    ('France', 7), ('Germany', 5), ('West Germany', 1), ('Japan', 4), ('India', 4), ('Canada', 4),
+    ('Italy', 3), ('Spain', 3), ('South Korea', 2), ('Korea, Republic of', 1), ('Republic of Korea', 1),
+    ('China', 2), ("People's Republic of China", 1), ('Hong Kong', 2), ('Russia', 2), ('Russian Federation', 1),
+    ('Soviet Union', 1), ('Czechoslovakia', 1), ('Mexico', 2), ('Brazil', 2), ('Australia', 2), ('Sweden', 1),
+    ('Denmark', 1), ('Türkiye', 1), ('Turkey', 1), ('Iran, Islamic Republic of', 1), ('Côte d’Ivoire', 1),
+    ('  france ', 1), ('Atlantis', 1), ('Unknown', 1),
+]
+
+_FIRST = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+          'Jean', 'Marie', 'Hiroshi', 'Yuki', 'Raj', 'Priya', 'Carlos', 'Lucia', 'Ivan', 'Olga', 'Sean', 'Aoife',
+          'Chen', 'Mei', 'Ahmed', 'Fatima', 'Lars', 'Ingrid', 'Kwame', 'Ama']
+_LAST = ['Smith', 'Johnson', 'Brown', 'Garcia', 'Miller', 'Davis', 'Martin', 'Bernard', 'Tanaka', 'Suzuki',
+         'Sharma', 'Patel', 'Rodriguez', 'Lopez', 'Ivanov', 'Petrova', "O'Brien", "O'Connor", 'Murphy', 'Wang',
+         'Li', 'Hassan', 'Ali', 'Larsen', 'Berg', 'Mensah', 'Boateng', 'Dubois', 'Rossi', 'Müller']
+_WORDS = ['night', 'city', 'love', 'last', 'dark', 'summer', 'war', 'house', 'dead', 'girl', 'man', 'road',
+          'king', 'star', 'blood', 'secret', 'lost', 'river', 'dream', 'fire', 'ghost', 'heart', 'money', 'time',
+          'island', 'shadow', 'return', 'storm', 'wild', 'silent', 'golden', 'broken', 'little', 'big', 'red']
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def _actor_names(count, rng):
+    """`count` distinct actor names, shuffled so popularity does not follow the name order."""
+    names = [f"{_FIRST[i % len(_FIRST)]} {_LAST[(i // len(_FIRST)) % len(_LAST)]}" for i in range(count)]
+    per_round = len(_FIRST) * len(_LAST)
+    names = [name if i < per_round else f"{name} {i // per_round + 1}" for i, name in enumerate(names)]
+    return [names[i] for i in rng.permutation(count)]
+
+
+def _rows(values, lengths):
+    """Split the flat list `values` into consecutive rows of `lengths`."""
+    ends = np.cumsum(lengths).tolist()
+    return [values[end - length:end] for end, length in zip(ends, lengths.tolist())]
+
+
+def _stringified(items, shape):
+    """A list value the way the collection stores it (mostly `str(list)`)."""
+    if shape < 0.10:
+        return items
+    if shape < 0.11 and items:
+        return items[0]  # a bare string instead of a list
+    if shape < 0.115:
+        return str(items)[:-1]  # truncated, malformed
+    return str(items)
+
+
+def _chunk(rng, n, actors):
+    """Column-wise draws for `n` movies, assembled into documents at the end."""
+    alphabet = np.array(list(_ID_ALPHABET))
+    ids = np.ascontiguousarray(alphabet[rng.integers(0, len(alphabet), (n, 20))]).view('<U20').ravel().tolist()
+
+    title_lengths = rng.integers(1, 4, n)
+    titles = [" ".join(words).title() for words in _rows(rng.choice(_WORDS, title_lengths.sum()).tolist(),
+                                                         title_lengths)]
+    prefixed, sequel = rng.random(n) < 0.05, rng.random(n) < 0.02
+
+    years = rng.integers(1920, 2025, n)
+    year_missing, year_text = rng.random(n) < 0.03, rng.random(n) < 0.02
+    months, days = rng.integers(1, 13, n), rng.integers(1, 29, n)
+
+    genre_counts = rng.integers(0, 4, n)
+    genre_picks = np.argsort(rng.random((n, len(GENRES))), axis=1)[:, :3]
+    country_weights = np.array([weight for _, weight in COUNTRIES], dtype=float)
+    country_counts = rng.choice([0, 1, 1, 1, 1, 2, 2, 3], n)
+    country_picks = rng.choice(len(COUNTRIES), (n, 3), p=country_weights / country_weights.sum())
+    # Zipf-like cast: a few actors appear in many movies, most in one or two
+    cast_lengths = rng.integers(0, 16, n)
+    cast_codes = ((rng.zipf(1.3, cast_lengths.sum()) - 1) % len(actors)).tolist()
+    list_shapes = rng.random((n, 3)).tolist()
+
+    has_revenue, revenue_missing = rng.random(n) < 0.3, rng.random(n) < 0.02
+    revenues = np.round(rng.lognormal(16, 2, n))
+    popularity = np.round(rng.lognormal(1.5, 1.2, n), 3).tolist()
+    overview_lengths = rng.integers(20, 60, n)
+    overviews = _rows(rng.choice(_WORDS, overview_lengths.sum()).tolist(), overview_lengths)
+
+    for i, cast in enumerate(_rows(cast_codes, cast_lengths)):
+        title = titles[i]
+        if prefixed[i]:
+            title = f"The {title}"
+        if sequel[i]:
+            title += " II"
+        year = None if year_missing[i] else int(years[i])
+        genres = [GENRES[j] for j in genre_picks[i, :genre_counts[i]].tolist()]
+        countries = list(dict.fromkeys(COUNTRIES[j][0] for j in country_picks[i, :country_counts[i]].tolist()))
+        shapes = list_shapes[i]
+        yield ids[i], {
+            'title': title,
+            'genres_list': _stringified(genres, shapes[0]),
+            'production_countries': _stringified(countries, shapes[1]),
+            'release_year': str(year) if year is not None and year_text[i] else year,
+            'release_date': f"{year}-{months[i]:02d}-{days[i]:02d}" if year is not None else None,
+            'popularity': popularity[i],
+            'revenue': None if revenue_missing[i] else float(revenues[i]) if has_revenue[i] else 0.0,
+            'overview': " ".join(overviews[i]).capitalize() + ".",
+            'Cast_list': _stringified([actors[code] for code in dict.fromkeys(cast)], shapes[2]),
+        }
+
+
+def generate_movies(n, seed=0, chunk_size=10000):
+    """Yield `(doc_id, document)` for `n` synthetic movies."""
+    rng = np.random.default_rng(seed)
+    actors = _actor_names(max(n // 3, 50), rng)
+    for start in range(0, n, chunk_size):
+        yield from _chunk(rng, min(chunk_size, n - start), actors)
+
+
+def populate(db, n, collection="movies2", seed=0):
+    """Write `n` synthetic movies to `collection` of `db`; returns their ids."""
+    ref = db.collection(collection)
+    ids = []
+    for doc_id, document in generate_movies(n, seed):
+        ref.document(doc_id).set(document)
+        ids.append(doc_id)
+    return ids
+
+
+@functools.lru_cache(maxsize=None)
+def fake_client(n, seed=0):
+    """A `FakeClient` with `n` synthetic movies, shared by every caller in the process."""
+    from movies.fakestore import FakeClient
+
+    db = FakeClient()
+    populate(db, n, seed=seed)
+    return db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movies.synthetic", description=__doc__.split("\n\n")[0])
+    parser.add_argument("count", type=int, help="number of movies")
+    parser.add_argument("--output", required=True, help="JSON lines file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    with open(args.output, "w") as f:
+        for doc_id, document in generate_movies(args.count, args.seed):
+            f.write(json.dumps({'id': doc_id, **document}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Prefix-searchable title index over `movies_df`.
+
+Titles are normalized (case, accents, punctuation and spacing ignored; letters
+of any script kept) and kept in sorted order next to the row they belong to,
+so a typed prefix is a pair of binary searches.  Titles starting with "The",
+"A" or "An" are also indexed without the article.  Several movies may share a
+title; `label` tells them apart by release year.  The order of every movie by
+popularity is computed once, for the empty query.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+_ARTICLE = re.compile(r"^(the|a|an) ")
+_NOT_WORD = re.compile(r"[\W_]+")
+
+# Sorts after any character a title can continue with
+_LAST_CHAR = "\U0010ffff"
+
+
+def normalize_title(title):
+    if not isinstance(title, str):
+        return ""
+    title = title.casefold()
+    if not title.isascii():
+        title = "".join(char for char in unicodedata.normalize("NFKD", title) if not unicodedata.combining(char))
+    return _NOT_WORD.sub(" ", title).strip()
+
+
+class TitleIndex:
+    def __init__(self, movies_df):
+        titles = movies_df['title'].to_numpy(dtype=object)
+        self._titles = titles
+        self._years = movies_df['release_year'].to_numpy(dtype=float)
+        self._popularity = np.nan_to_num(movies_df['popularity'].to_numpy(dtype=float), nan=-np.inf)
+        self._by_popularity = np.argsort(-self._popularity, kind='stable')
+
+        normalized = [normalize_title(title) for title in titles]
+        self._normalized = np.array(normalized, dtype=object)
+        keys, rows = list(normalized), list(range(len(normalized)))
+        for row, key in enumerate(normalized):
+            stripped = _ARTICLE.sub("", key)
+            if stripped != key:
+                keys.append(stripped)
+                rows.append(row)
+        keys = np.array(keys, dtype=object)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = np.asarray(rows, dtype=np.int64)[order]
+
+        # Titles shared by more than one movie get the year in their label
+        _, inverse, counts = np.unique(self._normalized, return_inverse=True, return_counts=True)
+        self._duplicated = counts[np.asarray(inverse).reshape(-1)] > 1
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.movies_df)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def lookup(self, title):
+        """Rows whose title matches `title` exactly (after normalization)."""
+        key = normalize_title(title)
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key, side='right')
+        rows = np.unique(self.rows[start:end])
+        return rows[self._normalized[rows] == key]
+
+    def search(self, prefix, limit=20):
+        """Up to `limit` rows whose title starts with `prefix`, most popular first.
+
+        An empty prefix returns the most popular movies overall.
+        """
+        key = normalize_title(prefix)
+        if not key:
+            return self._by_popularity[:limit]
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key + _LAST_CHAR, side='left')
+        matches = np.unique(self.rows[start:end])
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-self._popularity[matches], limit)[:limit]]
+        return matches[np.argsort(-self._popularity[matches], kind='stable')]
+
+    def label(self, row):
+        """Display text for `row`: the title, plus the year when the title is shared."""
+        title = self._titles[row] if isinstance(self._titles[row], str) else "(untitled)"
+        if self._duplicated[row] and not np.isnan(self._years[row]):
+            return f"{title} ({int(self._years[row])})"
+        return title
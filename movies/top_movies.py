@@ -0,0 +1,101 @@
+"""Most popular movies per (release year, genre), precomputed.
+
+For every release year and every genre (plus ``None`` for all genres) the
+table keeps the document ids of the `k` most popular movies, most popular
+first.  A Page 1 query is then a dictionary lookup and a slice.
+
+The table is built when a catalog version is loaded and patched on
+incremental syncs: only the groups a changed or removed movie belonged to, or
+now belongs to, are recomputed.
+"""
+
+import os
+
+import numpy as np
+
+# Longest list kept per group; every `top(..., n)` with n <= K is free
+DEFAULT_TOP_K = int(os.environ.get("MOVIES_TOP_K", "50"))
+
+# Past this many changed movies a patch rebuilds the whole table
+_MAX_PATCH = 1000
+
+
+def _ranked(rows, popularity, k):
+    """First `k` of `rows` by descending popularity (NaN last, ties by row)."""
+    order = np.lexsort((rows, -popularity[rows]))
+    return rows[order[:k]]
+
+
+class TopMovies:
+    def __init__(self, movies_df, genres, k=DEFAULT_TOP_K):
+        self.k = k
+        ids = movies_df.index.to_numpy(dtype=object)
+        years = movies_df['release_year'].to_numpy(dtype=float)
+        popularity = movies_df['popularity'].to_numpy(dtype=float)
+
+        # (row, genre code) pairs, with -1 standing for "all genres"
+        rows = np.flatnonzero(~np.isnan(years))
+        pair_rows, pair_codes = genres.row_ids, genres.codes.astype(np.int64)
+        order = np.lexsort((pair_codes, pair_rows))
+        pair_rows, pair_codes = pair_rows[order], pair_codes[order]
+        unique = np.ones(len(pair_rows), dtype=bool)
+        unique[1:] = (pair_rows[1:] != pair_rows[:-1]) | (pair_codes[1:] != pair_codes[:-1])
+        unique &= ~np.isnan(years[pair_rows])
+        codes = np.concatenate([np.full(len(rows), -1, dtype=np.int64), pair_codes[unique]])
+        rows = np.concatenate([rows, pair_rows[unique]])
+
+        # Sort by group, then popularity; keep the first k of each group
+        order = np.lexsort((rows, -popularity[rows], codes, years[rows]))
+        rows, codes, group_years = rows[order], codes[order], years[rows[order]]
+        starts = np.flatnonzero(np.concatenate([[True], (group_years[1:] != group_years[:-1]) | (codes[1:] != codes[:-1])]))
+        ends = np.append(starts[1:], len(rows))
+        self._top = {}
+        for start, end in zip(starts, ends):
+            genre = genres.vocab[codes[start]] if codes[start] >= 0 else None
+            self._top[(int(group_years[start]), genre)] = ids[rows[start:min(end, start + k)]]
+
+    @classmethod
+    def build(cls, data):
+        return cls(data.movies_df, data.lists['genres_list'])
+
+    @classmethod
+    def update(cls, index, data, changed, removed):
+        """Patch `index` for `data`, where `changed` and `removed` are document ids."""
+        touched = changed | removed
+        if len(touched) > _MAX_PATCH:
+            return cls(data.movies_df, data.lists['genres_list'], index.k)
+
+        # Groups the touched movies were in before, and groups they are in now
+        groups = {key for key, ids in index._top.items() if not touched.isdisjoint(ids)}
+        movies_df = data.movies_df
+        genres = data.lists['genres_list']
+        positions = movies_df.index.get_indexer(list(changed))
+        years = movies_df['release_year'].to_numpy(dtype=float)
+        for position in positions[positions >= 0]:
+            if not np.isnan(years[position]):
+                year = int(years[position])
+                groups.add((year, None))
+                groups.update((year, genre) for genre in genres.row(position))
+
+        patched = cls.__new__(cls)
+        patched.k = index.k
+        patched._top = dict(index._top)
+        ids = movies_df.index.to_numpy(dtype=object)
+        popularity = movies_df['popularity'].to_numpy(dtype=float)
+        for year, genre in groups:
+            mask = years == year
+            if genre is not None:
+                mask &= genres.contains(genre)
+            rows = np.flatnonzero(mask)
+            if len(rows):
+                patched._top[(year, genre)] = ids[_ranked(rows, popularity, index.k)]
+            else:
+                patched._top.pop((year, genre), None)
+        return patched
+
+    def top(self, year, genre=None, n=5):
+        """Document ids of the `n` most popular movies of `year` in `genre` (None for all).
+
+        `n` is capped at the table's `k`.
+        """
+        return self._top.get((int(year), genre), np.zeros(0, dtype=object))[:n]
@@ -0,0 +1,117 @@
+"""A user's to-watch and favorites lists.
+
+The user document is read once (per session) and kept as `lists`.  Changes
+are written with `ArrayUnion` / `ArrayRemove` transforms, so a write never
+needs a read first and two tabs of the same user cannot overwrite each
+other's additions.  Changes to several lists go out in one batch.
+
+Lists hold movie document ids.  Older documents stored titles; `migrate`
+swaps every title the catalog can resolve for its id in place, so the order
+(the order movies were added in) is kept.  That rewrites whole lists, so it
+reads and writes the document in a transaction: an entry another tab adds
+meanwhile makes the transaction retry rather than being lost.
+"""
+
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion, transactional
+
+from movies import metrics
+
+LIST_NAMES = ("to_watch", "favorites")
+
+
+class UserLists:
+    def __init__(self, db, username, collection="users"):
+        self.db = db
+        self.username = username
+        self.ref = db.collection(collection).document(username)
+        self.lists = {}
+        self.reload()
+
+    def reload(self):
+        """Read the user document again (e.g. to pick up changes from another tab)."""
+        with metrics.span("user_doc.read"):
+            data = self.ref.get(field_paths=list(LIST_NAMES)).to_dict() or {}
+        metrics.count("firestore_documents_read")
+        self.lists = {name: list(data.get(name) or []) for name in LIST_NAMES}
+
+    def __getitem__(self, name):
+        return self.lists[name]
+
+    def apply(self, add=None, remove=None):
+        """Add and remove movie ids, e.g. ``apply(add={"favorites": [id]}, remove={"to_watch": [id]})``.
+
+        All changes are committed in one batch; ids already present are not
+        added twice.
+        """
+        add = {name: list(ids) for name, ids in (add or {}).items() if ids}
+        remove = {name: list(ids) for name, ids in (remove or {}).items() if ids}
+        if not add and not remove:
+            return
+        # One transform per field and write: removals first, then additions
+        batch = self.db.batch()
+        if remove:
+            batch.update(self.ref, {name: ArrayRemove(ids) for name, ids in remove.items()})
+        if add:
+            batch.update(self.ref, {name: ArrayUnion(ids) for name, ids in add.items()})
+        with metrics.span("user_doc.write"):
+            batch.commit()
+        metrics.count("firestore_documents_written", bool(remove) + bool(add))
+
+        for name, ids in remove.items():
+            self.lists[name] = [item for item in self.lists[name] if item not in ids]
+        for name, ids in add.items():
+            self.lists[name] += [item for item in dict.fromkeys(ids) if item not in self.lists[name]]
+
+    def add(self, name, movie_ids):
+        self.apply(add={name: movie_ids})
+
+    def remove(self, name, movie_ids):
+        self.apply(remove={name: movie_ids})
+
+    def clear(self, name):
+        self.apply(remove={name: self.lists[name]})
+
+    def migrate(self, resolve):
+        """Replace legacy title entries with movie ids.
+
+        `resolve(entry)` returns the movie id for an entry that is a title, or
+        None (for ids and unknown titles, which are left alone).  Each entry
+        keeps its place; an id already earlier in the list is not repeated.
+        Returns the number of entries migrated.
+        """
+        # Most users have nothing to migrate; only they skip the transaction
+        if not _migrated(self.lists, resolve)[0]:
+            return 0
+
+        @transactional
+        def rewrite(transaction):
+            with metrics.span("user_doc.read"):
+                data = self.ref.get(field_paths=list(LIST_NAMES), transaction=transaction).to_dict() or {}
+            metrics.count("firestore_documents_read")
+            lists = {name: list(data.get(name) or []) for name in LIST_NAMES}
+            migrated, count = _migrated(lists, resolve)
+            if migrated:
+                transaction.update(self.ref, migrated)
+            return {**lists, **migrated}, count
+
+        with metrics.span("user_doc.write"):
+            self.lists, count = rewrite(self.db.transaction())
+        metrics.count("firestore_documents_written", bool(count))
+        return count
+
+
+def _migrated(lists, resolve):
+    """`(migrated, count)`: the lists that change, rewritten, and how many entries were resolved."""
+    migrated, count = {}, 0
+    for name, entries in lists.items():
+        resolved = []
+        for entry in entries:
+            movie_id = resolve(entry)
+            if movie_id is not None and movie_id != entry:
+                resolved.append(movie_id)
+                count += 1
+            else:
+                resolved.append(entry)
+        if resolved != entries:
+            migrated[name] = list(dict.fromkeys(resolved))
+    return migrated, count
@@ -1,647 +1,618 @@
-import ast
+import functools
+import os
 import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, firestore
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from movies import analytics, metrics, paging, rollups, search, snapshot, synthetic
+from movies.actors import ActorIndex
+from movies.catalog import Catalog
+from movies.costars import CoStars
+from movies.country_table import CountryTable
+from movies.genres import GenreIndex
+from movies.recommend import Recommender
+from movies.revenue_cube import RevenueCube
+from movies.titles import TitleIndex
+from movies.top_movies import DEFAULT_TOP_K, TopMovies
+from movies.user_lists import UserLists
+
 st.set_page_config(page_title="Movie Dashboard", layout="wide")
 
-# Initialize Firestore
-if not firebase_admin._apps:  # Ensure Firebase is initialized only once
-    firebase_creds = dict(st.secrets["firebase"])  # Convert secrets to a dictionary
-    cred = credentials.Certificate(firebase_creds)  # Use the dictionary directly
-    firebase_admin.initialize_app(cred)  # Initialize Firebase app
-
-# Firestore client
-db = firestore.client()
-
-# Fetch all movie data
-movies_ref = db.collection('movies2')
-movies = movies_ref.stream()
-movie_data = [movie.to_dict() for movie in movies]
-
-all_movies_df = pd.DataFrame(movie_data)  
-movies_df = all_movies_df.copy()         
-
-def safe_parse_genres(value):
-    try:
-        if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
-            return ast.literal_eval(value)
-        elif isinstance(value, str) and len(value) > 0:
-            return [value]
-        elif isinstance(value, list):
-            return value
-        else:
-            return []
-    except Exception:
-        return []
-
-# Safely parse production_countries
-def safe_parse_countries(value):
-    try:
-        if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
-            return ast.literal_eval(value)
-        elif isinstance(value, str) and len(value) > 0:
-            return [value]
-        elif isinstance(value, list):
-            return value
-        else:
-            return []
-    except Exception:
-        return []
-
-movies_df['genres_list'] = movies_df['genres_list'].apply(safe_parse_genres)
-movies_df['production_countries'] = movies_df['production_countries'].apply(safe_parse_countries)
-
-# Country mapping for Plotly
-country_mapping = {
-    # Mapping for countries needing adjustment
-    "United States of America": "United States",
-    "South Korea": "Korea, Republic of",
-    "Congo": "Democratic Republic of the Congo",
-    "Lao People's Democratic Republic": "Laos",
-    "Syrian Arab Republic": "Syria",
-    "Taiwan": "Taiwan, Province of China",
-    "Russian Federation": "Russia",
-    "Viet Nam": "Vietnam",
-    "Palestinian Territory": "Palestine",
-    "Northern Ireland": "United Kingdom",
-    "Macedonia": "North Macedonia",
-    "Brunei Darussalam": "Brunei",
-    "Micronesia": "Federated States of Micronesia",
-    "Macao": "Macau",
-    "Timor-Leste": "Timor-Leste",
-    "St. Helena": "Saint Helena",
-    "St. Kitts and Nevis": "Saint Kitts and Nevis",
-    "St. Vincent and the Grenadines": "Saint Vincent and the Grenadines",
-    "Svalbard & Jan Mayen Islands": "Svalbard and Jan Mayen",
-    "South Georgia and the South Sandwich Islands": "South Georgia and the South Sandwich Islands",
-    "Antigua and Barbuda": "Antigua and Barbuda",
-    "Bosnia and Herzegovina": "Bosnia and Herzegovina",
-    "Cabo Verde": "Cape Verde",
-    "Czechia": "Czech Republic",
-    "Eswatini": "Swaziland",
-    "Gambia, The": "Gambia",
-    "Guinea-Bissau": "Guinea-Bissau",
-    "Burma": "Myanmar",
-    "Côte d'Ivoire": "Ivory Coast",
-    "Bahamas, The": "Bahamas",
-    "Gambia, The": "Gambia",
-
-    # Directly recognizable by Plotly
-    "Afghanistan": "Afghanistan",
-    "Albania": "Albania",
-    "Algeria": "Algeria",
-    "Andorra": "Andorra",
-    "Angola": "Angola",
-    "Antarctica": "Antarctica",
-    "Argentina": "Argentina",
-    "Armenia": "Armenia",
-    "Australia": "Australia",
-    "Austria": "Austria",
-    "Azerbaijan": "Azerbaijan",
-    "Bahamas": "Bahamas",
-    "Bahrain": "Bahrain",
-    "Bangladesh": "Bangladesh",
-    "Barbados": "Barbados",
-    "Belarus": "Belarus",
-    "Belgium": "Belgium",
-    "Belize": "Belize",
-    "Benin": "Benin",
-    "Bhutan": "Bhutan",
-    "Bolivia": "Bolivia",
-    "Bosnia and Herzegovina": "Bosnia and Herzegovina",
-    "Botswana": "Botswana",
-    "Brazil": "Brazil",
-    "Brunei": "Brunei",
-    "Bulgaria": "Bulgaria",
-    "Burkina Faso": "Burkina Faso",
-    "Burundi": "Burundi",
-    "Cambodia": "Cambodia",
-    "Cameroon": "Cameroon",
-    "Canada": "Canada",
-    "Central African Republic": "Central African Republic",
-    "Chad": "Chad",
-    "Chile": "Chile",
-    "China": "China",
-    "Colombia": "Colombia",
-    "Comoros": "Comoros",
-    "Costa Rica": "Costa Rica",
-    "Croatia": "Croatia",
-    "Cuba": "Cuba",
-    "Cyprus": "Cyprus",
-    "Czech Republic": "Czech Republic",
-    "Denmark": "Denmark",
-    "Djibouti": "Djibouti",
-    "Dominica": "Dominica",
-    "Dominican Republic": "Dominican Republic",
-    "Ecuador": "Ecuador",
-    "Egypt": "Egypt",
-    "El Salvador": "El Salvador",
-    "Equatorial Guinea": "Equatorial Guinea",
-    "Eritrea": "Eritrea",
-    "Estonia": "Estonia",
-    "Eswatini": "Swaziland",
-    "Ethiopia": "Ethiopia",
-    "Fiji": "Fiji",
-    "Finland": "Finland",
-    "France": "France",
-    "Gabon": "Gabon",
-    "Gambia": "Gambia",
-    "Georgia": "Georgia",
-    "Germany": "Germany",
-    "Ghana": "Ghana",
-    "Greece": "Greece",
-    "Grenada": "Grenada",
-    "Guatemala": "Guatemala",
-    "Guinea": "Guinea",
-    "Guinea-Bissau": "Guinea-Bissau",
-    "Guyana": "Guyana",
-    "Haiti": "Haiti",
-    "Honduras": "Honduras",
-    "Hungary": "Hungary",
-    "Iceland": "Iceland",
-    "India": "India",
-    "Indonesia": "Indonesia",
-    "Iran": "Iran",
-    "Iraq": "Iraq",
-    "Ireland": "Ireland",
-    "Israel": "Israel",
-    "Italy": "Italy",
-    "Jamaica": "Jamaica",
-    "Japan": "Japan",
-    "Jordan": "Jordan",
-    "Kazakhstan": "Kazakhstan",
-    "Kenya": "Kenya",
-    "Kiribati": "Kiribati",
-    "Kosovo": "Kosovo",
-    "Kuwait": "Kuwait",
-    "Kyrgyzstan": "Kyrgyzstan",
-    "Laos": "Laos",
-    "Latvia": "Latvia",
-    "Lebanon": "Lebanon",
-    "Lesotho": "Lesotho",
-    "Liberia": "Liberia",
-    "Libya": "Libya",
-    "Liechtenstein": "Liechtenstein",
-    "Lithuania": "Lithuania",
-    "Luxembourg": "Luxembourg",
-    "Madagascar": "Madagascar",
-    "Malawi": "Malawi",
-    "Malaysia": "Malaysia",
-    "Maldives": "Maldives",
-    "Mali": "Mali",
-    "Malta": "Malta",
-    "Marshall Islands": "Marshall Islands",
-    "Mauritania": "Mauritania",
-    "Mauritius": "Mauritius",
-    "Mexico": "Mexico",
-    "Micronesia": "Federated States of Micronesia",
-    "Moldova": "Moldova",
-    "Monaco": "Monaco",
-    "Mongolia": "Mongolia",
-    "Montenegro": "Montenegro",
-    "Montserrat": "Montserrat",
-    "Morocco": "Morocco",
-    "Mozambique": "Mozambique",
-    "Myanmar": "Myanmar",
-    "Namibia": "Namibia",
-    "Nauru": "Nauru",
-    "Nepal": "Nepal",
-    "Netherlands": "Netherlands",
-    "New Zealand": "New Zealand",
-    "Nicaragua": "Nicaragua",
-    "Niger": "Niger",
-    "Nigeria": "Nigeria",
-    "North Macedonia": "North Macedonia",
-    "Norway": "Norway",
-    "Oman": "Oman",
-    "Pakistan": "Pakistan",
-    "Palau": "Palau",
-    "Palestine": "Palestine",
-    "Panama": "Panama",
-    "Papua New Guinea": "Papua New Guinea",
-    "Paraguay": "Paraguay",
-    "Peru": "Peru",
-    "Philippines": "Philippines",
-    "Poland": "Poland",
-    "Portugal": "Portugal",
-    "Qatar": "Qatar",
-    "Romania": "Romania",
-    "Russia": "Russia",
-    "Rwanda": "Rwanda",
-    "Saint Kitts and Nevis": "Saint Kitts and Nevis",
-    "Saint Lucia": "Saint Lucia",
-    "Saint Vincent and the Grenadines": "Saint Vincent and the Grenadines",
-    "Samoa": "Samoa",
-    "San Marino": "San Marino",
-    "Sao Tome and Principe": "Sao Tome and Principe",
-    "Saudi Arabia": "Saudi Arabia",
-    "Senegal": "Senegal",
-    "Serbia": "Serbia",
-    "Seychelles": "Seychelles",
-    "Sierra Leone": "Sierra Leone",
-    "Singapore": "Singapore",
-    "Slovakia": "Slovakia",
-    "Slovenia": "Slovenia",
-    "Solomon Islands": "Solomon Islands",
-    "Somalia": "Somalia",
-    "South Africa": "South Africa",
-    "South Korea": "Korea, Republic of",
-    "South Sudan": "South Sudan",
-    "Spain": "Spain",
-    "Sri Lanka": "Sri Lanka",
-    "Sudan": "Sudan",
-    "Suriname": "Suriname",
-    "Swaziland": "Swaziland",
-    "Sweden": "Sweden",
-    "Switzerland": "Switzerland",
-    "Syria": "Syria",
-    "Taiwan": "Taiwan",
-    "Tajikistan": "Tajikistan",
-    "Tanzania": "Tanzania",
-    "Thailand": "Thailand",
-    "Togo": "Togo",
-    "Tonga": "Tonga",
-    "Trinidad and Tobago": "Trinidad and Tobago",
-    "Tunisia": "Tunisia",
-    "Turkey": "Turkey",
-    "Turkmenistan": "Turkmenistan",
-    "Tuvalu": "Tuvalu",
-    "Uganda": "Uganda",
-    "Ukraine": "Ukraine",
-    "United Arab Emirates": "United Arab Emirates",
-    "United Kingdom": "United Kingdom",
-    "United States": "United States",
-    "Uruguay": "Uruguay",
-    "Uzbekistan": "Uzbekistan",
-    "Vanuatu": "Vanuatu",
-    "Vatican City": "Vatican City",
-    "Venezuela": "Venezuela",
-    "Vietnam": "Vietnam",
-    "Yemen": "Yemen",
-    "Zambia": "Zambia",
-    "Zimbabwe": "Zimbabwe",
-}
-
-def map_country_names(countries):
-    if not countries:
-        return []
-    return [country_mapping.get(country.strip(), country.strip()) for country in countries if isinstance(country, str)]
-
-movies_df['mapped_production_countries'] = movies_df['production_countries'].apply(map_country_names)
-movies_df = movies_df[movies_df['mapped_production_countries'].apply(lambda x: isinstance(x, list) and len(x) > 0)]
-
-# Ensure numeric values
-movies_df['release_year'] = pd.to_numeric(movies_df.get('release_year', pd.Series([])), errors='coerce')
-movies_df['popularity'] = pd.to_numeric(movies_df.get('popularity', pd.Series([])), errors='coerce')
-
-
-
-
-# Authentication
-if "logged_in_user" not in st.session_state:
-    st.session_state.logged_in_user = None
-
-def register_user(username, password):
-    user_ref = db.collection('users').document(username)
-    if user_ref.get().exists:
-        st.error("Username already exists. Choose a different username.")
-    else:
-        user_ref.set({"password": password, "to_watch": [], "favorites": []})
-        st.success("Registration successful! You can now log in.")
-
-def login_user(username, password):
-    user_ref = db.collection('users').document(username)
-    user_doc = user_ref.get()
-    if user_doc.exists and user_doc.to_dict().get("password") == password:
-        st.success("Login successful!")
-        return username
+# Timing spans of this rerun (see movies.metrics)
+rerun_trace = metrics.registry.begin_trace("Login")  # renamed to the page once logged in
+try:
+    # MOVIES_FAKE_FIRESTORE=<count> serves <count> synthetic movies from memory (local runs, load tests)
+    FAKE_FIRESTORE = os.environ.get("MOVIES_FAKE_FIRESTORE")
+
+    if FAKE_FIRESTORE:
+        db = synthetic.fake_client(int(FAKE_FIRESTORE))
     else:
-        st.error("Invalid username or password.")
-        return None
-
-# Sidebar: Login/Registration
-if st.session_state.logged_in_user:
-    username = st.session_state.logged_in_user
-    st.sidebar.write(f"Logged in as: {username}")
-    if st.sidebar.button("Logout"):
+        # Initialize Firestore
+        if not firebase_admin._apps:  # Ensure Firebase is initialized only once
+            firebase_creds = dict(st.secrets["firebase"])  # Convert secrets to a dictionary
+            cred = credentials.Certificate(firebase_creds)  # Use the dictionary directly
+            firebase_admin.initialize_app(cred)  # Initialize Firebase app
+
+        # Firestore client
+        db = firestore.client()
+
+    # Shared, process-wide movie catalog (loaded once, refreshed in the background)
+    @st.cache_resource
+    def get_catalog():
+        # A fake store must not overwrite (or start from) the real catalog's snapshot
+        catalog = Catalog(db, "movies2", snapshot_path=None if FAKE_FIRESTORE else snapshot.DEFAULT_PATH)
+        catalog.register_index("actors", ActorIndex.build)
+        catalog.register_index("costars", CoStars.build)
+        catalog.register_index("countries", CountryTable.build)
+        catalog.register_index("genres", GenreIndex.build)
+        catalog.register_index("recommendations", Recommender.build)
+        catalog.register_index("revenue_cube", RevenueCube.build)
+        catalog.register_index("sort_keys", paging.SortKeys.build)
+        # BM25 postings, saved next to the snapshot and patched on sync instead of rebuilt
+        catalog.register_index("search", functools.partial(search.SearchIndex.build,
+                                                           path=None if FAKE_FIRESTORE else search.DEFAULT_PATH),
+                               search.SearchIndex.update)
+        catalog.register_index("titles", TitleIndex.build)
+        catalog.register_index("top_movies", TopMovies.build, TopMovies.update, eager=True)
+        if analytics.BACKEND != "off":
+            catalog.register_index("analytics", analytics.AnalyticsDB.build, eager=True)
+        return catalog
+
+    catalog = get_catalog()
+    with metrics.span("catalog.get"):
+        catalog_data = catalog.get()
+    all_movies_df = catalog_data.all_movies_df
+    movies_df = catalog_data.movies_df
+    movie_lists = catalog_data.lists  # Parsed list fields, row-aligned with movies_df
+    genre_index = catalog_data.index("genres")  # Movie x genre filters, row-aligned with movies_df
+    # SQL mirror answering the page aggregations when MOVIES_ANALYTICS is set (see movies.analytics)
+    sql = catalog_data.index("analytics") if analytics.BACKEND != "off" else None
+
+    # Page 2 aggregates written by `python -m movies.rollups`: "firestore" or a JSON path to
+    # read them, off by default (Page 2 computes them from the catalog)
+    ROLLUPS_SOURCE = os.environ.get("MOVIES_ROLLUPS", "off")
+
+    @st.cache_data(ttl=300, show_spinner=False)
+    def load_rollups():
+        if ROLLUPS_SOURCE == "off":
+            return None
+        with metrics.span("fetch.rollups"):
+            return rollups.open_store(ROLLUPS_SOURCE, db).read()
+
+    def rollups_current(page_rollups):
+        """Whether the rollups include every write the catalog has seen (compared by `updated_at` cursor)."""
+        return page_rollups.cursor is not None and catalog_data.cursor is not None \
+            and page_rollups.cursor >= catalog_data.cursor
+
+    # Users who see the debug panel (comma-separated usernames)
+    ADMIN_USERS = {name.strip() for name in os.environ.get("MOVIES_ADMINS", "").split(",") if name.strip()}
+
+
+    def movie_picker(label, key, limit=20):
+        """Typeahead movie picker: only the top `limit` title matches are sent to the browser.
+
+        Returns the selected document id, or None when nothing matches.
+        """
+        title_index = catalog_data.index("titles")
+        query = st.text_input(label, key=f"{key}_query", placeholder="Start typing a title...")
+        positions = title_index.search(query, limit)
+        if not len(positions):
+            st.caption("No movies match that title.")
+            return None
+        labels = dict(zip(movies_df.index[positions], map(title_index.label, positions)))
+        return st.selectbox(f"{label} (top {limit} matches)", list(labels), format_func=labels.get, key=key)
+
+
+    def movie_title(movie_id):
+        """Title for a list entry; entries that are not catalog ids (old titles, removed movies) are shown as-is."""
+        return all_movies_df.at[movie_id, 'title'] if movie_id in all_movies_df.index else movie_id
+
+
+    def movie_line(position):
+        """Title, year and popularity of the movie at `position` in `movies_df`."""
+        movie = movies_df.iloc[position]
+        return f"**{movie['title']}** (Year: {movie['release_year']}, Popularity: {movie['popularity']:.2f})"
+
+
+    # Sort choices for `paginated_results`: label -> (movies_df column, or None for the given order; descending)
+    MOVIE_SORTS = {"Most popular": ("popularity", True), "Title": ("title", False),
+                   "Newest": ("release_year", True), "Oldest": ("release_year", False)}
+    LIST_SORTS = {"Recently added": (None, True), "First added": (None, False), **MOVIE_SORTS}
+
+
+    def page_picker(key, total, page_size=paging.PAGE_SIZE):
+        """1-based page number for `total` results; no widget when they fit on one page."""
+        pages = paging.page_count(total, page_size)
+        if pages == 1:
+            return 1
+        # A result shorter than on the last rerun must not leave the widget past its last page
+        if st.session_state.get(key, 1) > pages:
+            st.session_state[key] = pages
+        return st.number_input("Page", min_value=1, max_value=pages, step=1, key=key)
+
+
+    def paginated_results(key, entries, positions, format_entry, sorts=MOVIE_SORTS, page_size=paging.PAGE_SIZE):
+        """A long result list shown one page at a time, as a single markdown element.
+
+        `positions` are the rows of `entries` in `movies_df` (-1 for entries outside it).  Sorting and
+        paging run here against the catalog's sort ranks (see movies.paging), so a rerun sends at most
+        `page_size` lines to the browser however long the result is.  Returns the entries on the page.
+        """
+        if not len(entries):
+            return []
+        sort_column, page_column = st.columns([2, 1])
+        with sort_column:
+            sort = st.selectbox("Sort by", list(sorts), key=f"{key}_sort")
+        with page_column:
+            page = page_picker(f"{key}_page", len(entries), page_size)
+        column, descending = sorts[sort]
+        with metrics.span("filter.results_page"):
+            order, total = catalog_data.index("sort_keys").page(positions, page - 1, page_size, column, descending)
+        shown = [entries[i] for i in order]
+        st.markdown("\n".join(f"- {format_entry(entry)}" for entry in shown))
+        if total > page_size:
+            first = (page - 1) * page_size
+            st.caption(f"{first + 1}-{first + len(shown)} of {total}")
+        return shown
+
+
+    def get_user_lists(username):
+        """The logged-in user's lists, read once per session and migrated from titles to ids."""
+        user_lists = st.session_state.get("user_lists")
+        if user_lists is None or user_lists.username != username:
+            user_lists = UserLists(db, username)
+            title_index = catalog_data.index("titles")
+
+            def resolve(entry):
+                if entry in all_movies_df.index:
+                    return None
+                rows = title_index.lookup(entry)
+                return movies_df.index[rows[0]] if len(rows) else None
+
+            user_lists.migrate(resolve)
+            st.session_state.user_lists = user_lists
+        return user_lists
+
+
+    # Authentication
+    if "logged_in_user" not in st.session_state:
         st.session_state.logged_in_user = None
-else:
-    st.sidebar.write("Please log in or register.")
-    auth_option = st.sidebar.radio("Choose an option:", ["Login", "Register"])
-    if auth_option == "Register":
-        reg_username = st.sidebar.text_input("Username (Register)", key="reg_username")
-        reg_password = st.sidebar.text_input("Password (Register)", type="password", key="reg_password")
-        if st.sidebar.button("Register"):
-            if reg_username and reg_password:
-                register_user(reg_username, reg_password)
-            else:
-                st.error("Please provide both username and password.")
-    elif auth_option == "Login":
-        login_username = st.sidebar.text_input("Username (Login)", key="login_username")
-        login_password = st.sidebar.text_input("Password (Login)", type="password", key="login_password")
-        if st.sidebar.button("Login"):
-            if login_username and login_password:
-                logged_in_user = login_user(login_username, login_password)
-                if logged_in_user:
-                    st.session_state.logged_in_user = logged_in_user
-            else:
-                st.error("Please provide both username and password.")
-
-# Main page content
-if st.session_state.logged_in_user:
-    page = st.sidebar.radio("Go to", ["Page 1", "Page 2", "Page 3"])
-
-    if page == "Page 1":
-        st.title("Page 1: Movie Dashboard")
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            st.subheader("Top 5 Movies by Popularity")
-            year = st.slider("Filter by Year", int(movies_df['release_year'].min()), int(movies_df['release_year'].max()), int(movies_df['release_year'].max()))
-            genre = st.selectbox("Filter by Genre", ["All"] + list(set(genre for sublist in movies_df['genres_list'].dropna() for genre in sublist)))
-            filtered_df = movies_df[movies_df['release_year'] == year]
-            if genre != "All":
-                filtered_df = filtered_df[filtered_df['genres_list'].apply(lambda x: genre in x if isinstance(x, list) else False)]
-            top_movies = filtered_df.sort_values(by="popularity", ascending=False).head(5)
-            fig = px.bar(top_movies, x="popularity", y="title", orientation="h", labels={"popularity": "Popularity", "title": "Title"})
-            st.plotly_chart(fig, use_container_width=True)
-
-            # Add the text below the chart
-            st.write("The chart shows the top 5 most popular movies of 2023 across all genres. "
-                    "**Blue Beetle** is the most popular, followed by **Gran Turismo**. Other movies include "
-                    "**The Nun II**, **Talk to Me**, and **Saw X** in decreasing popularity. Popularity is "
-                    "likely based on audience metrics.")
-
-        with col2:
-            st.subheader("Movie Information")
-            selected_movie = st.selectbox("Select a Movie", movies_df['title'])
-            movie_details = movies_df[movies_df['title'] == selected_movie].iloc[0]
-            st.markdown(f"**Release Date:** {movie_details['release_date']}")
-            st.markdown(f"**Popularity:** {movie_details['popularity']}")
-            st.markdown(f"**Genres:** {', '.join(movie_details['genres_list'])}")
-            st.markdown(f"**Overview:** {movie_details['overview']}")
-
-            st.write("This shows the Movie information section for the dashboard."
-                     "The user can type the name of a move or show or select one from the dropdown."
-                     "Once selected, information regarding the title that the user has selected will be shown.")
-
-        with col3:
-            st.subheader("Manage Lists")
-            user_ref = db.collection('users').document(st.session_state.logged_in_user)
-            user_data = user_ref.get().to_dict()
-            to_watch = user_data.get("to_watch", [])
-            favorites = user_data.get("favorites", [])
-            movie_to_add = st.selectbox("Add Movie to List", movies_df['title'])
-            if st.button("Add to To-Watch List"):
-                if movie_to_add not in to_watch:
-                    to_watch.append(movie_to_add)
-                    user_ref.update({"to_watch": to_watch})
-                    st.success(f"Added {movie_to_add} to To-Watch List.")
-            if st.button("Add to Favorites"):
-                if movie_to_add not in favorites:
-                    favorites.append(movie_to_add)
-                    user_ref.update({"favorites": favorites})
-                    st.success(f"Added {movie_to_add} to Favorites List.")
-
-            st.write("### To-Watch List")
-            for movie in to_watch:
-                st.write(f"- {movie}")
-            st.write("### Favorites List")
-            for movie in favorites:
-                st.write(f"- {movie}")
-
-            st.write("This section shows the 'To watch' list and 'Favourites' list."
-                     "The user is searches for a movie and once the user found the movie "
-                     "they are searching for, they can either add it to their faviourites list or to watch list")
-
-    elif page == "Page 2":
-        st.title("Production Countries and Genre Revenue Overview")
-
-        # First row: Production Countries Map and Movies by Country
-        col1, col2 = st.columns([2, 1])  # Adjust the width ratio as needed
-
-        # Prepare data for the map and charts
-        country_data = []
-        for _, row in movies_df.iterrows():
-            # Split multiple countries into individual entries
-            for country in row['mapped_production_countries']:
-                separated_countries = [c.strip() for c in country.split(",") if c.strip()]
-                for separated_country in separated_countries:
-                    country_data.append({
-                        'Country': separated_country,
-                        'Movie Title': row['title'],
-                        'Release Year': row['release_year'],
-                        'Popularity': row['popularity']
-                    })
-
-        if not country_data:
-            st.write("No production country data available.")
-        else:
-            # Convert to DataFrame
-            country_df = pd.DataFrame(country_data)
-
-            # Count occurrences of each country
-            country_counts = country_df['Country'].value_counts().reset_index()
-            country_counts.columns = ['Country', 'Count']
-
-            # Calculate percentage for each country
-            country_counts['Percentage'] = (country_counts['Count'] / country_counts['Count'].sum()) * 100
 
-            # Prepare data for the line chart
-            release_year_data = all_movies_df.groupby('release_year').size().reset_index(name='Count')
+    def register_user(username, password):
+        user_ref = db.collection('users').document(username)
+        with metrics.span("user_doc.read"):
+            exists = user_ref.get().exists
+        metrics.count("firestore_documents_read")
+        if exists:
+            st.error("Username already exists. Choose a different username.")
+        else:
+            with metrics.span("user_doc.write"):
+                user_ref.set({"password": password, "to_watch": [], "favorites": []})
+            metrics.count("firestore_documents_written")
+            st.success("Registration successful! You can now log in.")
+
+    def login_user(username, password):
+        user_ref = db.collection('users').document(username)
+        with metrics.span("user_doc.read"):
+            user_doc = user_ref.get()
+        metrics.count("firestore_documents_read")
+        if user_doc.exists and user_doc.to_dict().get("password") == password:
+            st.success("Login successful!")
+            return username
+        else:
+            st.error("Invalid username or password.")
+            return None
+
+    # Sidebar: Login/Registration
+    if st.session_state.logged_in_user:
+        username = st.session_state.logged_in_user
+        st.sidebar.write(f"Logged in as: {username}")
+        if st.sidebar.button("Logout"):
+            st.session_state.logged_in_user = None
+    else:
+        st.sidebar.write("Please log in or register.")
+        auth_option = st.sidebar.radio("Choose an option:", ["Login", "Register"])
+        if auth_option == "Register":
+            reg_username = st.sidebar.text_input("Username (Register)", key="reg_username")
+            reg_password = st.sidebar.text_input("Password (Register)", type="password", key="reg_password")
+            if st.sidebar.button("Register"):
+                if reg_username and reg_password:
+                    register_user(reg_username, reg_password)
+                else:
+                    st.error("Please provide both username and password.")
+        elif auth_option == "Login":
+            login_username = st.sidebar.text_input("Username (Login)", key="login_username")
+            login_password = st.sidebar.text_input("Password (Login)", type="password", key="login_password")
+            if st.sidebar.button("Login"):
+                if login_username and login_password:
+                    logged_in_user = login_user(login_username, login_password)
+                    if logged_in_user:
+                        st.session_state.logged_in_user = logged_in_user
+                else:
+                    st.error("Please provide both username and password.")
+
+    # Main page content
+    if st.session_state.logged_in_user:
+        page = st.sidebar.radio("Go to", ["Page 1", "Page 2", "Page 3"])
+        rerun_trace.name = page
+
+        # Catalog status and manual refresh
+        st.sidebar.caption(f"Catalog: {len(all_movies_df)} movies ({catalog_data.memory_usage()['per_movie']:.0f} bytes each), "
+                           f"loaded {int(catalog_data.age() // 60)} min ago")
+        if catalog.is_refreshing():
+            st.sidebar.caption("Refreshing catalog in the background...")
+        elif st.sidebar.button("Refresh catalog"):
+            catalog.refresh()
+            st.sidebar.info("Catalog refresh started. New data will appear on a later rerun.")
+
+        if page == "Page 1":
+            st.title("Page 1: Movie Dashboard")
+            col1, col2, col3 = st.columns(3)
 
-            # Column 1: Display the geographical scatter map
             with col1:
-                st.subheader("Production Countries Map")
-                fig = px.scatter_geo(
-                    country_counts,
-                    locations="Country",
-                    locationmode="country names",
-                    size="Count",
-                    title="Production Countries",
-                    projection="natural earth",
-                )
-                fig.update_traces(marker=dict(color="blue", opacity=0.7))
+                top_header = st.empty()
+                year = st.slider("Filter by Year", int(movies_df['release_year'].min()), int(movies_df['release_year'].max()), int(movies_df['release_year'].max()))
+                genre = st.selectbox("Filter by Genre", ["All"] + genre_index.genres)
+                # The table keeps DEFAULT_TOP_K (MOVIES_TOP_K) movies per group, so never offer more
+                top_n = st.selectbox("Number of movies",
+                                     [n for n in (5, 10, 25, 50) if n < DEFAULT_TOP_K] + [min(DEFAULT_TOP_K, 50)])
+                top_header.subheader(f"Top {top_n} Movies by Popularity")
+                # Precomputed per (year, genre), so this is a lookup rather than a sort (or one indexed query)
+                with metrics.span("filter.top_movies"):
+                    top_ids = (sql or catalog_data.index("top_movies")).top(year, None if genre == "All" else genre, top_n)
+                    top_movies = movies_df.loc[top_ids]
+                with metrics.span("chart.top_movies"):
+                    fig = px.bar(top_movies, x="popularity", y="title", orientation="h", labels={"popularity": "Popularity", "title": "Title"})
                 st.plotly_chart(fig, use_container_width=True)
 
-            # Column 2: Display 5 random movies by country
-            with col2:
-                st.subheader("Movies by Country")
-                selected_country = st.selectbox(
-                    "Select a country to view movies:",
-                    country_df['Country'].unique(),
-                    help="Choose a country to view movies produced there.",
-                )
-                if selected_country:
-                    # Filter and randomly pick up to 5 movies
-                    movies_from_country = country_df[country_df['Country'] == selected_country]
-                    st.write(f"Movies from {selected_country}:")
-                    import random
-                    if len(movies_from_country) > 5:
-                        movies_from_country = movies_from_country.sample(5)  # Pick 5 random movies
-                    for _, movie in movies_from_country.iterrows():
-                        st.write(f"- **{movie['Movie Title']}** (Year: {movie['Release Year']}, Popularity: {movie['Popularity']:.2f})")
-
-                    # Add descriptive sentence
-                    st.write(
-                        f"This map shows movie production by country. Selected: {selected_country}, with movies like "
-                        f"{', '.join([f'{row["Movie Title"]} ({row["Release Year"]}, Popularity: {row["Popularity"]:.2f})' for _, row in movies_from_country.iterrows()])}."
-        )
-
-
-            # Second row: Pie chart and line chart
-            col3, col4 = st.columns([1, 1])  # Split the row into two equal-width columns
-            with col3:
-                st.subheader("Production Country Distribution (Pie Chart)")
-                pie_fig = px.pie(
-                    country_counts,
-                    values='Percentage',
-                    names='Country',
-                    title="Production Country Percentage",
-                    hover_data=['Count'],
-                    labels={'Percentage': 'Percentage (%)'},
-                )
-                pie_fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(pie_fig, use_container_width=True)
-
-                st.write("The pie chart shows the distribution of movie production by country. The United States dominates with 47.4%, followed by the United Kingdom (14%) and Canada (8.13%). Other countries contribute smaller percentages.")
-
-            with col4:
-                st.subheader("Number of Movies Released Over Time (Line Chart)")
-                line_fig = px.line(
-                    release_year_data,
-                    x='release_year',
-                    y='Count',
-                    title="Movies Released Per Year",
-                    labels={'release_year': 'Year', 'Count': 'Number of Movies'},
-                    markers=True
-                )
-                line_fig.update_layout(
-                    xaxis=dict(
-                        title='Release Year',
-                        tickmode='linear'  # Ensure only integer values appear
-                    ),
-                    yaxis=dict(title='Number of Movies'),
-                    margin=dict(l=0, r=0, t=30, b=50),
-                )
-                st.plotly_chart(line_fig, use_container_width=True)
-
-                st.write("The line chart shows the number of movies released per year from 2019 to 2023. Movie releases dropped significantly in 2020, peaked in 2021, and dipped in 2022 before rising again in 2023.")
-
-        # Revenue by Genre Analysis
-        st.subheader("Revenue by Genre and Year")
-
-        # Dropdown filters for Genre and Year
-        selected_genres = st.multiselect(
-            "Select Genre(s):",
-            options=list(set(genre for sublist in movies_df['genres_list'].dropna() for genre in sublist)),
-            default=["Action"]  # Default to one genre
-        )
-        selected_year = st.slider(
-            "Select Year Range:",
-            int(movies_df['release_year'].min()),
-            int(movies_df['release_year'].max()),
-            (int(movies_df['release_year'].min()), int(movies_df['release_year'].max()))
-        )
-
-        # Filter data based on selected genres and year range
-        filtered_movies = movies_df[
-            (movies_df['release_year'] >= selected_year[0]) &
-            (movies_df['release_year'] <= selected_year[1]) &
-            (movies_df['genres_list'].apply(lambda genres: any(genre in genres for genre in selected_genres)))
-        ]
-
-        if not filtered_movies.empty:
-            # Group by Genre and calculate total revenue
-            genre_revenue = filtered_movies.explode('genres_list').groupby('genres_list')['revenue'].sum().reset_index()
-            genre_revenue = genre_revenue[genre_revenue['genres_list'].isin(selected_genres)]
-
-            # Create bar chart
-            revenue_chart = px.bar(
-                genre_revenue,
-                x='genres_list',
-                y='revenue',
-                title=f"Revenue by Genre ({selected_year[0]} - {selected_year[1]})",
-                labels={'genres_list': 'Genre', 'revenue': 'Total Revenue'},
-                text='revenue'
-            )
-            revenue_chart.update_layout(xaxis=dict(title="Genre"), yaxis=dict(title="Total Revenue"))
-            st.plotly_chart(revenue_chart, use_container_width=True)
-        else:
-            st.write("No data available for the selected genres and year range.")
-
-        st.write("This chart allows users to compare the revenue that was generated between 2019 and 2023. The users can choose multiple genres and compare their revenue ")
-
-    elif page == "Page 3":
-            st.title("Actors and Their Movies")
+                # Add the text below the chart
+                st.write("The chart shows the top 5 most popular movies of 2023 across all genres. "
+                        "**Blue Beetle** is the most popular, followed by **Gran Turismo**. Other movies include "
+                        "**The Nun II**, **Talk to Me**, and **Saw X** in decreasing popularity. Popularity is "
+                        "likely based on audience metrics.")
 
-            # Prepare data for actor search
-            def parse_cast_list(cast_str):
-                try:
-                    # Convert the cast list from string to a Python list
-                    return ast.literal_eval(cast_str) if isinstance(cast_str, str) else []
-                except:
-                    return []
-
-            # Apply the parsing function to the 'Cast_list' column
-            movies_df['Cast_list'] = movies_df['Cast_list'].apply(parse_cast_list)
-
-            # Search bar for actor names
-            st.subheader("Search for an Actor")
-            actor_name = st.text_input("Enter the name of an actor:", help="Type the name of an actor to see their movies.")
-
-            if actor_name:
-                # Convert user input to lowercase
-                actor_name_lower = actor_name.lower()
-
-                # Filter movies where the actor appears in the Cast_list (case-insensitive)
-                movies_with_actor = movies_df[movies_df['Cast_list'].apply(
-                    lambda x: any(actor_name_lower == actor.lower() for actor in x) if isinstance(x, list) else False
-                )]
+            with col2:
+                st.subheader("Movie Information")
+                selected_id = movie_picker("Select a Movie", key="movie_details")
+                if selected_id is not None:
+                    movie_position = movies_df.index.get_loc(selected_id)
+                    movie_details = movies_df.iloc[movie_position]
+                    st.markdown(f"**Release Date:** {movie_details['release_date']}")
+                    st.markdown(f"**Popularity:** {movie_details['popularity']:.2f}")
+                    st.markdown(f"**Genres:** {', '.join(movie_lists['genres_list'].row(movie_position))}")
+                    # Overviews are not part of the core catalog; fetched (and cached) per movie
+                    st.markdown(f"**Overview:** {catalog_data.values('overview', [selected_id])[0]}")
+
+                st.write("This shows the Movie information section for the dashboard."
+                         "The user can type the name of a move or show or select one from the dropdown."
+                         "Once selected, information regarding the title that the user has selected will be shown.")
 
-                if not movies_with_actor.empty:
-                    st.write(f"Movies featuring **{actor_name}**:")
-                    for _, movie in movies_with_actor.iterrows():
-                        st.write(f"- **{movie['title']}** (Year: {movie['release_year']}, Popularity: {movie['popularity']:.2f})")
+            with col3:
+                st.subheader("Manage Lists")
+                # Cached per session; buttons write ArrayUnion/ArrayRemove without reading first
+                user_lists = get_user_lists(st.session_state.logged_in_user)
+                movie_to_add = movie_picker("Add Movie to List", key="movie_to_add")
+                if st.button("Add to To-Watch List", disabled=movie_to_add is None):
+                    if movie_to_add not in user_lists["to_watch"]:
+                        user_lists.add("to_watch", [movie_to_add])
+                        st.success(f"Added {movie_title(movie_to_add)} to To-Watch List.")
+                if st.button("Add to Favorites", disabled=movie_to_add is None):
+                    if movie_to_add not in user_lists["favorites"]:
+                        user_lists.add("favorites", [movie_to_add])
+                        st.success(f"Added {movie_title(movie_to_add)} to Favorites List.")
+
+                for list_name, heading in [("to_watch", "To-Watch List"), ("favorites", "Favorites List")]:
+                    st.write(f"### {heading}")
+                    entries = user_lists[list_name]
+                    shown = paginated_results(list_name, entries, movies_df.index.get_indexer(entries), movie_title,
+                                              sorts=LIST_SORTS, page_size=10)
+                    # Only the page on screen is offered for removal, so long lists stay out of the payload
+                    to_remove = st.multiselect(f"Remove from {heading}", shown,
+                                               format_func=movie_title, key=f"remove_{list_name}")
+                    if st.button(f"Remove selected from {heading}", disabled=not to_remove):
+                        user_lists.remove(list_name, to_remove)
+                        st.rerun()
+                # Movies closest to the user's lists in genres, cast and countries
+                if user_lists["favorites"] or user_lists["to_watch"]:
+                    st.write("### Recommended for you")
+                    with metrics.span("filter.recommendations"):
+                        recommended = catalog_data.index("recommendations").recommend(
+                            user_lists["favorites"], user_lists["to_watch"], n=10)
+                    st.markdown("\n".join(f"- {movie_title(movie)}" for movie in recommended))
+                if st.button("Reload lists", help="Pick up changes made in another tab or device."):
+                    user_lists.reload()
+                    st.rerun()
+
+                st.write("This section shows the 'To watch' list and 'Favourites' list."
+                         "The user is searches for a movie and once the user found the movie "
+                         "they are searching for, they can either add it to their faviourites list or to watch list")
+
+            st.subheader("Search Titles and Overviews")
+            search_query = st.text_input("Search", key="search_query", placeholder="Words from a title or plot...")
+            if search_query.strip():
+                page_size = 20
+                # A new query starts on its first page
+                if st.session_state.get("search_for") != search_query:
+                    st.session_state["search_for"] = search_query
+                    st.session_state.pop("search_page", None)
+                search_index = catalog_data.index("search")
+                requested_page = st.session_state.get("search_page", 1)
+                # Ranked by BM25 from the inverted index; only one page of ids is materialized
+                with metrics.span("filter.search"):
+                    found, total = search_index.search(search_query, requested_page - 1, page_size)
+                results_page = page_picker("search_page", total, page_size)
+                if results_page != requested_page:
+                    # Fewer matches than when that page was picked (a sync changed the catalog)
+                    with metrics.span("filter.search"):
+                        found, total = search_index.search(search_query, results_page - 1, page_size)
+                if not total:
+                    st.caption("No movies match that search.")
                 else:
-                    st.write(f"No movies found featuring **{actor_name}**.")
+                    st.caption(f"{total} matches, page {results_page} of {paging.page_count(total, page_size)}")
+                    overviews = catalog_data.values('overview', found)
+                    st.markdown("\n".join(
+                        f"- **{movie_title(movie)}** ({movies_df.at[movie, 'release_year']}): {str(overview or '')[:200]}"
+                        for movie, overview in zip(found, overviews)))
+
+        elif page == "Page 2":
+            st.title("Production Countries and Genre Revenue Overview")
+            # The whole page from the precomputed rollups when enabled and as new as the catalog, otherwise
+            # from the catalog, so the charts, the country picker and its movie list never disagree
+            page_rollups = load_rollups()
+            if page_rollups is not None and not rollups_current(page_rollups):
+                page_rollups = None
+            if page_rollups is not None:
+                st.caption(f"Aggregates as of {page_rollups.computed_at:%Y-%m-%d %H:%M} UTC")
+                revenue_cube = page_rollups.revenue_cube()
+                country_counts = page_rollups.country_counts()
+                unresolved_countries = page_rollups.unresolved_countries()
+                country_codes = dict(zip(country_counts['Country'], country_counts['ISO3']))
+                country_names = list(country_codes)
+                genre_options = revenue_cube.genres
+                year_bounds = (revenue_cube.first_year, revenue_cube.last_year)
             else:
-                st.write("Enter an actor's name in the search bar above to find their movies.")
-
-            st.write("This interface allows users to search for an actor by entering their name. It helps retrieve and display movies associated with the actor.")
+                revenue_cube = sql or catalog_data.index("revenue_cube")  # Genre x year totals with running sums
+                # Movie x country table and per-country counts, built once per catalog version
+                country_table = catalog_data.index("countries")
+                country_counts = sql.country_counts() if sql is not None else country_table.country_counts
+                unresolved_countries = country_table.unresolved
+                country_names = country_table.countries()
+                genre_options = genre_index.genres
+                year_bounds = (int(movies_df['release_year'].min()), int(movies_df['release_year'].max()))
+
+            # First row: Production Countries Map and Movies by Country
+            col1, col2 = st.columns([2, 1])  # Adjust the width ratio as needed
+
+            if not len(country_counts):
+                st.write("No production country data available.")
+            else:
+                # Prepare data for the line chart
+                release_year_data = revenue_cube.releases_per_year()
+
+                # Column 1: Display the geographical scatter map
+                with col1:
+                    st.subheader("Production Countries Map")
+                    with metrics.span("chart.country_map"):
+                        fig = px.scatter_geo(
+                            country_counts,
+                            locations="ISO3",
+                            locationmode="ISO-3",
+                            hover_name="Country",
+                            size="Count",
+                            title="Production Countries",
+                            projection="natural earth",
+                        )
+                        fig.update_traces(marker=dict(color="blue", opacity=0.7))
+                    st.plotly_chart(fig, use_container_width=True)
+                    if len(unresolved_countries):
+                        st.caption("Not on the map (unrecognized country names): " +
+                                   ", ".join(unresolved_countries['Country'].head(10)))
+
+                # Column 2: The selected country's movies, one sortable page at a time (most popular first)
+                with col2:
+                    st.subheader("Movies by Country")
+                    selected_country = st.selectbox(
+                        "Select a country to view movies:",
+                        country_names,
+                        help="Choose a country to view movies produced there.",
+                    )
+                    if selected_country:
+                        with metrics.span("filter.country_movies"):
+                            if page_rollups is not None:
+                                # The rollups keep each country's most popular movies, not all of them
+                                country_positions = movies_df.index.get_indexer(
+                                    page_rollups.country_movies.get(country_codes[selected_country], []))
+                                country_positions = country_positions[country_positions >= 0]
+                            else:
+                                country_positions = (sql or country_table).movie_positions(selected_country)
+                        st.write(f"Movies from {selected_country}:")
+                        shown = paginated_results("country_movies", country_positions, country_positions, movie_line,
+                                                  page_size=10)
+
+                        # Add descriptive sentence
+                        examples = ", ".join(f"{movies_df['title'].iat[position]} ({movies_df['release_year'].iat[position]}, "
+                                             f"Popularity: {movies_df['popularity'].iat[position]:.2f})"
+                                             for position in shown[:5])
+                        st.write(f"This map shows movie production by country. Selected: {selected_country}, "
+                                 f"with movies like {examples}.")
+
+
+                # Second row: Pie chart and line chart
+                col3, col4 = st.columns([1, 1])  # Split the row into two equal-width columns
+                with col3:
+                    st.subheader("Production Country Distribution (Pie Chart)")
+                    with metrics.span("chart.country_pie"):
+                        pie_fig = px.pie(
+                            country_counts,
+                            values='Percentage',
+                            names='Country',
+                            title="Production Country Percentage",
+                            hover_data=['Count'],
+                            labels={'Percentage': 'Percentage (%)'},
+                        )
+                        pie_fig.update_traces(textposition='inside', textinfo='percent+label')
+                    st.plotly_chart(pie_fig, use_container_width=True)
+
+                    st.write("The pie chart shows the distribution of movie production by country. The United States dominates with 47.4%, followed by the United Kingdom (14%) and Canada (8.13%). Other countries contribute smaller percentages.")
+
+                with col4:
+                    st.subheader("Number of Movies Released Over Time (Line Chart)")
+                    with metrics.span("chart.releases"):
+                        line_fig = px.line(
+                            release_year_data,
+                            x='release_year',
+                            y='Count',
+                            title="Movies Released Per Year",
+                            labels={'release_year': 'Year', 'Count': 'Number of Movies'},
+                            markers=True
+                        )
+                        line_fig.update_layout(
+                            xaxis=dict(
+                                title='Release Year',
+                                tickmode='linear'  # Ensure only integer values appear
+                            ),
+                            yaxis=dict(title='Number of Movies'),
+                            margin=dict(l=0, r=0, t=30, b=50),
+                        )
+                    st.plotly_chart(line_fig, use_container_width=True)
+
+                    st.write("The line chart shows the number of movies released per year from 2019 to 2023. Movie releases dropped significantly in 2020, peaked in 2021, and dipped in 2022 before rising again in 2023.")
+
+            # Revenue by Genre Analysis
+            st.subheader("Revenue by Genre and Year")
+
+            # Dropdown filters for Genre and Year
+            selected_genres = st.multiselect(
+                "Select Genre(s):",
+                options=genre_options,
+                default=["Action"]  # Default to one genre
+            )
+            selected_year = st.slider(
+                "Select Year Range:",
+                year_bounds[0],
+                year_bounds[1],
+                year_bounds
+            )
 
-            # Flatten the Cast_list column and count actor appearances
-            all_actors = movies_df['Cast_list'].explode().value_counts().reset_index()
-            all_actors.columns = ['Actor', 'Title Count']
+            # Totals per selected genre over the year range, from the precomputed running sums
+            with metrics.span("filter.genre_revenue"):
+                genre_counts, genre_totals = revenue_cube.range_totals(selected_genres, *selected_year)
+
+            if genre_counts.any():
+                # A movie counts towards each of its genres
+                shown = genre_counts > 0
+                genre_revenue = pd.DataFrame({
+                    'genres_list': np.array(selected_genres, dtype=object)[shown],
+                    'revenue': genre_totals[shown],
+                })
+
+                # Create bar chart
+                with metrics.span("chart.genre_revenue"):
+                    revenue_chart = px.bar(
+                        genre_revenue,
+                        x='genres_list',
+                        y='revenue',
+                        title=f"Revenue by Genre ({selected_year[0]} - {selected_year[1]})",
+                        labels={'genres_list': 'Genre', 'revenue': 'Total Revenue'},
+                        text='revenue'
+                    )
+                    revenue_chart.update_layout(xaxis=dict(title="Genre"), yaxis=dict(title="Total Revenue"))
+                st.plotly_chart(revenue_chart, use_container_width=True)
+            else:
+                st.write("No data available for the selected genres and year range.")
+
+            st.write("This chart allows users to compare the revenue that was generated between 2019 and 2023. The users can choose multiple genres and compare their revenue ")
+
+        elif page == "Page 3":
+                st.title("Actors and Their Movies")
+
+                # Search bar for actor names
+                st.subheader("Search for an Actor")
+                actor_name = st.text_input("Enter the name of an actor:", help="Type the name of an actor to see their movies.")
+
+                actor_index = sql.actors if sql is not None else catalog_data.index("actors")
+                if actor_name:
+                    # Case-insensitive lookup in the prebuilt actor index
+                    with metrics.span("filter.actor_search"):
+                        actor_positions = actor_index.movies(actor_name)
+                    if not len(actor_positions):
+                        # Not an exact name: offer the actors starting with what was typed
+                        suggestions = actor_index.suggest(actor_name)
+                        if suggestions:
+                            actor_name = st.selectbox("Matching actors:", suggestions)
+                            actor_positions = actor_index.movies(actor_name)
+                    if len(actor_positions):
+                        st.write(f"Movies featuring **{actor_name}**:")
+                        paginated_results("actor_movies", actor_positions, actor_positions, movie_line)
+
+                        # One row of the prebuilt co-appearance matrix, not a scan over every pair of actors
+                        st.write(f"Frequent collaborators of **{actor_name}**:")
+                        second_degree = st.checkbox("Include second-degree connections",
+                                                    help="Actors who worked with this actor's co-stars, but not with them.")
+                        with metrics.span("filter.costars"):
+                            costars = catalog_data.index("costars")
+                            collaborators = costars.collaborators(actor_name, 10)
+                            connections = costars.second_degree(actor_name, 10) if second_degree else None
+                        st.dataframe(collaborators, hide_index=True)
+                        if connections is not None:
+                            st.dataframe(connections, hide_index=True)
+                    else:
+                        st.write(f"No movies found featuring **{actor_name}**.")
+                else:
+                    st.write("Enter an actor's name in the search bar above to find their movies.")
 
-            # Filter out "Miscellaneous"
-            all_actors = all_actors[all_actors['Actor'] != "Miscellaneous"]
+                st.write("This interface allows users to search for an actor by entering their name. It helps retrieve and display movies associated with the actor.")
 
-            # Toggle switch for most/least titles
-            toggle = st.radio("Toggle to view actors featured in:", ["Most Titles", "Least Titles"])
-            if toggle == "Most Titles":
-                filtered_actors = all_actors.head(10)  # Top 10 actors by title count
-                title = "Actors Featured in the Most Titles"
-            else:
-                filtered_actors = all_actors.tail(10)  # Bottom 10 actors by title count
-                title = "Actors Featured in the Least Titles"
-
-            # Plot the chart
-            if not filtered_actors.empty:
-                chart = px.bar(
-                    filtered_actors,
-                    x="Title Count",
-                    y="Actor",
-                    orientation="h",
-                    title=title,
-                    labels={"Title Count": "Number of Titles", "Actor": "Actor Name"},
-                    height=400
-                )
-                chart.update_layout(yaxis=dict(categoryorder="total ascending"))
-                st.plotly_chart(chart, use_container_width=True)
-
-            st.write("This bar chart shows the actors that are featured in the most titles."
-                     "The user is also able to toggle to see which actors are featured in the least titles")
+                # Toggle switch for most/least titles (counts come from the actor index, without "Miscellaneous")
+                toggle = st.radio("Toggle to view actors featured in:", ["Most Titles", "Least Titles"])
+                if toggle == "Most Titles":
+                    filtered_actors = actor_index.ranked(10, most=True, exclude=["Miscellaneous"])  # Top 10 actors by title count
+                    title = "Actors Featured in the Most Titles"
+                else:
+                    filtered_actors = actor_index.ranked(10, most=False, exclude=["Miscellaneous"])  # Bottom 10 actors by title count
+                    title = "Actors Featured in the Least Titles"
+
+                # Plot the chart
+                if not filtered_actors.empty:
+                    with metrics.span("chart.actors"):
+                        chart = px.bar(
+                            filtered_actors,
+                            x="Title Count",
+                            y="Actor",
+                            orientation="h",
+                            title=title,
+                            labels={"Title Count": "Number of Titles", "Actor": "Actor Name"},
+                            height=400
+                        )
+                        chart.update_layout(yaxis=dict(categoryorder="total ascending"))
+                    st.plotly_chart(chart, use_container_width=True)
+
+                st.write("This bar chart shows the actors that are featured in the most titles."
+                         "The user is also able to toggle to see which actors are featured in the least titles")
+
+        # Debug panel: where this rerun's time went, plus process totals
+        metrics.registry.end_trace()
+        if st.session_state.logged_in_user in ADMIN_USERS:
+            with st.sidebar.expander("Debug: timings"):
+                st.caption(f"This rerun: {rerun_trace.seconds * 1000:.0f} ms")
+                spans = sorted(rerun_trace.spans, key=lambda span: span[1])  # by start, so parents come first
+                st.dataframe(pd.DataFrame({
+                    'Span': ["  " * depth + name for name, _, _, depth in spans],
+                    'ms': [seconds * 1000 for _, _, seconds, _ in spans],
+                }), hide_index=True)
+                if rerun_trace.counters:
+                    st.json(rerun_trace.counters)
+                totals = metrics.registry.snapshot()
+                st.caption("Since process start")
+                st.dataframe(pd.DataFrame([{'Span': name, 'Count': stats['count'], 'Total s': stats['seconds'],
+                                            'Max ms': stats['max_seconds'] * 1000}
+                                           for name, stats in sorted(totals['spans'].items())]), hide_index=True)
+                st.json(totals['counters'])
+                st.download_button("Download Prometheus metrics", metrics.registry.prometheus_text(),
+                                   file_name="movies_metrics.prom")
+finally:
+    # Also ends logged-out reruns and ones cut short by st.rerun() or an error (a no-op after the debug panel)
+    metrics.registry.end_trace()
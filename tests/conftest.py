@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from movies import sync
+from movies.fakestore import FakeClient
+from movies.synthetic import generate_movies
+
+
+class Movies:
+    """A fake `movies2` collection of synthetic movies, written like the ingest job writes them."""
+
+    def __init__(self, n=500, seed=0):
+        self.db = FakeClient()
+        self.ref = self.db.collection("movies2")
+        self.ids = []
+        for doc_id, document in generate_movies(n, seed):
+            self.write(doc_id, document)
+            self.ids.append(doc_id)
+
+    def write(self, doc_id, document):
+        self.ref.document(doc_id).set({**document, sync.UPDATED_AT_FIELD: SERVER_TIMESTAMP})
+
+    def get(self, doc_id):
+        return self.ref.document(doc_id).get().to_dict()
+
+    def edit(self, doc_id, **fields):
+        self.write(doc_id, {**self.get(doc_id), **fields})
+
+    def soft_delete(self, doc_id):
+        self.edit(doc_id, **{sync.DELETED_FIELD: True})
+
+    def make_changes(self):
+        """An edit, a genre change, a soft delete and a new movie; returns their ids in that order."""
+        # Keep every change strictly after the cursor of anything loaded before
+        time.sleep(0.002)
+        edited, regenred, deleted = self.ids[1], self.ids[2], self.ids[3]
+        self.edit(edited, title="Amélie Returns", popularity=1e6)
+        self.edit(regenred, genres_list="['Horror', 'Western']", release_year=2001)
+        self.soft_delete(deleted)
+        added = "zzzzNewMovie00000001"
+        self.write(added, {**self.get(self.ids[4]), 'title': "Brand New", 'production_countries': "['France']"})
+        return edited, regenred, deleted, added
+
+
+@pytest.fixture
+def movies():
+    return Movies()
@@ -0,0 +1,22 @@
+from movies.catalog import Catalog
+from movies.prep import MOVIE_FIELDS
+
+
+def test_list_column_matches_a_load_of_every_field(movies):
+    data = Catalog(movies.db, "movies2").get()
+    assert "Cast_list" not in data.lists
+    expected = Catalog(movies.db, "movies2", fields=MOVIE_FIELDS).get()
+    positions = expected.movies_df.index.get_indexer(data.movies_df.index)
+    column = data.list_column("Cast_list")
+    assert column.to_lists() == expected.lists["Cast_list"].take(positions).to_lists()
+    assert data.list_column("Cast_list") is column
+
+
+def test_list_column_is_reloaded_with_a_full_refresh(movies):
+    catalog = Catalog(movies.db, "movies2", sync="full")
+    catalog.get().list_column("Cast_list")
+    movies.edit(movies.ids[1], Cast_list="['New Face']")
+    catalog.refresh(wait=True, full=True)
+    data = catalog.get()
+    assert "Cast_list" in data.lists
+    assert data.lists["Cast_list"].row(data.movies_df.index.get_loc(movies.ids[1])) == ["New Face"]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from movies.catalog import Catalog
+from movies.search import SearchIndex
+from movies.top_movies import TopMovies
+
+
+def synced_catalog(movies):
+    """A poll-mode catalog with the updatable indexes built, before and after `make_changes`."""
+    catalog = Catalog(movies.db, "movies2", sync="poll")
+    catalog.register_index("search", SearchIndex.build, SearchIndex.update)
+    catalog.register_index("top_movies", TopMovies.build, TopMovies.update, eager=True)
+    before = catalog.get()
+    before.index("search")
+    movies.make_changes()
+    catalog.refresh(wait=True, full=False)
+    data = catalog.get()
+    assert data is not before and catalog.last_error is None
+    return before, data
+
+
+def test_top_movies_update_matches_rebuild(movies):
+    before, data = synced_catalog(movies)
+    patched, rebuilt = data.index("top_movies"), TopMovies.build(data)
+    assert patched is not before.index("top_movies")
+    assert patched._top.keys() == rebuilt._top.keys()
+    for key, ids in rebuilt._top.items():
+        assert list(patched._top[key]) == list(ids), key
+
+
+@pytest.mark.parametrize("query", ["amelie returns", "brand new", "the", "love night", "city"])
+def test_search_update_matches_rebuild(movies, query):
+    before, data = synced_catalog(movies)
+    patched, rebuilt = data.index("search"), SearchIndex.build(data)
+    assert patched is not before.index("search")
+
+    def scored(index):
+        documents, scores = index.scores(query)
+        return dict(zip(index.doc_ids[documents].tolist(), scores))
+
+    expected = scored(rebuilt)
+    actual = scored(patched)
+    assert actual.keys() == expected.keys()
+    assert np.allclose([actual[doc_id] for doc_id in expected], list(expected.values()))
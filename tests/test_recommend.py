@@ -0,0 +1,17 @@
+from movies.catalog import Catalog
+from movies.prep import MOVIE_FIELDS
+from movies.recommend import Recommender
+
+
+def test_cast_is_added_in_the_background(movies):
+    data = Catalog(movies.db, "movies2").get()
+    recommender = Recommender.build(data)
+    recommender._cast_thread.join(30)
+    assert recommender.has_cast and "Cast_list" in data.lists
+
+    loaded = Catalog(movies.db, "movies2", fields=MOVIE_FIELDS).get()
+    expected = Recommender.build(loaded)
+    assert expected._cast_thread is None and expected.has_cast
+    ids = data.movies_df.index
+    for favorites in ([ids[0], ids[1]], [ids[10]], [ids[20], ids[30], ids[40]]):
+        assert list(recommender.recommend(favorites)) == list(expected.recommend(favorites))
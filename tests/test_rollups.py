@@ -0,0 +1,43 @@
+import pytest
+
+from movies import rollups
+from movies.catalog import Catalog
+from movies.countries import country_name
+from movies.country_table import CountryTable
+
+
+def test_incremental_update_matches_full(movies, tmp_path):
+    store = rollups.open_store(str(tmp_path / "rollups.json"))
+    snapshot_path = str(tmp_path / "catalog.snapshot")
+    _, changed = rollups.update_rollups(movies.db, store, snapshot_path=snapshot_path)
+    assert changed is None
+
+    movies.make_changes()
+    updated, changed = rollups.update_rollups(movies.db, store, snapshot_path=snapshot_path)
+    assert changed == 4
+    full, _ = rollups.update_rollups(movies.db, rollups.open_store(str(tmp_path / "full.json")),
+                                     snapshot_path=str(tmp_path / "full.snapshot"), full=True)
+
+    assert updated.countries == full.countries
+    assert updated.releases == full.releases
+    assert updated.genre_years.keys() == full.genre_years.keys()
+    for genre, cells in full.genre_years.items():
+        assert updated.genre_years[genre].keys() == cells.keys(), genre
+        for year, (count, revenue) in cells.items():
+            assert updated.genre_years[genre][year] == [count, pytest.approx(revenue)], (genre, year)
+    assert updated.unresolved == full.unresolved
+    assert updated.country_movies == full.country_movies
+    assert updated.cursor == full.cursor
+    assert store.read().cursor == updated.cursor
+
+
+def test_country_movies_are_the_most_popular(movies, tmp_path):
+    store = rollups.open_store(str(tmp_path / "rollups.json"))
+    computed, _ = rollups.update_rollups(movies.db, store, snapshot_path=str(tmp_path / "catalog.snapshot"))
+    data = Catalog(movies.db, "movies2").get()
+    table = CountryTable.build(data)
+    for iso3, ids in computed.country_movies.items():
+        positions = table.movie_positions(country_name(iso3))
+        expected = data.movies_df.iloc[positions].sort_values('popularity', ascending=False, kind='stable')
+        assert ids == expected.index[:rollups.COUNTRY_MOVIES].tolist(), iso3
+    assert store.read().country_movies == computed.country_movies
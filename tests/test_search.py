@@ -0,0 +1,16 @@
+from movies.catalog import Catalog
+from movies.search import SearchIndex, tokenize
+
+
+def test_tokenize_ignores_accents_case_and_punctuation():
+    documents, words = tokenize(["Amélie", "Léon: The Professional", None])
+    assert documents.tolist() == [0, 1, 1]
+    assert words.to_pylist() == ["amelie", "leon", "professional"]
+
+
+def test_unaccented_query_finds_accented_titles(movies):
+    movies.edit(movies.ids[0], title="Amélie")
+    movies.edit(movies.ids[1], title="Léon")
+    index = SearchIndex.build(Catalog(movies.db, "movies2").get())
+    assert movies.ids[0] in index.search("amelie")[0]
+    assert movies.ids[1] in index.search("LEON")[0]
@@ -0,0 +1,86 @@
+import pandas as pd
+
+from movies.catalog import Catalog
+
+
+def full_load(movies):
+    return Catalog(movies.db, "movies2", sync="full").get()
+
+
+def assert_same_catalog(data, expected):
+    assert list(data.movies_df.index.sort_values()) == list(expected.movies_df.index.sort_values())
+    columns = list(expected.all_movies_df.columns)
+    pd.testing.assert_frame_equal(data.all_movies_df[columns].sort_index().astype(object),
+                                  expected.all_movies_df.sort_index().astype(object))
+    positions = data.movies_df.index.get_indexer(expected.movies_df.index)
+    for field, column in expected.lists.items():
+        assert [sorted(data.lists[field].row(i)) for i in positions] == \
+               [sorted(column.row(i)) for i in range(len(expected.movies_df))], field
+
+
+def test_full_refresh_sees_changes(movies):
+    catalog = Catalog(movies.db, "movies2", sync="full")
+    before = catalog.get()
+    edited, _, deleted, added = movies.make_changes()
+    catalog.refresh(wait=True, full=True)
+    data = catalog.get()
+    assert data.version == before.version + 1
+    assert data.all_movies_df.at[edited, 'title'] == "Amélie Returns"
+    assert deleted not in data.all_movies_df.index
+    assert added in data.all_movies_df.index
+
+
+def test_poll_matches_full_load(movies):
+    catalog = Catalog(movies.db, "movies2", sync="poll")
+    catalog.get()
+    edited, _, deleted, added = movies.make_changes()
+    catalog.refresh(wait=True, full=False)
+    data = catalog.get()
+    assert catalog.last_error is None
+    assert data.all_movies_df.at[edited, 'title'] == "Amélie Returns"
+    assert deleted not in data.all_movies_df.index
+    assert_same_catalog(data, full_load(movies))
+
+
+def test_poll_without_changes_keeps_the_version(movies):
+    catalog = Catalog(movies.db, "movies2", sync="poll")
+    before = catalog.get()
+    catalog.refresh(wait=True, full=False)
+    assert catalog.get() is before
+
+
+def test_listen_matches_full_load(movies):
+    gone = movies.ids[0]
+    movies.soft_delete(gone)
+    catalog = Catalog(movies.db, "movies2", sync="listen")
+    try:
+        assert gone not in catalog.get().all_movies_df.index
+        # Most real writes have no `deleted` field at all
+        document = movies.get(movies.ids[5])
+        document.pop("deleted", None)
+        movies.ref.document(movies.ids[5]).set({**document, 'title': "Listen Check"})
+        edited, _, deleted, added = movies.make_changes()
+        data = catalog.get()
+    finally:
+        catalog.stop()
+    assert catalog.last_error is None
+    assert data.all_movies_df.at[movies.ids[5], 'title'] == "Listen Check"
+    assert deleted not in data.all_movies_df.index
+    assert_same_catalog(data, full_load(movies))
+
+
+def test_listen_falls_back_to_polling_when_the_first_snapshot_fails(movies, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("cannot build")
+
+    monkeypatch.setattr(Catalog, "_build", fail)
+    catalog = Catalog(movies.db, "movies2", sync="listen")
+    data = catalog.get()
+    assert catalog.sync == "poll" and catalog._watch is None
+    assert len(data.all_movies_df) == len(movies.ids)
+
+    edited, _, deleted, _ = movies.make_changes()
+    catalog.refresh(wait=True, full=False)
+    data = catalog.get()
+    assert data.all_movies_df.at[edited, 'title'] == "Amélie Returns"
+    assert deleted not in data.all_movies_df.index
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from movies.titles import TitleIndex, normalize_title
+
+
+def title_index(titles, popularity):
+    return TitleIndex(pd.DataFrame({'title': titles, 'release_year': [2000.0] * len(titles),
+                                    'popularity': popularity}))
+
+
+def test_normalize_title_keeps_letters_of_any_script():
+    assert normalize_title("Léon: The Professional") == "leon the professional"
+    assert normalize_title("東京物語") == "東京物語"
+    assert normalize_title("Крёстный отец") == normalize_title("крестныи ОТЕЦ")
+    assert normalize_title(None) == ""
+
+
+def test_search_finds_non_latin_prefixes():
+    index = title_index(["東京物語", "東京ゴッドファーザーズ", "Tokyo Story", "Amélie"], [1.0, 2.0, 3.0, 4.0])
+    assert index.search("東京").tolist() == [1, 0]
+    assert index.search("ame").tolist() == [3]
+    assert index.lookup("amelie").tolist() == [3]
+
+
+def test_empty_query_returns_the_most_popular():
+    popularity = np.array([5.0, np.nan, 9.0, 1.0, 9.0])
+    index = title_index(["a", "b", "c", "d", "e"], popularity)
+    assert index.search("", limit=3).tolist() == [2, 4, 0]
+    assert index.search("  ", limit=10).tolist() == [2, 4, 0, 3, 1]
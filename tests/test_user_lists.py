@@ -0,0 +1,39 @@
+from movies.fakestore import FakeClient
+from movies.user_lists import UserLists
+
+TITLES = {"Heat": "id-heat", "Alien": "id-alien"}
+
+
+def legacy_user(db):
+    db.collection("users").document("alice").set({'to_watch': ["Heat", "id-1", "Alien", "id-heat"],
+                                                  'favorites': ["id-2"]})
+    return UserLists(db, "alice")
+
+
+def test_migrate_keeps_order_and_drops_repeats():
+    db = FakeClient()
+    lists = legacy_user(db)
+    assert lists.migrate(TITLES.get) == 2
+    assert lists["to_watch"] == ["id-heat", "id-1", "id-alien"]
+    assert lists["favorites"] == ["id-2"]
+    assert db.collection("users").document("alice").get().to_dict()["to_watch"] == lists["to_watch"]
+    assert lists.migrate(TITLES.get) == 0
+
+
+def test_migrate_keeps_an_entry_added_from_another_tab():
+    db = FakeClient()
+    lists = legacy_user(db)
+    other_tab = UserLists(db, "alice")
+    calls = []
+
+    def resolve(entry):
+        calls.append(entry)
+        # First lookup inside the transaction: another tab adds a movie before it commits
+        if len(calls) == 6:
+            other_tab.add("to_watch", ["id-new"])
+        return TITLES.get(entry)
+
+    assert lists.migrate(resolve) == 2
+    expected = ["id-heat", "id-1", "id-alien", "id-new"]
+    assert db.collection("users").document("alice").get().to_dict()["to_watch"] == expected
+    assert lists["to_watch"] == expected